@@ -5,70 +5,219 @@
 #todo next - set up combat teams
 #todo - set some of those fcts as ArenaEnv class methds
 
+import heapq
+import math
 import random
+from array import array
+from collections.abc import Mapping
+from enum import Enum
+from typing import NamedTuple
 
+from app_code.arena.effects import ActiveEffect, StatusEffect
 from app_code.barracks.barracks import FighterTemplate
 from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.events.events import (AttackEvent, BattleOverEvent, BattleStartEvent, DeathEvent, EffectHpEvent,
+                                     EventBus)
+from app_code.utils.profiling import Profiler
 
+METER_FULL = 100
+METER_STEP = 0.05
+
+# bump when battles resolve differently for a reason outside this file,
+# cached matchup results of older rules are then dropped
+RULES_VERSION = 2
+
+class SchedulerEnum(Enum):
+  TICK = 0      # every speed meter is advanced on every tick
+  EVENT = 1     # a priority queue jumps straight to the next unit able to act
+
+# only the mutable battle state lives here, the base stats are read from the shared template
+# strength and speed are the effective ones, template stats plus status effects
 class CombatEntity:
+  __slots__ = ("template", "team", "team_slot", "current_hp", "speed_meter", "last_turn", "setup_order",
+               "strength", "speed", "effects", "meter_tick", "turn_entry")
+
   def __init__(self, template):
     self.template : FighterTemplate = template
-    self.team : CombatTeam = CombatTeam()
-    self.alive : bool = True
+    self.team : CombatTeam | None = None
+    self.team_slot : int = 0
     self.current_hp : int = self.template.max_hp
     self.speed_meter : float = 0
+    self.last_turn : int = 0
+    self.setup_order : int = 0
+    self.strength : int = template.strength
+    self.speed : float = template.speed
+    # ActiveEffects in application order, None until the first one
+    self.effects : list[ActiveEffect] | None = None
+    # speed_meter is the meter after this tick, it has filled by speed * METER_STEP every tick since
+    # (see meter_at), both schedulers only store it when the unit acts or its speed changes
+    self.meter_tick : int = 0
+    # its entry in the event turn queue, older entries left in the queue are stale
+    self.turn_entry : tuple | None = None
+
+  @property
+  def alive(self) -> bool:
+    return self.current_hp > 0
 
   def attack(self):
 
     # add parry, dodge, block, combo, retaliate
-    return self.template.strength
+    return self.strength
+
+  # sums the effects again, only called when one is applied or expires
+  def refresh_stats(self):
+    strength = self.template.strength
+    speed = self.template.speed
+    for active in self.effects or ():
+      strength += active.effect.strength
+      speed += active.effect.speed
+    self.strength = max(strength, 0)
+    self.speed = max(speed, 0)
 
 # combat teams set up in barracks or arena level ?
+# unit_list only holds the alive units, in no particular order :
+# each unit knows its slot so it can be swapped out in O(1) when it dies
 class CombatTeam:
-  def __init__(self):
+  def __init__(self, team_id = 0):
+    self.team_id : int = team_id
     self.unit_list : list[CombatEntity] =[]
 
   def add_unit(self, unit):
+    unit.team = self
+    unit.team_slot = len(self.unit_list)
     self.unit_list.append(unit)
 
+  def remove_unit(self, unit):
+    last_unit = self.unit_list.pop()
+    if last_unit is not unit :
+      self.unit_list[unit.team_slot] = last_unit
+      last_unit.team_slot = unit.team_slot
+
+# the mutable state of a battle, flat and in setup order, the templates and effects are shared
+# queues are not stored, they are rebuilt from the meters and effect timers on restore
+class BattleSnapshot:
+  __slots__ = ("templates", "unit_teams", "current_hp", "speed_meter", "last_turn", "meter_tick",
+               "team_members", "active_teams", "effects", "effect_seq", "tick", "winner", "rng_state")
+
+  def __init__(self, arena : "ArenaEnv"):
+    units = arena.units
+    self.templates : list[FighterTemplate] = [unit.template for unit in units]
+    self.unit_teams : array = array("i", [unit.team.team_id for unit in units])
+    self.current_hp : array = array("q", [unit.current_hp for unit in units])
+    self.speed_meter : array = array("d", [unit.speed_meter for unit in units])
+    self.last_turn : array = array("q", [unit.last_turn for unit in units])
+    self.meter_tick : array = array("q", [unit.meter_tick for unit in units])
+    # alive units of each team in unit_list order, which decides the targets drawn
+    self.team_members : tuple[tuple[int, ...], ...] = tuple(
+      tuple(unit.setup_order for unit in team.unit_list) for team in arena.teams)
+    self.active_teams : tuple[int, ...] = tuple(team.team_id for team in arena.combat_teams)
+    # (setup order, effect, expires at, next period, timer seq) per effect, in each unit's order
+    self.effects : tuple[tuple, ...] = tuple(
+      (unit.setup_order, active.effect, active.expires_at, active.next_period, active.seq)
+      for unit in units if unit.effects for active in unit.effects)
+    self.effect_seq : int = arena.effect_seq
+    self.tick : int = arena.tick
+    self.winner : int | None = arena.winner_team_id()
+    self.rng_state : tuple = arena.rng.getstate()
+
 class ArenaEnv:
-  def __init__(self):
-    self.pregen_unit_templates : dict[str, FighterTemplate] = {}
+  def __init__(self, rng : random.Random | None = None):
+    self.pregen_unit_templates : Mapping[str, FighterTemplate] = {}
     self.combat_teams : list[CombatTeam] = []
+    # every unit of the battle in setup order, dead ones included
+    self.units : list[CombatEntity] = []
+    # every team of the battle in team id order, beaten (or empty) ones included
+    self.teams : list[CombatTeam] = []
     self.biome : str = "0"
-    
+    self.tick : int = 0
+    self.winner : CombatTeam | None = None
+    self.scheduler : SchedulerEnum = SchedulerEnum.TICK
+    self.turn_queue : list[tuple[int, float, int, CombatEntity]] = []
+    # (tick, seq, ActiveEffect) expiry and periodic timers, see effects.py
+    self.effect_queue : list[tuple[int, int, ActiveEffect]] = []
+    self.effect_seq : int = 0
+    # every random draw of a battle goes through this generator
+    self.rng : random.Random = rng if rng is not None else random.Random()
+    # attack, death and battle over events go there, nobody listens by default
+    self.event_bus : EventBus = EventBus()
+    # only set while profiling, counts ticks, actions and scans of the battle
+    self.profiler : Profiler | None = None
+    # run_battle settles fresh 1v1 battles with solve_duel instead of ticking them
+    self.analytic_duels : bool = True
+    # team id -> TargetPolicy (see targeting.py), teams without one pick at random
+    self.target_policies : dict = {}
+
   def init(self):
     self.pregen_unit_templates = get_pregen_unit_database()
 
-  def setup_battle(self):
-    unit1 = CombatEntity(self.pregen_unit_templates["Goblin"])
-    team1 = CombatTeam()
-    team1.unit_list = [unit1]
-    self.combat_teams = [team1]
-
-  def fight_battle(self):
-
-    battle_setlist = [ team for team in self.combat_teams]
+  # team_setups is one list of template names per team, defaults to a lone goblin
+  # rng replaces the arena generator, to make this battle reproducible on its own
+  def setup_battle(self, team_setups : list[list[str]] | None = None, rng : random.Random | None = None):
+    if team_setups is None:
+      team_setups = [["Goblin"]]
+
+    self.setup_templates([[self.pregen_unit_templates[name] for name in unit_names] for unit_names in team_setups], rng)
+
+  # same as setup_battle with the templates themselves, e.g. generated fighters
+  def setup_templates(self, team_templates : list[list[FighterTemplate]], rng : random.Random | None = None):
+    if rng is not None:
+      self.rng = rng
+
+    self.combat_teams = []
+    self.units = []
+    self.teams = []
+    self.turn_queue = []
+    self.effect_queue = []
+    self.effect_seq = 0
+    self.tick = 0
+    self.winner = None
+
+    setup_order = 0
+    for team_id, templates in enumerate(team_templates):
+      team = CombatTeam(team_id)
+      for template in templates:
+        unit = CombatEntity(template)
+        unit.setup_order = setup_order
+        setup_order += 1
+        team.add_unit(unit)
+        self.units.append(unit)
+        if self.scheduler == SchedulerEnum.EVENT:
+          self.schedule_turn(unit)
+      self.teams.append(team)
+      # an empty team is beaten from the start, like the vectorized arenas count it
+      if team.unit_list != []:
+        self.combat_teams.append(team)
+
+    if self.event_bus.wants(BattleStartEvent):
+      self.event_bus.publish(BattleStartEvent(self.units))
+
+  # the event scheduler doesn't jump past tick until, it stops there like the tick scheduler would
+  def fight_battle(self, until : int | None = None):
+
+    battle_setlist = self.combat_teams
 
     battle_over = False
 
-    if len(battle_setlist) == 1 :
+    if len(battle_setlist) <= 1 :
       battle_over = True
-      print("battle over !", battle_setlist[0].unit_list[0].template.name, "has won")
+      if battle_setlist != [] :
+        self.winner = battle_setlist[0]
+      if self.event_bus.wants(BattleOverEvent) :
+        self.event_bus.publish(BattleOverEvent(self.tick, self.winner))
       return battle_over
 
     else :
-      turn_setlist = []
-      surviving_units = []
-
-      for team in battle_setlist :
-        for unit in team.unit_list :
-
-          unit.speed_meter += unit.template.speed * 0.05
-          if unit.speed_meter >= 100 :
-            turn_setlist.append(unit)
-
-      speed_sort(turn_setlist)
+      previous_tick = self.tick
+      # units killed this tick stay targetable until the end of the tick
+      dead_units = []
+      if self.scheduler == SchedulerEnum.EVENT :
+        turn_setlist = self.pop_next_turns(dead_units, until)
+      else :
+        turn_setlist = self.advance_speed_meters(dead_units)
+
+      actions = 0
+      event_handlers = self.event_bus.handlers
+      target_policies = self.target_policies
 
       for unit in turn_setlist :
 
@@ -77,32 +226,423 @@ class ArenaEnv:
 
         # pick targets, do actions
 
-          target_list = [ target for team in battle_setlist if team != unit.team for target in team.unit_list]
+          policy = target_policies.get(unit.team.team_id) if target_policies else None
+          target = self.pick_target(unit) if policy is None else policy.choose_target(self, unit)
+          actions += 1
 
-          target = random.choice(target_list)
+          was_alive = target.current_hp > 0
+          damage = unit.attack()
+          target.current_hp -= damage
+          died = was_alive and target.current_hp <= 0
+          if died :
+            dead_units.append(target)
 
-          target.current_hp -= unit.attack()
-          if target.current_hp <= 0 :
-            target.alive = False
+          if AttackEvent in event_handlers :
+            self.event_bus.publish(AttackEvent(self.tick, unit, target, damage, died))
+          if died and DeathEvent in event_handlers :
+            self.event_bus.publish(DeathEvent(self.tick, target))
 
           unit.speed_meter = 0
-
-      surviving_units = [unit for team in battle_setlist for unit in team.unit_list if unit.current_hp > 0]
-
-      for team in battle_setlist :
-        team.unit_list = [unit for unit in surviving_units if unit.team == team]
-
-      battle_setlist = [ team for team in battle_setlist if team.unit_list != []]
+          unit.last_turn = self.tick
+          unit.meter_tick = self.tick
+          if self.scheduler == SchedulerEnum.EVENT :
+            self.schedule_turn(unit)
+
+      if dead_units != [] :
+        for unit in dead_units :
+          unit.team.remove_unit(unit)
+
+        self.combat_teams = [ team for team in battle_setlist if team.unit_list != []]
+
+      if self.profiler is not None :
+        # the event scheduler skips the empty ticks instead of stepping through them
+        self.profiler.count("arena.steps")
+        self.profiler.count("arena.ticks", self.tick - previous_tick)
+        self.profiler.count("arena.empty_ticks", self.tick - previous_tick - (1 if actions > 0 else 0))
+        self.profiler.count("arena.actions", actions)
+        self.profiler.count("arena.deaths", len(dead_units))
+        if dead_units != [] :
+          self.profiler.count("arena.list_rebuilds")
 
       return battle_over
 
+  # uniform pick among the alive units of every other team, O(number of teams)
+  def pick_target(self, unit : CombatEntity) -> CombatEntity:
+    enemy_teams = [team for team in self.combat_teams if team is not unit.team]
+
+    if len(enemy_teams) == 1 :
+      return self.rng.choice(enemy_teams[0].unit_list)
+
+    pick = self.rng.randrange(sum(len(team.unit_list) for team in enemy_teams))
+    for team in enemy_teams :
+      if pick < len(team.unit_list) :
+        return team.unit_list[pick]
+      pick -= len(team.unit_list)
+
+  # tick scheduler : every unit fills its speed meter, the full ones act this tick
+  def advance_speed_meters(self, dead_units : list[CombatEntity]) -> list[CombatEntity]:
+    self.tick += 1
+    tick = self.tick
+    if self.effect_queue and self.effect_queue[0][0] <= tick :
+      self.process_effects(dead_units)
+    turn_setlist = []
+
+    for team in self.combat_teams :
+      for unit in team.unit_list :
+
+        # meter_at inlined
+        meter = unit.speed_meter + unit.speed * METER_STEP * (tick - unit.meter_tick)
+        if meter >= METER_FULL :
+          unit.speed_meter = meter
+          unit.meter_tick = tick
+          turn_setlist.append(unit)
+
+    speed_sort(turn_setlist)
+
+    if self.profiler is not None :
+      self.profiler.count("arena.units_scanned", sum(len(team.unit_list) for team in self.combat_teams))
+      self.profiler.count("arena.list_rebuilds")
+
+    return turn_setlist
+
+  # event scheduler : jump straight to the next tick where somebody acts or an effect timer is due
+  # the queue is keyed on (tick, -meter, setup order) so it pops in speed_sort order
+  def pop_next_turns(self, dead_units : list[CombatEntity], until : int | None = None) -> list[CombatEntity]:
+    turn_queue = self.turn_queue
+    effect_queue = self.effect_queue
+    if turn_queue == [] and effect_queue == [] :
+      # nobody can ever act again, just let the time run
+      self.tick += 1
+      return []
+
+    if turn_queue == [] or (effect_queue != [] and effect_queue[0][0] < turn_queue[0][0]) :
+      next_tick = effect_queue[0][0]
+    else :
+      next_tick = turn_queue[0][0]
+    if until is not None and next_tick > until :
+      # nothing happens until then, every tick scheduler step moves on by one tick at least
+      self.tick = max(until, self.tick + 1)
+      return []
+    self.tick = next_tick
+    if effect_queue != [] and effect_queue[0][0] <= self.tick :
+      self.process_effects(dead_units)
+    turn_setlist = []
+
+    while turn_queue != [] and turn_queue[0][0] == self.tick :
+      entry = heapq.heappop(turn_queue)
+      unit = entry[3]
+      # units killed on an earlier tick, and turns moved by a speed change, are dropped lazily
+      if unit.current_hp > 0 and entry is unit.turn_entry :
+        turn_setlist.append(unit)
+
+    if self.profiler is not None :
+      self.profiler.count("arena.units_scanned", len(turn_setlist))
+
+    return turn_setlist
+
+  def schedule_turn(self, unit : CombatEntity):
+    entry = self.next_turn_entry(unit)
+    if entry is not None :
+      heapq.heappush(self.turn_queue, entry)
+
+  # queue entry of the unit's next turn, the first tick its meter is full
+  def next_turn_entry(self, unit : CombatEntity) -> tuple | None:
+    if unit.speed_meter == 0 :
+      interval = turn_interval(unit.speed)
+    else :
+      interval = meter_fill(unit.speed_meter, unit.speed)
+    if interval is None :
+      unit.turn_entry = None
+    else :
+      ticks, meter = interval
+      unit.turn_entry = (unit.meter_tick + ticks, -meter, unit.setup_order, unit)
+    return unit.turn_entry
+
+  # starts effect on unit from this tick, stacking on the effects it already has
+  def apply_effect(self, unit : CombatEntity, effect : StatusEffect) -> ActiveEffect:
+    if (effect.duration is not None and effect.duration < 1) or effect.period < 0 :
+      raise ValueError(f"effect '{effect.name}' needs a duration of at least one tick (or None) "
+                       f"and a period of zero (none) or more ticks")
+
+    active = ActiveEffect(effect, unit, self.tick)
+    if unit.effects is None :
+      unit.effects = []
+    unit.effects.append(active)
+    self.push_effect_timer(active)
+    self.refresh_unit(unit, self.tick)
+    return active
+
+  # ends an effect early (dispel), its pending timer is dropped when it comes up
+  def remove_effect(self, active : ActiveEffect):
+    self.end_effect(active, self.tick)
+
+  # meter_tick is the last tick whose meter fill used the old stats
+  def end_effect(self, active : ActiveEffect, meter_tick : int):
+    if not active.active :
+      return
+    active.active = False
+    active.unit.effects.remove(active)
+    self.refresh_unit(active.unit, meter_tick)
+
+  def push_effect_timer(self, active : ActiveEffect):
+    timer = active.next_timer()
+    if timer is not None :
+      active.seq = self.effect_seq
+      self.effect_seq += 1
+      heapq.heappush(self.effect_queue, (timer, active.seq, active))
+
+  # runs the effect timers due by this tick, before anybody fills its meter or acts
+  def process_effects(self, dead_units : list[CombatEntity]):
+    effect_queue = self.effect_queue
+    while effect_queue != [] and effect_queue[0][0] <= self.tick :
+      timer, _, active = heapq.heappop(effect_queue)
+      unit = active.unit
+      # removed effects and effects of dead units are dropped lazily
+      if not active.active or unit.current_hp <= 0 :
+        continue
+
+      if active.next_period == timer :
+        hp = unit.current_hp
+        change = active.effect.hp_per_period
+        if change > 0 :
+          unit.current_hp = min(hp + change, unit.template.max_hp)
+        else :
+          unit.current_hp += change
+        active.next_period += active.effect.period
+        if self.event_bus.wants(EffectHpEvent) :
+          self.event_bus.publish(EffectHpEvent(self.tick, unit, active.effect, unit.current_hp - hp,
+                                               unit.current_hp <= 0))
+        if unit.current_hp <= 0 :
+          dead_units.append(unit)
+          if self.event_bus.wants(DeathEvent) :
+            self.event_bus.publish(DeathEvent(self.tick, unit))
+          continue
+
+      if active.expires_at == timer :
+        self.end_effect(active, timer - 1)
+      else :
+        self.push_effect_timer(active)
+
+  # refreshes the cached stats after an effect change, a speed change moves the next turn
+  def refresh_unit(self, unit : CombatEntity, meter_tick : int):
+    old_speed = unit.speed
+    unit.refresh_stats()
+    if unit.speed == old_speed or unit.current_hp <= 0 :
+      return
+
+    # the meter it filled until then at the old speed, the new speed counts from there
+    meter = meter_at(unit.speed_meter, old_speed, meter_tick - unit.meter_tick)
+    unit.speed_meter = meter
+    unit.meter_tick = meter_tick
+    # a full meter means its turn was already popped for this tick, it plans the next one after acting
+    if self.scheduler == SchedulerEnum.EVENT and meter < METER_FULL :
+      self.schedule_turn(unit)
+
+  def winner_team_id(self) -> int | None:
+    if self.winner is None:
+      return None
+    return self.winner.team_id
+
+  # drives fight_battle until a winner is known, no display and no sleeping
+  # returns False if the battle was still running after max_ticks
+  def run_battle(self, max_ticks : int = 1_000_000):
+    if self.analytic_duels and self.is_fresh_duel() :
+      self.resolve_duel(max_ticks)
+
+    while not self.fight_battle(max_ticks) :
+      if self.tick >= max_ticks :
+        return False
+    return True
+
+  # a 1v1 nobody has acted in yet, without effects, and nobody watches action by action
+  def is_fresh_duel(self) -> bool:
+    return (len(self.units) == 2 and len(self.combat_teams) == 2 and self.tick == 0
+            and self.profiler is None and not self.units[0].effects and not self.units[1].effects
+            and not self.event_bus.wants(AttackEvent) and not self.event_bus.wants(DeathEvent))
+
+  # jumps a fresh duel to the tick of the killing blow, fight_battle then ends it as usual
+  # the tick loop draws its target among one unit, so skipping it only changes the rng state
+  # returns False, leaving the battle as it was, if nobody can win before max_ticks
+  def resolve_duel(self, max_ticks : int) -> bool:
+    first, second = self.units
+    duel = solve_duel(first.template, second.template)
+    # the tick loop gives up when the killing blow lands on max_ticks
+    if duel.winner is None or duel.tick >= max_ticks :
+      return False
+
+    first.current_hp, second.current_hp = duel.hp
+    loser = self.units[1 - duel.winner]
+    loser.team.remove_unit(loser)
+    self.combat_teams = [self.units[duel.winner].team]
+    self.turn_queue = []
+    self.tick = duel.tick
+    return True
+
+  # copies the mutable battle state, to come back to it with restore or branch off it with fork
+  def snapshot(self) -> BattleSnapshot:
+    return BattleSnapshot(self)
+
+  # puts this battle back in the state of snapshot, which must come from the same setup
+  # both schedulers keep the meters the same way, a snapshot of one can be restored on the other
+  def restore(self, snapshot : BattleSnapshot):
+    units = self.units
+    if len(units) != len(snapshot.templates):
+      raise ValueError(f"snapshot of a {len(snapshot.templates)} unit battle, this one has {len(units)} units")
+
+    for unit, current_hp, speed_meter, last_turn, meter_tick in zip(units, snapshot.current_hp, snapshot.speed_meter,
+                                                                    snapshot.last_turn, snapshot.meter_tick):
+      unit.current_hp = current_hp
+      unit.speed_meter = speed_meter
+      unit.last_turn = last_turn
+      unit.meter_tick = meter_tick
+      unit.effects = None
+
+    self.effect_queue = []
+    for setup_order, effect, expires_at, next_period, seq in snapshot.effects:
+      unit = units[setup_order]
+      active = ActiveEffect(effect, unit, 0)
+      active.expires_at, active.next_period, active.seq = expires_at, next_period, seq
+      if unit.effects is None:
+        unit.effects = []
+      unit.effects.append(active)
+      timer = active.next_timer()
+      if timer is not None:
+        self.effect_queue.append((timer, seq, active))
+    heapq.heapify(self.effect_queue)
+    self.effect_seq = snapshot.effect_seq
+    for unit in units:
+      unit.refresh_stats()
+
+    teams = self.teams
+    for team, members in zip(teams, snapshot.team_members):
+      team.unit_list = [units[setup_order] for setup_order in members]
+      for team_slot, unit in enumerate(team.unit_list):
+        unit.team_slot = team_slot
+
+    self.combat_teams = [teams[team_id] for team_id in snapshot.active_teams]
+    self.tick = snapshot.tick
+    self.winner = None if snapshot.winner is None else teams[snapshot.winner]
+    self.rng.setstate(snapshot.rng_state)
+
+    self.turn_queue = []
+    if self.scheduler == SchedulerEnum.EVENT:
+      for team in self.combat_teams:
+        for unit in team.unit_list:
+          entry = self.next_turn_entry(unit)
+          if entry is not None:
+            self.turn_queue.append(entry)
+      heapq.heapify(self.turn_queue)
+
+  # a new arena continuing this battle (or snapshot) on its own : new units and teams, shared templates,
+  # its own rng positioned where the battle was, and no event subscribers
+  # scheduler defaults to this arena's
+  def fork(self, snapshot : BattleSnapshot | None = None, scheduler : SchedulerEnum | None = None) -> "ArenaEnv":
+    if snapshot is None:
+      snapshot = self.snapshot()
+
+    arena = ArenaEnv(random.Random())
+    arena.pregen_unit_templates = self.pregen_unit_templates
+    arena.biome = self.biome
+    arena.scheduler = self.scheduler if scheduler is None else scheduler
+    arena.analytic_duels = self.analytic_duels
+
+    teams = [CombatTeam(team_id) for team_id in range(len(snapshot.team_members))]
+    arena.teams = teams
+    for setup_order, (template, team_id) in enumerate(zip(snapshot.templates, snapshot.unit_teams)):
+      unit = CombatEntity(template)
+      unit.setup_order = setup_order
+      unit.team = teams[team_id]
+      arena.units.append(unit)
+
+    arena.restore(snapshot)
+    return arena
+
 
 
 
 ######### functions ###################
 
 ###
+# fullest meter first, ties go to the unit set up first
 def speed_sort(unit_list : list[CombatEntity]) :
-  unit_list.sort(key=lambda x: x.speed_meter, reverse=True)
+  unit_list.sort(key=lambda x: (-x.speed_meter, x.setup_order))
 
+###
+# the meter ticks after it was meter, at a constant speed
+# every meter of the battle is computed with this exact expression, so both schedulers agree on float rounding
+def meter_at(meter : float, speed : float, ticks : int) -> float :
+  return meter + speed * METER_STEP * ticks
 
+###
+_turn_intervals : dict[float, tuple[int, float] | None] = {}
+
+# ticks needed to fill an empty speed meter, and the meter value once full
+# None means the unit never gets a turn
+def turn_interval(speed : float) -> tuple[int, float] | None :
+  if speed not in _turn_intervals :
+    _turn_intervals[speed] = meter_fill(0, speed)
+
+  return _turn_intervals[speed]
+
+# same from a partly filled meter, after a speed change
+# the first tick meter_at reaches METER_FULL, estimated by a division then settled on the exact expression
+def meter_fill(meter : float, speed : float) -> tuple[int, float] | None :
+  step = speed * METER_STEP
+  if step <= 0 :
+    return None
+  if meter >= METER_FULL :
+    return 0, meter
+  ticks = max(math.ceil((METER_FULL - meter) / step), 1)
+  while ticks > 1 and meter_at(meter, speed, ticks - 1) >= METER_FULL :
+    ticks -= 1
+  while meter_at(meter, speed, ticks) < METER_FULL :
+    ticks += 1
+  return ticks, meter_at(meter, speed, ticks)
+
+###
+# outcome of a 1v1, sides are 0 for the first template and 1 for the second
+class DuelResult(NamedTuple):
+  winner : int | None     # None when neither side can ever kill the other
+  tick : int | None       # tick of the killing blow
+  hp : tuple[int, int]    # hp of both sides once it landed, the loser's is <= 0
+
+# exact result of fight_battle on a 1v1 with the first template set up first, without ticking it
+# each side acts every turn_interval ticks and kills after ceil(hp / strength) hits,
+# the earliest killing blow wins, in speed_sort order when both land on the same tick
+def solve_duel(first : FighterTemplate, second : FighterTemplate) -> DuelResult:
+  fighters = (first, second)
+  intervals = (turn_interval(first.speed), turn_interval(second.speed))
+
+  # (tick, -meter, side) of each side's killing blow, ordered like the turns of a tick
+  kills = []
+  for side in (0, 1):
+    attacker, defender = fighters[side], fighters[1 - side]
+    if intervals[side] is None or attacker.strength <= 0 :
+      continue
+    hits = -(-defender.max_hp // attacker.strength)
+    kills.append((hits * intervals[side][0], -intervals[side][1], side))
+
+  if kills == [] :
+    return DuelResult(None, None, (first.max_hp, second.max_hp))
+
+  kill = min(kills)
+  tick, winner = kill[0], kill[2]
+  loser = 1 - winner
+
+  # loser turns before the killing blow, its turn on that same tick counts if it comes first
+  loser_hits = 0
+  if intervals[loser] is not None :
+    loser_ticks, loser_meter = intervals[loser]
+    loser_hits = (tick - 1) // loser_ticks
+    if tick % loser_ticks == 0 and (-loser_meter, loser) < kill[1:] :
+      loser_hits += 1
+
+  hp = [0, 0]
+  hp[winner] = fighters[winner].max_hp - loser_hits * fighters[loser].strength
+  hp[loser] = fighters[loser].max_hp - -(-fighters[loser].max_hp // fighters[winner].strength) * fighters[winner].strength
+  return DuelResult(winner, tick, (hp[0], hp[1]))
+
+# solve_duel for every ordered pair of templates, results[first name][second name]
+def duel_matrix(templates : Mapping[str, FighterTemplate]) -> dict[str, dict[str, DuelResult]]:
+  return {first_name: {second_name: solve_duel(first, second) for second_name, second in templates.items()}
+          for first_name, first in templates.items()}
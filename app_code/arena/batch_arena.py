@@ -0,0 +1,116 @@
+# Many battles at once
+# the same team setup is fought in B independent battles advanced in lockstep
+# every array is (battles, units) and each step is one vectorized pass for all
+# of them, finished battles are dropped from the working arrays
+#
+# each battle jumps straight to its own next action tick like the event
+# scheduler of ArenaEnv, so the rules, turn order and tie breaking are the same
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from app_code.arena.arena import turn_interval
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+
+NO_WINNER = -1      # every team died on the same tick
+TIMED_OUT = -2      # still running after max_ticks
+
+NEVER = np.iinfo(np.int64).max // 2
+
+class BatchArena:
+  def __init__(self, seed : int | None = None):
+    self.pregen_unit_templates : Mapping[str, FighterTemplate] = {}
+    self.rng : np.random.Generator = np.random.default_rng(seed)
+
+    # per unit constants, in setup order
+    self.templates : list[FighterTemplate] = []
+    self.team : np.ndarray = np.zeros(0, dtype=np.int32)
+    self.strength : np.ndarray = np.zeros(0, dtype=np.int64)
+    self.max_hp : np.ndarray = np.zeros(0, dtype=np.int64)
+    self.interval : np.ndarray = np.zeros(0, dtype=np.int64)
+    self.turn_order : list[int] = []
+    self.team_count : int = 0
+
+  def init(self):
+    self.pregen_unit_templates = get_pregen_unit_database()
+
+  def setup_battle(self, team_setups : list[list[str]]):
+    self.setup_templates([[self.pregen_unit_templates[name] for name in unit_names] for unit_names in team_setups])
+
+  def setup_templates(self, team_templates : list[list[FighterTemplate]]):
+    self.templates = [template for templates in team_templates for template in templates]
+    self.team = np.repeat(np.arange(len(team_templates), dtype=np.int32),
+                          [len(templates) for templates in team_templates])
+    self.strength = np.array([template.strength for template in self.templates], dtype=np.int64)
+    self.max_hp = np.array([template.max_hp for template in self.templates], dtype=np.int64)
+    self.team_count = len(team_templates)
+
+    intervals = [turn_interval(template.speed) for template in self.templates]
+    self.interval = np.array([NEVER if interval is None else interval[0] for interval in intervals], dtype=np.int64)
+
+    # units acting on the same tick go fullest meter first, setup order on ties
+    full_meters = [0.0 if interval is None else interval[1] for interval in intervals]
+    self.turn_order = sorted(range(len(self.templates)), key=lambda unit: (-full_meters[unit], unit))
+
+  # fights the set up battle `battles` times
+  # returns per battle winner team ids (or NO_WINNER / TIMED_OUT) and durations in ticks
+  def run(self, battles : int, max_ticks : int = 1_000_000) -> tuple[np.ndarray, np.ndarray]:
+    unit_count = len(self.templates)
+    winners = np.full(battles, TIMED_OUT, dtype=np.int32)
+    durations = np.full(battles, max_ticks, dtype=np.int64)
+
+    # working arrays only hold the battles still running, battle_ids maps them back
+    battle_ids = np.arange(battles)
+    clock = np.zeros(battles, dtype=np.int64)
+    current_hp = np.tile(self.max_hp, (battles, 1))
+    next_turn = np.tile(self.interval, (battles, 1))
+    alive = np.ones((battles, unit_count), dtype=bool)
+    team_masks = [self.team == team_id for team_id in range(self.team_count)]
+    enemy_masks = [self.team != self.team[unit] for unit in range(unit_count)]
+
+    while len(battle_ids) > 0:
+      alive_teams = np.stack([(alive & team_mask).any(axis=1) for team_mask in team_masks], axis=1)
+      finished = alive_teams.sum(axis=1) <= 1
+
+      # every battle jumps to its own next action tick
+      # like ArenaEnv.run_battle, a battle decided on max_ticks or later has timed out
+      tick = np.where(alive, next_turn, NEVER).min(axis=1, initial=NEVER)
+      timed_out = ~finished & (tick >= max_ticks)
+
+      if finished.any():
+        done_ids = battle_ids[finished]
+        done_teams = alive_teams[finished]
+        winners[done_ids] = np.where(done_teams.any(axis=1), np.argmax(done_teams, axis=1), NO_WINNER)
+        durations[done_ids] = clock[finished]
+
+      if finished.any() or timed_out.any():
+        keep = ~(finished | timed_out)
+        battle_ids, clock, tick = battle_ids[keep], clock[keep], tick[keep]
+        current_hp, next_turn, alive = current_hp[keep], next_turn[keep], alive[keep]
+        if len(battle_ids) == 0:
+          break
+
+      clock = tick
+      ready = alive & (next_turn == tick[:, None])
+      # targets are drawn among the units alive at the start of the tick
+      alive_at_start = alive.copy()
+
+      for unit in self.turn_order:
+        # could have been killed by a previous unit of the tick
+        acting = np.flatnonzero(ready[:, unit] & (current_hp[:, unit] > 0))
+        if len(acting) == 0:
+          continue
+
+        enemies = alive_at_start[acting] & enemy_masks[unit]
+        enemy_rank = np.cumsum(enemies, axis=1)
+        picks = (self.rng.random(len(acting)) * enemy_rank[:, -1]).astype(np.int64)
+        targets = np.argmax(enemy_rank > picks[:, None], axis=1)
+
+        current_hp[acting, targets] -= self.strength[unit]
+        next_turn[acting, unit] = tick[acting] + self.interval[unit]
+
+      alive &= current_hp > 0
+
+    return winners, durations
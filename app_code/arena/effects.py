@@ -0,0 +1,53 @@
+# Status effects (buffs / debuffs)
+# a StatusEffect is the shared, immutable description of an effect, every
+# application of it on a unit is an ActiveEffect. Effects change the unit's
+# effective strength and speed, which CombatEntity caches : they are summed
+# again only when an effect is applied or expires, never per tick
+#
+# expirations and periodic hp changes (damage over time, regen) are timers in
+# the arena effect_queue, a heap keyed on the battle tick, so a tick with no
+# timer due costs one comparison whatever the number of effects
+#
+# every application keeps its own timers, they are not batched : a periodic
+# effect stacked n times costs n heap pops and pushes each period, and timers
+# due on the same tick apply in order, which matters for the max_hp cap and for
+# who dies first. Ticks get slower linearly with the number of periodic effects
+# (about 0.4 us per timer fired here, see effects_* in arena_benchmark) with
+# both schedulers, and timers due every few ticks leave the event scheduler few
+# ticks to skip. Stacks applied together are cheaper as one effect with the
+# summed hp_per_period
+
+from typing import NamedTuple
+
+class StatusEffect(NamedTuple):
+  name : str
+  duration : int | None = None    # ticks, None lasts until removed or the unit dies
+  strength : int = 0              # added to the unit strength
+  speed : float = 0.0             # added to the unit speed
+  period : int = 0                # ticks between two hp changes, 0 for none
+  hp_per_period : int = 0         # negative for damage over time, positive for regen (up to max_hp)
+
+# one application of an effect on a unit, stacking effects are simply applied several times
+class ActiveEffect:
+  __slots__ = ("effect", "unit", "expires_at", "next_period", "active", "seq")
+
+  def __init__(self, effect : StatusEffect, unit, applied_at : int):
+    self.effect : StatusEffect = effect
+    self.unit = unit
+    self.expires_at : int | None = None if effect.duration is None else applied_at + effect.duration
+    self.next_period : int | None = applied_at + effect.period if effect.period > 0 else None
+    # cleared when removed, its timers are then dropped lazily
+    self.active : bool = True
+    # order of its pending timer among the timers due on the same tick
+    self.seq : int = 0
+
+  # tick of its next timer, None if it has none left
+  def next_timer(self) -> int | None:
+    next_period = self.next_period
+    if next_period is not None and self.expires_at is not None and next_period > self.expires_at:
+      next_period = None
+    if next_period is None:
+      return self.expires_at
+    if self.expires_at is None:
+      return next_period
+    return min(next_period, self.expires_at)
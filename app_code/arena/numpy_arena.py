@@ -0,0 +1,156 @@
+# Struct of arrays arena for large battles
+# same rules as ArenaEnv with the tick scheduler, but every unit is a row in
+# contiguous numpy arrays instead of a CombatEntity object
+# meter advance, readiness detection and dead unit masking are vectorized,
+# only the units acting on a tick are resolved one by one
+# the end of a battle is published as a BattleOverEvent, the winner being a
+# CombatTeam of the surviving units like ArenaEnv publishes
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from app_code.arena.arena import METER_FULL, METER_STEP, CombatEntity, CombatTeam
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.events.events import BattleOverEvent, EventBus
+
+class NumpyArenaEnv:
+  def __init__(self, seed : int | None = None):
+    self.pregen_unit_templates : Mapping[str, FighterTemplate] = {}
+    self.rng : np.random.Generator = np.random.default_rng(seed)
+    self.tick : int = 0
+    self.winner : int | None = None
+
+    # one row per unit, in setup order
+    self.templates : list[FighterTemplate] = []
+    self.team : np.ndarray = np.zeros(0, dtype=np.int32)
+    self.strength : np.ndarray = np.zeros(0, dtype=np.int64)
+    self.speed : np.ndarray = np.zeros(0, dtype=np.float64)
+    self.meter_step : np.ndarray = np.zeros(0, dtype=np.float64)
+    self.current_hp : np.ndarray = np.zeros(0, dtype=np.int64)
+    self.speed_meter : np.ndarray = np.zeros(0, dtype=np.float64)
+    # tick of each unit's last turn, its meter has filled by meter_step every tick since
+    self.last_turn : np.ndarray = np.zeros(0, dtype=np.int64)
+    self.alive : np.ndarray = np.zeros(0, dtype=bool)
+
+    # alive units of every other team, refreshed at the end of a tick with deaths
+    self.team_count : int = 0
+    self.enemy_index : list[np.ndarray] = []
+    # nobody listens by default, like ArenaEnv
+    self.event_bus : EventBus = EventBus()
+
+  def init(self):
+    self.pregen_unit_templates = get_pregen_unit_database()
+
+  def setup_battle(self, team_setups : list[list[str]] | None = None):
+    if team_setups is None:
+      team_setups = [["Goblin"]]
+
+    self.setup_templates([[self.pregen_unit_templates[name] for name in unit_names] for unit_names in team_setups])
+
+  def setup_templates(self, team_templates : list[list[FighterTemplate]]):
+    self.templates = [template for templates in team_templates for template in templates]
+    self.team = np.repeat(np.arange(len(team_templates), dtype=np.int32),
+                          [len(templates) for templates in team_templates])
+    self.strength = np.array([template.strength for template in self.templates], dtype=np.int64)
+    self.speed = np.array([template.speed for template in self.templates], dtype=np.float64)
+    self.meter_step = self.speed * METER_STEP
+    self.current_hp = np.array([template.max_hp for template in self.templates], dtype=np.int64)
+    self.speed_meter = np.zeros(len(self.templates), dtype=np.float64)
+    self.last_turn = np.zeros(len(self.templates), dtype=np.int64)
+    self.alive = np.ones(len(self.templates), dtype=bool)
+
+    self.team_count = len(team_templates)
+    self.tick = 0
+    self.winner = None
+    self.refresh_enemy_index()
+
+  def refresh_enemy_index(self):
+    self.enemy_index = [np.flatnonzero(self.alive & (self.team != team_id)) for team_id in range(self.team_count)]
+
+  def alive_team_ids(self) -> np.ndarray:
+    return np.unique(self.team[self.alive])
+
+  def fight_battle(self) -> bool:
+    alive_teams = self.alive_team_ids()
+
+    if len(alive_teams) <= 1:
+      if len(alive_teams) == 1:
+        self.winner = int(alive_teams[0])
+      if self.event_bus.wants(BattleOverEvent):
+        self.event_bus.publish(BattleOverEvent(self.tick, self.winner_team()))
+      return True
+
+    self.tick += 1
+
+    # dead units keep a stale meter, they are masked out of the ready set
+    # computed from the last turn like ArenaEnv's meter_at, so both agree on float rounding
+    np.multiply(self.meter_step, self.tick - self.last_turn, out=self.speed_meter)
+    ready = np.flatnonzero(self.alive & (self.speed_meter >= METER_FULL))
+
+    if len(ready) > 0:
+      # same order as speed_sort : fullest meter first, setup order on ties
+      actors = ready[np.argsort(-self.speed_meter[ready], kind="stable")]
+      targets = self.pick_targets(actors)
+      self.resolve_actions(actors, targets)
+
+      dead = self.alive & (self.current_hp <= 0)
+      if dead.any():
+        self.alive &= ~dead
+        self.refresh_enemy_index()
+
+    return False
+
+  # targets are drawn among the enemies alive at the start of the tick,
+  # like ArenaEnv does with its end of tick unit_list rebuild
+  def pick_targets(self, actors : np.ndarray) -> np.ndarray:
+    targets = np.empty(len(actors), dtype=np.int64)
+    actor_teams = self.team[actors]
+
+    for team_id in range(self.team_count):
+      team_actors = np.flatnonzero(actor_teams == team_id)
+      if len(team_actors) > 0:
+        enemies = self.enemy_index[team_id]
+        targets[team_actors] = enemies[self.rng.integers(0, len(enemies), size=len(team_actors))]
+
+    return targets
+
+  def resolve_actions(self, actors : np.ndarray, targets : np.ndarray):
+    damage = self.strength[actors]
+
+    # fast path : if every actor survives even the worst case of all the hits
+    # aimed at it this tick, nobody gets skipped and the tick applies in one go
+    incoming = np.bincount(targets, weights=damage, minlength=len(self.current_hp))
+    if (self.current_hp[actors] - incoming[actors] > 0).all():
+      np.subtract.at(self.current_hp, targets, damage)
+      self.last_turn[actors] = self.tick
+      return
+
+    current_hp = self.current_hp
+    for actor, target, hit in zip(actors.tolist(), targets.tolist(), damage.tolist()):
+      # could have been killed by a previous unit of the tick
+      if current_hp[actor] > 0:
+        current_hp[target] -= hit
+        self.last_turn[actor] = self.tick
+
+  def winner_team_id(self) -> int | None:
+    return self.winner
+
+  # the winning team as a CombatTeam of its survivors (setup order and hp), None if nobody is left
+  def winner_team(self) -> CombatTeam | None:
+    if self.winner is None:
+      return None
+    team = CombatTeam(self.winner)
+    for unit_index in np.flatnonzero(self.alive & (self.team == self.winner)).tolist():
+      unit = CombatEntity(self.templates[unit_index])
+      unit.setup_order = unit_index
+      unit.current_hp = int(self.current_hp[unit_index])
+      team.add_unit(unit)
+    return team
+
+  def run_battle(self, max_ticks : int = 1_000_000) -> bool:
+    while not self.fight_battle():
+      if self.tick >= max_ticks:
+        return False
+    return True
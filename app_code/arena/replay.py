@@ -0,0 +1,173 @@
+# Battle replays
+# a battle is recorded as a stream of fixed width binary events
+# (tick, actor id, target id, damage, target hp after the hit, death flag)
+# written into a preallocated buffer, then saved to a file that the reader
+# memory maps to iterate or seek events without simulating the battle again
+#
+# hp changes of status effects (damage over time, regen) are recorded as a unit
+# hitting itself, with a negative damage for healing. Version 1 files are the
+# same without them
+#
+# file layout :
+#   header      magic, version, record size, event count, winner, unit table offset
+#   events      event count fixed width records, sorted by tick
+#   unit table  one (team id, name) entry per unit, unit ids are the setup order
+
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from typing import NamedTuple
+
+from app_code.events.events import AttackEvent, BattleOverEvent, BattleStartEvent, EffectHpEvent, EventBus
+
+REPLAY_MAGIC = b"BSRP"
+REPLAY_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+HEADER = struct.Struct("<4sHHQiQ")
+EVENT = struct.Struct("<IIIiiB3x")
+UNIT_ENTRY = struct.Struct("<HB")
+TICK = struct.Struct("<I")
+
+# events decoded per slice of the mapping when iterating
+READ_CHUNK = 65536
+
+NO_WINNER = -1
+
+class ReplayEvent(NamedTuple):
+  tick : int
+  actor : int
+  target : int
+  damage : int
+  target_hp : int
+  died : bool
+
+  # hp change of a status effect rather than an attack
+  @property
+  def effect(self) -> bool:
+    return self.actor == self.target
+
+class ReplayWriter:
+  def __init__(self, capacity : int = 4096):
+    self.buffer : bytearray = bytearray(capacity * EVENT.size)
+    self.event_count : int = 0
+    self.units : list[tuple[int, str]] = []
+    self.winner : int = NO_WINNER
+
+  # records the battles of the arena publishing on event_bus
+  def attach(self, event_bus : EventBus):
+    event_bus.subscribe(BattleStartEvent, self.on_battle_start)
+    event_bus.subscribe(AttackEvent, self.on_attack)
+    event_bus.subscribe(EffectHpEvent, self.on_effect_hp)
+    event_bus.subscribe(BattleOverEvent, self.on_battle_over)
+
+  def detach(self, event_bus : EventBus):
+    event_bus.unsubscribe(BattleStartEvent, self.on_battle_start)
+    event_bus.unsubscribe(AttackEvent, self.on_attack)
+    event_bus.unsubscribe(EffectHpEvent, self.on_effect_hp)
+    event_bus.unsubscribe(BattleOverEvent, self.on_battle_over)
+
+  def on_battle_start(self, event : BattleStartEvent):
+    self.reset([(unit.team.team_id, unit.template.name) for unit in event.units])
+
+  def on_attack(self, event : AttackEvent):
+    self.record(event.tick, event.attacker.setup_order, event.target.setup_order, event.damage,
+                event.target.current_hp, event.killed)
+
+  def on_effect_hp(self, event : EffectHpEvent):
+    unit_id = event.unit.setup_order
+    self.record(event.tick, unit_id, unit_id, -event.change, event.unit.current_hp, event.killed)
+
+  def on_battle_over(self, event : BattleOverEvent):
+    self.winner = NO_WINNER if event.winner is None else event.winner.team_id
+
+  # units are (team id, template name) in setup order
+  def reset(self, units : list[tuple[int, str]]):
+    self.event_count = 0
+    self.units = units
+    self.winner = NO_WINNER
+
+  def record(self, tick : int, actor : int, target : int, damage : int, target_hp : int, died : bool):
+    offset = self.event_count * EVENT.size
+    if offset == len(self.buffer):
+      # out of room, double the buffer
+      self.buffer.extend(bytes(len(self.buffer) or EVENT.size))
+    EVENT.pack_into(self.buffer, offset, tick, actor, target, damage, target_hp, died)
+    self.event_count += 1
+
+  def save(self, path : str):
+    unit_table_offset = HEADER.size + self.event_count * EVENT.size
+
+    with open(path, "wb") as replay_file:
+      replay_file.write(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, EVENT.size, self.event_count,
+                                    self.winner, unit_table_offset))
+      replay_file.write(memoryview(self.buffer)[:self.event_count * EVENT.size])
+      for team_id, name in self.units:
+        encoded_name = name.encode()[:255]
+        replay_file.write(UNIT_ENTRY.pack(team_id, len(encoded_name)))
+        replay_file.write(encoded_name)
+
+class ReplayReader:
+  def __init__(self, path : str):
+    with open(path, "rb") as replay_file:
+      # an empty file can't even be mapped
+      if os.fstat(replay_file.fileno()).st_size < HEADER.size:
+        raise ValueError(f"{path} is too short to be a battle replay")
+      self.mapping : mmap.mmap = mmap.mmap(replay_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, record_size, event_count, winner, unit_table_offset = HEADER.unpack_from(self.mapping, 0)
+    if magic != REPLAY_MAGIC or version not in READABLE_VERSIONS or record_size != EVENT.size:
+      self.mapping.close()
+      raise ValueError(f"{path} is not a version {' or '.join(map(str, READABLE_VERSIONS))} battle replay")
+
+    self.event_count : int = event_count
+    self.winner : int | None = None if winner == NO_WINNER else winner
+    self.units : list[tuple[int, str]] = []
+
+    offset = unit_table_offset
+    while offset < len(self.mapping):
+      team_id, name_length = UNIT_ENTRY.unpack_from(self.mapping, offset)
+      offset += UNIT_ENTRY.size
+      self.units.append((team_id, self.mapping[offset:offset + name_length].decode()))
+      offset += name_length
+
+  def __len__(self) -> int:
+    return self.event_count
+
+  def __getitem__(self, index : int) -> ReplayEvent:
+    if index < 0:
+      index += self.event_count
+    if not 0 <= index < self.event_count:
+      raise IndexError("replay event index out of range")
+    return self.read_event(index)
+
+  def __iter__(self):
+    return self.iter_events()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def read_event(self, index : int) -> ReplayEvent:
+    tick, actor, target, damage, target_hp, died = EVENT.unpack_from(self.mapping, HEADER.size + index * EVENT.size)
+    return ReplayEvent(tick, actor, target, damage, target_hp, bool(died))
+
+  def iter_events(self, start : int = 0):
+    for chunk_start in range(start, self.event_count, READ_CHUNK):
+      chunk_end = min(chunk_start + READ_CHUNK, self.event_count)
+      chunk = self.mapping[HEADER.size + chunk_start * EVENT.size:HEADER.size + chunk_end * EVENT.size]
+      for tick, actor, target, damage, target_hp, died in EVENT.iter_unpack(chunk):
+        yield ReplayEvent(tick, actor, target, damage, target_hp, bool(died))
+
+  # index of the first event on or after tick, events are sorted by tick
+  def seek_tick(self, tick : int) -> int:
+    return bisect_left(range(self.event_count), tick, key=lambda index: self.read_tick(index))
+
+  def read_tick(self, index : int) -> int:
+    return TICK.unpack_from(self.mapping, HEADER.size + index * EVENT.size)[0]
+
+  def close(self):
+    self.mapping.close()
@@ -0,0 +1,164 @@
+# Target selection policies
+# fight_battle asks the policy of the acting unit's team (ArenaEnv.target_policies)
+# for a target, teams without one keep the uniform random pick
+#
+# RolloutTargetPolicy is an anytime Monte Carlo search : the battle is forked
+# once per decision, every candidate target is tried on the fork and the battle
+# played out at random from there, a UCB1 bandit spreading the rollouts over
+# the candidates. When the rollout or time budget runs out the target with the
+# best mean outcome is attacked. A candidate attack is played on the fork with
+# the rest of its tick, so rollouts all start from the end of that tick.
+# Rollouts always run on the event scheduler, whatever the battle uses : the
+# tick scheduler plays them about 40 times slower
+
+import heapq
+import math
+import random
+import time
+
+from app_code.arena.arena import ArenaEnv, BattleSnapshot, CombatEntity, SchedulerEnum
+
+class TargetPolicy:
+  def choose_target(self, arena : ArenaEnv, unit : CombatEntity) -> CombatEntity:
+    raise NotImplementedError
+
+# what fight_battle does without a policy
+class RandomTargetPolicy(TargetPolicy):
+  def choose_target(self, arena : ArenaEnv, unit : CombatEntity) -> CombatEntity:
+    return arena.pick_target(unit)
+
+class RolloutTargetPolicy(TargetPolicy):
+  # rollouts and time_budget (seconds) bound every decision, whichever comes first
+  # a rollout stops after horizon ticks and then scores the hp left on each side
+  # with a rollout budget only, decisions are reproducible for a given seed
+  def __init__(self, rollouts : int | None = 64, time_budget : float | None = None, horizon : int = 5000,
+               exploration : float = math.sqrt(2), seed : int | None = None):
+    if rollouts is None and time_budget is None:
+      raise ValueError("a rollout policy needs a rollout budget, a time budget or both")
+    self.rollouts : int | None = rollouts
+    self.time_budget : float | None = time_budget
+    self.horizon : int = horizon
+    self.exploration : float = exploration
+    self.rng : random.Random = random.Random(seed)
+
+    self.decisions : int = 0
+    self.total_rollouts : int = 0
+    self.search_time : float = 0.0
+
+  def choose_target(self, arena : ArenaEnv, unit : CombatEntity) -> CombatEntity:
+    start = time.perf_counter()
+    candidates = self.candidates(arena, unit)
+    if len(candidates) == 1:
+      self.decisions += 1
+      self.search_time += time.perf_counter() - start
+      return candidates[0]
+
+    deadline = None if self.time_budget is None else start + self.time_budget
+    sim = arena.fork(scheduler=SchedulerEnum.EVENT)
+    # the battle right after each candidate attack, every rollout of that candidate starts there
+    snapshot = arena.snapshot()
+    outcomes = [self.apply_attack(sim, snapshot, unit.setup_order, target.setup_order) for target in candidates]
+    visits = [0] * len(candidates)
+    values = [0.0] * len(candidates)
+
+    rollouts = 0
+    while (self.rollouts is None or rollouts < self.rollouts) and (deadline is None or time.perf_counter() < deadline):
+      choice = self.select(visits, values, rollouts)
+      values[choice] += self.rollout(sim, outcomes[choice], unit.team.team_id)
+      visits[choice] += 1
+      rollouts += 1
+
+    best = max(range(len(candidates)), key=lambda i: (values[i] / visits[i] if visits[i] else -1.0, visits[i]))
+    self.decisions += 1
+    self.total_rollouts += rollouts
+    self.search_time += time.perf_counter() - start
+    return candidates[best]
+
+  # alive enemies, one per kind of (team, template, hp, effective stats, meter, effects and their timers) :
+  # equal units lead to the same battles, hitting another team doesn't
+  def candidates(self, arena : ArenaEnv, unit : CombatEntity) -> list[CombatEntity]:
+    kinds = {}
+    for team in arena.combat_teams:
+      if team is unit.team:
+        continue
+      for enemy in team.unit_list:
+        if enemy.current_hp > 0:
+          effects = tuple((active.effect, active.expires_at, active.next_period) for active in enemy.effects or ())
+          kinds.setdefault((team.team_id, id(enemy.template), enemy.current_hp, enemy.strength, enemy.speed,
+                            enemy.speed_meter, enemy.meter_tick, effects), enemy)
+    if kinds == {}:
+      # every enemy already died this tick, any pick wastes the hit
+      return [arena.pick_target(unit)]
+    return list(kinds.values())
+
+  # snapshot of sim at the end of the tick, after unit hits target from the battle state of snapshot
+  # the units still due this tick then act at random like fight_battle would have them : in speed_sort
+  # order, skipped if killed, and units killed this tick stay targetable until the tick is over
+  def apply_attack(self, sim : ArenaEnv, snapshot : BattleSnapshot, actor : int, target : int) -> BattleSnapshot:
+    sim.restore(snapshot)
+    self.take_turn(sim, sim.units[actor], sim.units[target])
+    for unit in self.pending_turns(sim):
+      if unit.current_hp > 0:
+        self.take_turn(sim, unit, sim.pick_target(unit))
+
+    for team in sim.combat_teams:
+      for dead in [member for member in team.unit_list if member.current_hp <= 0]:
+        team.remove_unit(dead)
+    sim.combat_teams = [team for team in sim.combat_teams if team.unit_list != []]
+    return sim.snapshot()
+
+  def take_turn(self, sim : ArenaEnv, unit : CombatEntity, target : CombatEntity):
+    target.current_hp -= unit.attack()
+    unit.speed_meter = 0
+    unit.last_turn = sim.tick
+    unit.meter_tick = sim.tick
+    sim.schedule_turn(unit)
+
+  # units of the current tick whose turn hasn't come yet, in the order fight_battle runs them
+  def pending_turns(self, sim : ArenaEnv) -> list[CombatEntity]:
+    # restore queued their turns on this tick again, the ones taken since are stale
+    pending = []
+    turn_queue = sim.turn_queue
+    while turn_queue != [] and turn_queue[0][0] == sim.tick:
+      entry = heapq.heappop(turn_queue)
+      if entry is entry[3].turn_entry:
+        pending.append(entry[3])
+    return pending
+
+  # UCB1, every candidate is tried once first
+  def select(self, visits : list[int], values : list[float], rollouts : int) -> int:
+    for i, count in enumerate(visits):
+      if count == 0:
+        return i
+    log_total = math.log(rollouts)
+    return max(range(len(visits)),
+               key=lambda i: values[i] / visits[i] + self.exploration * math.sqrt(log_total / visits[i]))
+
+  # 1 if team_id wins the random playout, 0 if it loses, its share of the hp left at the horizon otherwise
+  def rollout(self, sim : ArenaEnv, snapshot : BattleSnapshot, team_id : int) -> float:
+    sim.restore(snapshot)
+    sim.rng.seed(self.rng.getrandbits(64))
+    horizon = sim.tick + self.horizon
+    while not sim.fight_battle(horizon):
+      if sim.tick >= horizon:
+        return self.hp_share(sim, team_id)
+    return 1.0 if sim.winner_team_id() == team_id else 0.0
+
+  def hp_share(self, sim : ArenaEnv, team_id : int) -> float:
+    total = own = 0
+    for team in sim.combat_teams:
+      team_hp = sum(max(unit.current_hp, 0) for unit in team.unit_list)
+      total += team_hp
+      if team.team_id == team_id:
+        own = team_hp
+    return own / total if total else 0.5
+
+  def decisions_per_sec(self) -> float:
+    return self.decisions / self.search_time if self.search_time > 0 else 0.0
+
+  def rollouts_per_sec(self) -> float:
+    return self.total_rollouts / self.search_time if self.search_time > 0 else 0.0
+
+  def report(self) -> str:
+    return (f"{self.decisions} decisions, {self.total_rollouts} rollouts in {self.search_time:.2f}s : "
+            f"{self.decisions_per_sec():.1f} decisions/sec, {self.rollouts_per_sec():.0f} rollouts/sec")
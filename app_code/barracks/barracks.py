@@ -5,19 +5,35 @@
 
 import random
 
+# a template is shared by every CombatEntity built from it (flyweight)
+# once frozen it can't be changed anymore, make a new template instead
 class FighterTemplate:
+  # frozen stays last so copy and pickle restore the stats before freezing
+  __slots__ = ("name", "strength", "agility", "speed", "max_hp", "frozen")
+
   def __init__(self, name):
+    self.frozen : bool = False
     self.name : str = name
     self.strength : int = 1
     self.agility : int = 1
     self.speed : int = 1
     self.max_hp : int = 40
 
-  def init_fighter(self):
+  def __setattr__(self, attr, value):
+    if attr != "frozen" and getattr(self, "frozen", False):
+      raise AttributeError(f"FighterTemplate '{self.name}' is frozen, can't set {attr}")
+    object.__setattr__(self, attr, value)
+
+  def freeze(self) -> "FighterTemplate":
+    self.frozen = True
+    return self
+
+  # rng defaults to the global random module, pass a random.Random for reproducible fighters
+  def init_fighter(self, rng = random):
     upgrades_pool = 10
 
     for i in range(upgrades_pool):
-      stat = random.randint(1, 5)
+      stat = rng.randint(1, 5)
       if stat == 1:
         self.strength += 1
       elif stat == 2:
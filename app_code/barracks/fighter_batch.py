@@ -0,0 +1,61 @@
+# Bulk random fighters
+# FighterTemplate.init_fighter draws ten upgrades one by one : strength,
+# agility and speed 1/5 each, max_hp (+10) 2/5. The counts of the four upgrade
+# kinds over ten draws follow a multinomial law, so a whole batch is one
+# numpy multinomial draw and the stats are kept as arrays
+#
+# FighterTemplates are only built when a fighter is looked up, a million
+# fighters cost 4 small int arrays instead of a million objects
+
+from collections.abc import Sequence
+
+import numpy as np
+
+from app_code.barracks.barracks import FighterTemplate
+
+UPGRADES_POOL = 10
+# strength, agility, speed, max_hp, like randint(1, 5) in init_fighter
+UPGRADE_ODDS = (0.2, 0.2, 0.2, 0.4)
+HP_PER_UPGRADE = 10
+
+class FighterBatch(Sequence):
+  # count fighters upgraded from base (a default FighterTemplate when None)
+  # the same seed always gives the same batch
+  def __init__(self, count : int, seed : int | None = None, base : FighterTemplate | None = None,
+               name_prefix : str = "Fighter"):
+    if base is None:
+      base = FighterTemplate(name_prefix)
+    self.name_prefix : str = name_prefix
+
+    rng = np.random.default_rng(seed)
+    upgrades = rng.multinomial(UPGRADES_POOL, UPGRADE_ODDS, size=count).astype(np.int32)
+
+    self.strength : np.ndarray = base.strength + upgrades[:, 0]
+    self.agility : np.ndarray = base.agility + upgrades[:, 1]
+    self.speed : np.ndarray = base.speed + upgrades[:, 2]
+    self.max_hp : np.ndarray = base.max_hp + HP_PER_UPGRADE * upgrades[:, 3]
+
+  def __len__(self) -> int:
+    return len(self.strength)
+
+  # a new frozen template on every lookup, nothing is kept per fighter
+  def __getitem__(self, index):
+    if isinstance(index, slice):
+      return [self.template(i) for i in range(*index.indices(len(self)))]
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("fighter index out of range")
+    return self.template(index)
+
+  def template(self, index : int) -> FighterTemplate:
+    template = FighterTemplate(f"{self.name_prefix}{index}")
+    template.strength = int(self.strength[index])
+    template.agility = int(self.agility[index])
+    template.speed = int(self.speed[index])
+    template.max_hp = int(self.max_hp[index])
+    return template.freeze()
+
+  # stats as a (count, 4) array, columns in FighterTemplate order
+  def stats(self) -> np.ndarray:
+    return np.stack([self.strength, self.agility, self.speed, self.max_hp], axis=1)
@@ -1,32 +1,16 @@
 
-from app_code.barracks.barracks import FighterTemplate
+import os
 
-PREGEN_UNIT_DB = {}
+from app_code.barracks.unit_database import UnitDatabase
 
-def get_pregen_unit_database()  -> dict[str, FighterTemplate]:
-  
-  return PREGEN_UNIT_DB
+# the pregen templates are defined in pregen_units.csv
+PREGEN_UNITS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pregen_units.csv")
 
-goblin = FighterTemplate("Goblin")
-goblin.strength = 1
-goblin.agility = 4
-goblin.speed = 5
-goblin.max_hp = 40
+_pregen_unit_db : UnitDatabase | None = None
 
-PREGEN_UNIT_DB[goblin.name] = goblin
-
-bandit = FighterTemplate("Bandit")
-bandit.strength = 3
-bandit.agility = 2
-bandit.speed = 2
-bandit.max_hp = 60
-
-PREGEN_UNIT_DB[bandit.name] = bandit
-
-giant = FighterTemplate("Giant")
-giant.strength = 15
-giant.agility = 2
-giant.speed = 3
-giant.max_hp = 300
-
-PREGEN_UNIT_DB[giant.name] = giant
+# opened on first use, templates are then loaded by name when looked up
+def get_pregen_unit_database() -> UnitDatabase:
+  global _pregen_unit_db
+  if _pregen_unit_db is None:
+    _pregen_unit_db = UnitDatabase.open(PREGEN_UNITS_PATH)
+  return _pregen_unit_db
@@ -0,0 +1,166 @@
+# Unit templates loaded from a data file
+# the source is a csv file, one template per row :
+#
+#   name,strength,agility,speed,max_hp
+#   Goblin,1,4,5,40
+#
+# it is validated and compiled once into a binary cache (in __pycache__ next to
+# the source, like .pyc files) that stays valid until the source size or
+# modification time changes. Opening a database only reads the cache and the
+# name index, templates are built and frozen the first time they are looked up
+#
+# cache layout :
+#   header   magic, version, record size, source size, source mtime, template count, names length
+#   records  template count fixed width stat records, in source order
+#   names    template names joined by newlines
+
+import csv
+import os
+import struct
+from collections.abc import Iterator, Mapping
+
+from app_code.barracks.barracks import FighterTemplate
+
+CACHE_MAGIC = b"BSUD"
+CACHE_VERSION = 1
+
+HEADER = struct.Struct("<4sHHQqII")
+RECORD = struct.Struct("<iiii")
+# stats are stored as int32 in the records
+MAX_STAT = 2 ** 31 - 1
+
+STAT_FIELDS = ("strength", "agility", "speed", "max_hp")
+SOURCE_FIELDS = ("name",) + STAT_FIELDS
+
+# characters the team syntax of the command line uses, and the newline the cache joins names with
+RESERVED_NAME_CHARS = ",+\n"
+
+# reads and validates a unit csv file
+# returns (name, strength, agility, speed, max_hp) rows, raises ValueError on bad data
+def read_unit_source(source_path : str) -> list[tuple[str, int, int, int, int]]:
+  rows = []
+  seen = set()
+
+  with open(source_path, newline="", encoding="utf-8") as source_file:
+    reader = csv.DictReader(source_file)
+    missing = [field for field in SOURCE_FIELDS if field not in (reader.fieldnames or [])]
+    if missing:
+      raise ValueError(f"{source_path}: missing column(s) {', '.join(missing)}")
+
+    # first line of the row, a quoted name can span several
+    line = reader.line_num + 1
+    for row in reader:
+      where = f"{source_path}:{line}"
+      line = reader.line_num + 1
+      name = (row["name"] or "").strip()
+      if not name:
+        raise ValueError(f"{where}: empty unit name")
+      if any(char in name for char in RESERVED_NAME_CHARS):
+        raise ValueError(f"{where}: unit name {name!r} can't contain {', '.join(map(repr, RESERVED_NAME_CHARS))}")
+      if name in seen:
+        raise ValueError(f"{where}: duplicate unit '{name}'")
+      seen.add(name)
+
+      stats = []
+      for field in STAT_FIELDS:
+        try:
+          value = int(row[field])
+        except (TypeError, ValueError):
+          raise ValueError(f"{where}: {field} of '{name}' must be an integer, got {row[field]!r}") from None
+        if not 0 <= value <= MAX_STAT or (field == "max_hp" and value == 0):
+          raise ValueError(f"{where}: {field} of '{name}' out of range ({value})")
+        stats.append(value)
+
+      rows.append((name, *stats))
+
+  return rows
+
+def default_cache_path(source_path : str) -> str:
+  directory, file_name = os.path.split(os.path.abspath(source_path))
+  return os.path.join(directory, "__pycache__", os.path.splitext(file_name)[0] + ".units.bin")
+
+# validates source_path and writes its compiled form to cache_path
+def compile_unit_file(source_path : str, cache_path : str) -> bytes:
+  source_stat = os.stat(source_path)
+  data = compile_units(read_unit_source(source_path), source_stat.st_size, source_stat.st_mtime_ns)
+
+  # written aside then renamed, so workers starting at the same time never read half a cache
+  os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+  temp_path = f"{cache_path}.{os.getpid()}.tmp"
+  with open(temp_path, "wb") as cache_file:
+    cache_file.write(data)
+  os.replace(temp_path, cache_path)
+  return data
+
+def compile_units(rows : list[tuple[str, int, int, int, int]], source_size : int = 0, source_mtime : int = 0) -> bytes:
+  names = "\n".join(row[0] for row in rows).encode()
+  parts = [HEADER.pack(CACHE_MAGIC, CACHE_VERSION, RECORD.size, source_size, source_mtime, len(rows), len(names))]
+  parts += [RECORD.pack(*row[1:]) for row in rows]
+  parts.append(names)
+  return b"".join(parts)
+
+# the compiled cache of source_path if it is up to date, else None
+def read_cache(source_path : str, cache_path : str) -> bytes | None:
+  try:
+    source_stat = os.stat(source_path)
+    with open(cache_path, "rb") as cache_file:
+      data = cache_file.read()
+  except OSError:
+    return None
+
+  if len(data) < HEADER.size:
+    return None
+  magic, version, record_size, source_size, source_mtime, count, names_length = HEADER.unpack_from(data, 0)
+  if (magic != CACHE_MAGIC or version != CACHE_VERSION or record_size != RECORD.size
+      or source_size != source_stat.st_size or source_mtime != source_stat.st_mtime_ns
+      or len(data) != HEADER.size + count * RECORD.size + names_length):
+    return None
+  return data
+
+# read only name -> FighterTemplate mapping over a compiled unit file
+# templates are built on first lookup and shared afterwards (they are frozen)
+class UnitDatabase(Mapping):
+  def __init__(self, data : bytes):
+    count, names_length = HEADER.unpack_from(data, 0)[5:]
+    names_offset = HEADER.size + count * RECORD.size
+    names = data[names_offset:names_offset + names_length].decode().split("\n") if count else []
+
+    self.data : bytes = data
+    self.index : dict[str, int] = {name: i for i, name in enumerate(names)}
+    self.templates : dict[str, FighterTemplate] = {}
+
+  # uses the cache when it is up to date, recompiles it otherwise
+  @classmethod
+  def open(cls, source_path : str, cache_path : str | None = None) -> "UnitDatabase":
+    cache_path = cache_path or default_cache_path(source_path)
+    data = read_cache(source_path, cache_path)
+    if data is None:
+      try:
+        data = compile_unit_file(source_path, cache_path)
+      except OSError:
+        # read only install, compile in memory every time (a missing source raises again here)
+        data = compile_units(read_unit_source(source_path))
+    return cls(data)
+
+  def __getitem__(self, name : str) -> FighterTemplate:
+    template = self.templates.get(name)
+    if template is None:
+      template = self.templates[name] = self.load_template(name)
+    return template
+
+  def __contains__(self, name) -> bool:
+    return name in self.index
+
+  def __iter__(self) -> Iterator[str]:
+    return iter(self.index)
+
+  def __len__(self) -> int:
+    return len(self.index)
+
+  def load_template(self, name : str) -> FighterTemplate:
+    # KeyError for unknown names, like a dict
+    record = self.index[name]
+    template = FighterTemplate(name)
+    template.strength, template.agility, template.speed, template.max_hp = \
+      RECORD.unpack_from(self.data, HEADER.size + record * RECORD.size)
+    return template.freeze()
@@ -0,0 +1,103 @@
+# Battle event bus
+# the arena, the state machine and the game loop publish typed events,
+# subscribers (console log, replay writer, stats...) register per event type
+# and do their own formatting, only when they actually receive something
+#
+# hot paths check wants() before building an event, so with no subscriber
+# attached a headless battle only pays a dict lookup per event
+
+class EventBus:
+  def __init__(self):
+    self.handlers : dict[type, list] = {}
+
+  def subscribe(self, event_type : type, handler):
+    self.handlers.setdefault(event_type, []).append(handler)
+
+  def unsubscribe(self, event_type : type, handler):
+    handlers = self.handlers.get(event_type, [])
+    if handler in handlers:
+      handlers.remove(handler)
+    if handlers == []:
+      self.handlers.pop(event_type, None)
+
+  def wants(self, event_type : type) -> bool:
+    return event_type in self.handlers
+
+  def publish(self, event):
+    for handler in self.handlers.get(type(event), ()):
+      handler(event)
+
+
+######### game loop events ###################
+
+class LoopEvent:
+  __slots__ = ("loop",)
+
+  def __init__(self, loop):
+    self.loop : int = loop
+
+class EngineStepEvent:
+  __slots__ = ("step",)
+
+  def __init__(self, step):
+    self.step : str = step
+
+class StateTransitionEvent:
+  __slots__ = ("previous", "state")
+
+  def __init__(self, previous, state):
+    self.previous = previous
+    self.state = state
+
+
+######### battle events ###################
+
+# units are the CombatEntity objects of the arena, listed in setup order
+class BattleStartEvent:
+  __slots__ = ("units",)
+
+  def __init__(self, units):
+    self.units : list = units
+
+class BattleTickEvent:
+  __slots__ = ("tick",)
+
+  def __init__(self, tick):
+    self.tick : int = tick
+
+class AttackEvent:
+  __slots__ = ("tick", "attacker", "target", "damage", "killed")
+
+  def __init__(self, tick, attacker, target, damage, killed):
+    self.tick : int = tick
+    self.attacker = attacker
+    self.target = target
+    self.damage : int = damage
+    self.killed : bool = killed
+
+class DeathEvent:
+  __slots__ = ("tick", "unit")
+
+  def __init__(self, tick, unit):
+    self.tick : int = tick
+    self.unit = unit
+
+# hp change of a periodic effect (damage over time or regen) on unit, change is what
+# was actually applied after the max_hp cap, negative for damage
+class EffectHpEvent:
+  __slots__ = ("tick", "unit", "effect", "change", "killed")
+
+  def __init__(self, tick, unit, effect, change, killed):
+    self.tick : int = tick
+    self.unit = unit
+    self.effect = effect
+    self.change : int = change
+    self.killed : bool = killed
+
+# winner is the winning CombatTeam, None if nobody is left
+class BattleOverEvent:
+  __slots__ = ("tick", "winner")
+
+  def __init__(self, tick, winner):
+    self.tick : int = tick
+    self.winner = winner
@@ -0,0 +1,90 @@
+# Ready made event subscribers
+
+from app_code.events.events import (AttackEvent, BattleOverEvent, BattleTickEvent, DeathEvent, EngineStepEvent,
+                                    EventBus, LoopEvent, StateTransitionEvent)
+
+# prints the game loop, like the engine used to do with print calls
+class ConsoleLogger:
+  def __init__(self, log_attacks = False):
+    self.log_attacks : bool = log_attacks
+    self.subscriptions = [
+      (LoopEvent, self.on_loop),
+      (EngineStepEvent, self.on_engine_step),
+      (StateTransitionEvent, self.on_state_transition),
+      (BattleTickEvent, self.on_battle_tick),
+      (BattleOverEvent, self.on_battle_over),
+    ]
+    if log_attacks:
+      self.subscriptions += [(AttackEvent, self.on_attack), (DeathEvent, self.on_death)]
+
+  def attach(self, event_bus : EventBus):
+    for event_type, handler in self.subscriptions:
+      event_bus.subscribe(event_type, handler)
+
+  def detach(self, event_bus : EventBus):
+    for event_type, handler in self.subscriptions:
+      event_bus.unsubscribe(event_type, handler)
+
+  def on_loop(self, event : LoopEvent):
+    print("\n loop : ", event.loop, "\n")
+
+  def on_engine_step(self, event : EngineStepEvent):
+    print(event.step)
+
+  def on_state_transition(self, event : StateTransitionEvent):
+    print("state :", event.previous.name, "->", event.state.name)
+
+  def on_battle_tick(self, event : BattleTickEvent):
+    print("doing battle ! tick", event.tick)
+
+  def on_attack(self, event : AttackEvent):
+    print(f"  [{event.tick}] {event.attacker.template.name} #{event.attacker.setup_order} hits "
+          f"{event.target.template.name} #{event.target.setup_order} for {event.damage} ({event.target.current_hp} hp left)")
+
+  def on_death(self, event : DeathEvent):
+    print(f"  [{event.tick}] {event.unit.template.name} #{event.unit.setup_order} dies")
+
+  def on_battle_over(self, event : BattleOverEvent):
+    if event.winner is None:
+      print("battle over ! nobody is left standing")
+    else:
+      names = ", ".join(sorted({unit.template.name for unit in event.winner.unit_list}))
+      print("battle over ! team", event.winner.team_id, f"({names}) has won")
+
+# tallies attacks, damage and deaths per template name
+class StatsCollector:
+  def __init__(self):
+    self.attacks : dict[str, int] = {}
+    self.damage_dealt : dict[str, int] = {}
+    self.deaths : dict[str, int] = {}
+    self.wins : dict[int, int] = {}
+
+  def attach(self, event_bus : EventBus):
+    event_bus.subscribe(AttackEvent, self.on_attack)
+    event_bus.subscribe(DeathEvent, self.on_death)
+    event_bus.subscribe(BattleOverEvent, self.on_battle_over)
+
+  def detach(self, event_bus : EventBus):
+    event_bus.unsubscribe(AttackEvent, self.on_attack)
+    event_bus.unsubscribe(DeathEvent, self.on_death)
+    event_bus.unsubscribe(BattleOverEvent, self.on_battle_over)
+
+  def on_attack(self, event : AttackEvent):
+    name = event.attacker.template.name
+    self.attacks[name] = self.attacks.get(name, 0) + 1
+    self.damage_dealt[name] = self.damage_dealt.get(name, 0) + event.damage
+
+  def on_death(self, event : DeathEvent):
+    name = event.unit.template.name
+    self.deaths[name] = self.deaths.get(name, 0) + 1
+
+  def on_battle_over(self, event : BattleOverEvent):
+    if event.winner is not None:
+      self.wins[event.winner.team_id] = self.wins.get(event.winner.team_id, 0) + 1
+
+  def summary(self) -> str:
+    lines = []
+    for name in sorted(self.attacks.keys() | self.deaths.keys()):
+      lines.append(f"  {name:<12} {self.attacks.get(name, 0):>8} attacks  {self.damage_dealt.get(name, 0):>9} damage"
+                   f"  {self.deaths.get(name, 0):>6} deaths")
+    return "\n".join(lines)
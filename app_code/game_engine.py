@@ -1,6 +1,15 @@
 from .game_state import GameState
 from .interfaces.hmi import Hmi
+from .interfaces.async_hmi import AsyncHmi
+from .interfaces.battle_view import draw_arena
+from .arena.arena import ArenaEnv, SchedulerEnum
+from .events.events import EngineStepEvent, EventBus
+from .events.subscribers import ConsoleLogger
+from .utils.profiling import Profiler
+from .utils.screen_buffer import ScreenBuffer, ScreenRenderer
+from .utils.console import Console
 
+import asyncio
 from enum import Enum
 
 class EngineStatusEnum(Enum):
@@ -15,22 +24,81 @@ class GameEngine():
     self.display_array = []
     self.hmi = None
     self.game_state = None
+    self.profiler = Profiler()
+    # the loop, the state machine and the arena publish here instead of printing
+    self.event_bus = EventBus()
+    self.console_logger = ConsoleLogger()
+    self.background_battles : list[asyncio.Task] = []
+    # set by enable_rendering, the arena is then drawn on every refresh_display
+    self.frame : ScreenBuffer | None = None
+    self.renderer : ScreenRenderer | None = None
 
-  def init(self):
+  # asynchronous : commands come from an AsyncHmi instead of a blocking input()
+  # and must be called from a running event loop
+  def init(self, asynchronous = False):
     self.status = EngineStatusEnum.RUNNING
-    self.hmi = Hmi()
+    self.hmi = AsyncHmi() if asynchronous else Hmi()
     self.hmi.init()
+    self.console_logger.attach(self.event_bus)
     self.game_state = GameState()
-    self.game_state.init()
+    self.game_state.init(self.event_bus)
+
+  # can be toggled any time, a disabled profiler costs one check per phase
+  def enable_profiling(self):
+    self.profiler.enable()
+    self.game_state.arena_env.profiler = self.profiler
+
+  def disable_profiling(self):
+    self.profiler.disable()
+    self.game_state.arena_env.profiler = None
 
   def request_inputs(self):
-    print("request inputs")
-    self.hmi.request_inputs(self.game_state.state)
+    if self.event_bus.wants(EngineStepEvent):
+      self.event_bus.publish(EngineStepEvent("request inputs"))
+    self.profiler.time_call("hmi.request_inputs", self.hmi.request_inputs, self.game_state.state)
 
   def update_game_state(self):
-    print("update game state")
-    self.game_state.process_state_machine(self.hmi.last_command)
+    if self.event_bus.wants(EngineStepEvent):
+      self.event_bus.publish(EngineStepEvent("update game state"))
+    self.profiler.time_call("game_state.process_state_machine", self.game_state.process_state_machine,
+                            self.hmi.last_command)
+
+  # same as update_game_state, then lets the other tasks of the loop run
+  async def update_game_state_async(self):
+    self.update_game_state()
+    await asyncio.sleep(0)
+
+  # fights another battle next to the game, a slice of fight_battle steps at a time
+  def start_background_battle(self, team_setups, steps_per_slice = 100) -> asyncio.Task:
+    arena = ArenaEnv()
+    arena.init()
+    arena.scheduler = SchedulerEnum.EVENT
+    arena.setup_battle(team_setups)
+
+    task = asyncio.create_task(fight_battle_async(arena, steps_per_slice))
+    self.background_battles.append(task)
+    return task
+
+  def enable_rendering(self, width = None, height = None):
+    terminal_width, terminal_height = Console.get_terminal_size()
+    self.frame = ScreenBuffer(width or terminal_width, height or terminal_height - 1)
+    self.renderer = ScreenRenderer()
+    # the log would scroll the frame away
+    self.console_logger.detach(self.event_bus)
 
   def refresh_display(self):
-    print("refresh display")
-    #nothing yet
\ No newline at end of file
+    if self.renderer is None:
+      if self.event_bus.wants(EngineStepEvent):
+        self.event_bus.publish(EngineStepEvent("refresh display"))
+      return
+
+    draw_arena(self.frame, self.game_state.arena_env)
+    self.renderer.present(self.frame)
+
+
+async def fight_battle_async(arena : ArenaEnv, steps_per_slice : int = 100) -> ArenaEnv:
+  while True:
+    for _ in range(steps_per_slice):
+      if arena.fight_battle():
+        return arena
+    await asyncio.sleep(0)
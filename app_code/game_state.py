@@ -1,16 +1,21 @@
 from ._common_enums.common_enums import GameStateEnum
 from ._common_enums.common_enums import PlayerCommands
 from .arena.arena import ArenaEnv
+from .events.events import BattleTickEvent, EventBus, StateTransitionEvent
 
 class GameState():
   def __init__(self):
     self.state = None
     self.arena_env = None
+    self.event_bus = EventBus()
 
-  def init(self):
+  def init(self, event_bus = None):
     self.state = GameStateEnum.SETUP
+    if event_bus is not None:
+      self.event_bus = event_bus
     self.arena_env = ArenaEnv()
     self.arena_env.init()
+    self.arena_env.event_bus = self.event_bus
 
     print("init game state")
 
@@ -19,16 +24,22 @@ class GameState():
       # shitty transition just for now
       match self.state:
           case GameStateEnum.SETUP:
-            print("prepare battle")
             self.arena_env.setup_battle()
-            self.state = GameStateEnum.BATTLE
+            self.change_state(GameStateEnum.BATTLE)
 
       # battle state just for now
           case GameStateEnum.BATTLE:
-            print("doing battle !")
+            if self.event_bus.wants(BattleTickEvent):
+              self.event_bus.publish(BattleTickEvent(self.arena_env.tick))
             if(self.arena_env.fight_battle()):
-              self.state = GameStateEnum.BATTLE_OVER
+              self.change_state(GameStateEnum.BATTLE_OVER)
 
           case GameStateEnum.BATTLE_OVER:
             if(command == PlayerCommands.BACK_TO_SETUP):
-              self.state = GameStateEnum.SETUP
+              self.change_state(GameStateEnum.SETUP)
+
+  def change_state(self, state):
+    previous = self.state
+    self.state = state
+    if self.event_bus.wants(StateTransitionEvent):
+      self.event_bus.publish(StateTransitionEvent(previous, state))
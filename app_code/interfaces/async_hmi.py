@@ -0,0 +1,63 @@
+import asyncio
+import sys
+import threading
+
+from .._common_enums.common_enums import GameStateEnum
+from .._common_enums.common_enums import PlayerCommands
+
+# Same commands as Hmi, but request_inputs never blocks :
+# commands are queued by a stdin reader thread or by anyone calling submit()
+class AsyncHmi():
+  def __init__(self):
+    self.last_command = None
+    self.commands : asyncio.Queue | None = None
+    self.loop : asyncio.AbstractEventLoop | None = None
+    self.prompted = False
+
+  # needs the running event loop
+  def init(self):
+    print("init async hmi")
+    self.loop = asyncio.get_running_loop()
+    self.commands = asyncio.Queue()
+
+  # the reader is a daemon thread so a pending readline never holds the process open
+  def start_stdin_reader(self):
+    threading.Thread(target=self.read_stdin, daemon=True).start()
+
+  def read_stdin(self):
+    for line in sys.stdin:
+      self.loop.call_soon_threadsafe(self.submit, parse_command(line))
+
+  def submit(self, command : PlayerCommands):
+    self.commands.put_nowait(command)
+
+  async def wait_command(self) -> PlayerCommands:
+    return await self.commands.get()
+
+  def request_inputs(self, state):
+
+    self.last_command = PlayerCommands.NONE
+
+    match(state):
+      case GameStateEnum.BATTLE_OVER:
+        if not self.prompted:
+          print("press y to continue \n")
+          self.prompted = True
+
+        # only the latest command counts, older ones were typed too early
+        while not self.commands.empty():
+          self.last_command = self.commands.get_nowait()
+
+        if self.last_command == PlayerCommands.BACK_TO_SETUP:
+          print("you pressed y")
+          self.prompted = False
+
+      case _:
+        # input typed outside of the battle over screen is ignored
+        while not self.commands.empty():
+          self.commands.get_nowait()
+
+def parse_command(line : str) -> PlayerCommands:
+  if line.strip() == "y":
+    return PlayerCommands.BACK_TO_SETUP
+  return PlayerCommands.NONE
@@ -0,0 +1,52 @@
+from ..utils.console import Colors
+from ..utils.screen_buffer import ScreenBuffer
+
+# Draws an ArenaEnv into a ScreenBuffer : one block of rows per team,
+# one cell per unit with its name, an hp bar and its hp
+
+TEAM_COLORS = [Colors.CYAN, Colors.MAGENTA, Colors.YELLOW, Colors.BLUE, Colors.WHITE]
+
+NAME_WIDTH = 8
+BAR_WIDTH = 10
+CELL_WIDTH = NAME_WIDTH + BAR_WIDTH + 7
+
+def hp_color(fraction : float) -> str:
+  if fraction > 0.5:
+    return Colors.GREEN
+  if fraction > 0.25:
+    return Colors.YELLOW
+  return Colors.RED
+
+def draw_arena(frame : ScreenBuffer, arena):
+  frame.clear()
+
+  status = f"tick {arena.tick}"
+  if arena.winner is not None:
+    status += f"   battle over ! team {arena.winner.team_id} has won"
+  frame.write(0, 0, status, Colors.BOLD)
+
+  team_units = {}
+  for unit in arena.units:
+    team_units.setdefault(unit.team.team_id, []).append(unit)
+
+  cells_per_row = max(1, frame.width // CELL_WIDTH)
+  y = 2
+  for team_id, units in team_units.items():
+    team_color = TEAM_COLORS[team_id % len(TEAM_COLORS)]
+    alive_count = sum(1 for unit in units if unit.current_hp > 0)
+    frame.write(0, y, f"team {team_id} ({alive_count}/{len(units)} alive)", Colors.BOLD + team_color)
+    y += 1
+
+    for index, unit in enumerate(units):
+      x = (index % cells_per_row) * CELL_WIDTH
+      row = y + index // cells_per_row
+      frame.write(x, row, unit.template.name[:NAME_WIDTH].ljust(NAME_WIDTH), team_color)
+
+      if unit.current_hp > 0:
+        fraction = unit.current_hp / unit.template.max_hp
+        frame.draw_bar(x + NAME_WIDTH + 1, row, BAR_WIDTH, fraction, hp_color(fraction))
+        frame.write(x + NAME_WIDTH + BAR_WIDTH + 2, row, str(unit.current_hp).rjust(4))
+      else:
+        frame.write(x + NAME_WIDTH + 1, row, "dead".ljust(BAR_WIDTH), Colors.DIM)
+
+    y += (len(units) + cells_per_row - 1) // cells_per_row + 1
@@ -4,6 +4,8 @@ from .._common_enums.common_enums import PlayerCommands
 class Hmi():
   def __init__(self):
     self.last_command = None
+    # False goes back to setup on its own once the battle is over, without asking
+    self.prompt = True
 
   def init(self):
     print("init hmi")
@@ -13,6 +15,8 @@ class Hmi():
     self.last_command = PlayerCommands.NONE
 
     match(state):
+      case GameStateEnum.BATTLE_OVER if not self.prompt:
+        self.last_command = PlayerCommands.BACK_TO_SETUP
       case GameStateEnum.BATTLE_OVER:
         input_str = input("press y to continue \n")
         if (input_str == "y"):
@@ -1,27 +1,98 @@
 
-import time
+import asyncio
+
 from .game_engine import GameEngine
 from .game_engine import EngineStatusEnum
+from .events.events import LoopEvent
+from .utils.game_clock import GameClock
+from .utils.profiling import profile_calls
 
 class Root :
   def __init__(self) :
     self.game = None
+    # 2 ticks and 2 frames per second by default, the pace of the old sleep(0.5) loop
+    self.clock = GameClock()
 
-  def init(self) :
+  def init(self, asynchronous = False) :
     print("init")
     self.game = GameEngine()
-    self.game.init()
+    self.game.init(asynchronous)
   
-  def run(self) :
+  # max_loops : stop after that many simulation ticks, runs until the engine stops otherwise
+  # stats_every : print the profiler summary every that many ticks (turns profiling on)
+  def run(self, max_loops = None, stats_every = 0) :
+    if stats_every > 0 :
+      self.game.enable_profiling()
+
+    profiler = self.game.profiler
+    clock = self.clock
+    clock.start()
     i = 0
-    while(self.game.status == EngineStatusEnum.RUNNING) :
-      print("\n loop : ", i, "\n")
-      i+=1
-      # check for inputs
-      self.game.request_inputs()
-      # update game state
-      self.game.update_game_state()
-      # refresh display
-      self.game.refresh_display()
-
-      time.sleep(0.5)
\ No newline at end of file
+    while(self.running(i, max_loops)) :
+
+      # as many simulation ticks as the clock owes since the last frame
+      while(clock.tick_due() and self.running(i, max_loops)) :
+        if self.game.event_bus.wants(LoopEvent) :
+          self.game.event_bus.publish(LoopEvent(i))
+        i+=1
+        # check for inputs
+        profiler.time_call("engine.request_inputs", self.game.request_inputs)
+        # update game state
+        profiler.time_call("engine.update_game_state", self.game.update_game_state)
+        clock.tick_done()
+
+        if stats_every > 0 and i % stats_every == 0 :
+          print(profiler.summary())
+          print(clock.report())
+
+      # refresh display, skipped when the loop is running late
+      if clock.render_due() :
+        profiler.time_call("engine.refresh_display", self.game.refresh_display)
+
+      clock.wait_next_frame()
+
+  # same loop as run, on an event loop : input never blocks and the other
+  # tasks (background battles, the stdin reader) run between ticks and frames
+  async def run_async(self, max_loops = None, stats_every = 0) :
+    if stats_every > 0 :
+      self.game.enable_profiling()
+
+    profiler = self.game.profiler
+    clock = self.clock
+    clock.start()
+    i = 0
+    while(self.running(i, max_loops)) :
+
+      while(clock.tick_due() and self.running(i, max_loops)) :
+        if self.game.event_bus.wants(LoopEvent) :
+          self.game.event_bus.publish(LoopEvent(i))
+        i+=1
+        profiler.time_call("engine.request_inputs", self.game.request_inputs)
+        await self.game.update_game_state_async()
+        clock.tick_done()
+
+        if stats_every > 0 and i % stats_every == 0 :
+          print(profiler.summary())
+          print(clock.report())
+
+      if clock.render_due() :
+        profiler.time_call("engine.refresh_display", self.game.refresh_display)
+
+      await asyncio.sleep(clock.next_frame_delay())
+
+  def running(self, loops, max_loops) :
+    return self.game.status == EngineStatusEnum.RUNNING and (max_loops is None or loops < max_loops)
+
+  # runs a few loops under cProfile and dumps the trace to output_path
+  # uncapped and without prompting between battles, so the trace holds the game and not sleeps and stdin waits
+  def profile(self, loops, output_path) :
+    self.game.enable_profiling()
+    fast_forward, prompt = self.clock.fast_forward, self.game.hmi.prompt
+    self.clock.fast_forward = True
+    self.game.hmi.prompt = False
+    try :
+      profile_calls(lambda : self.run(loops), output_path)
+    finally :
+      self.clock.fast_forward, self.game.hmi.prompt = fast_forward, prompt
+    print(self.game.profiler.summary())
+    print(self.clock.report())
@@ -0,0 +1,406 @@
+# Battle hosting service
+# a BattleServer hosts many concurrent battles over a pool of worker processes,
+# each worker (a shard) running many ArenaEnv side by side. A new battle goes
+# to the shard with the fewest live arenas. Shards advance all their arenas in
+# passes, every arena fighting up to ticks_per_pass fight_battle calls per
+# pass, and keep the pass durations for the latency percentiles of the report
+#
+# the server and its shards only talk through multiprocessing queues, nothing
+# outside the process tree is needed. Battle b draws from substream b of the
+# server seed, so a battle plays the same on whichever shard it lands
+#
+# watched battles also send frames after every pass, for streaming them : a
+# start frame with every unit, then per pass only the units whose hp or meter
+# (rounded down to a whole point) changed, and an end frame
+#   ("start", battle_id, tick, [(team_id, name, max_hp, hp, meter), ...])
+#   ("tick", battle_id, tick, [(unit index, hp, meter), ...])
+#   ("end", battle_id, tick, winner)
+#
+# a battle raising an error is reported as finished with the error and no
+# winner instead of taking its shard down, the other battles go on
+
+import itertools
+import multiprocessing
+import queue
+import signal
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+from app_code.arena.arena import METER_FULL, ArenaEnv, CombatEntity, SchedulerEnum, meter_at
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.simulation.simulation import DEFAULT_MAX_TICKS
+from app_code.utils.random_streams import SeedStream
+
+# pass durations kept per shard for the percentiles
+LATENCY_SAMPLES = 4096
+# outcomes of finished battles kept for result(), the least recently used go first
+DEFAULT_MAX_OUTCOMES = 100_000
+PERCENTILES = (50, 95, 99)
+
+class BattleOutcome(NamedTuple):
+  battle_id : int
+  shard_id : int
+  winner : int | None     # team id, None for a timeout or a failure
+  ticks : int
+  error : str | None = None   # why the battle failed, None when it was fought out
+
+# nearest rank percentile of sorted values
+def percentile(sorted_values : list[float], percent : float) -> float:
+  if sorted_values == []:
+    return 0.0
+  rank = max(0, min(len(sorted_values) - 1, round(percent / 100 * len(sorted_values)) - 1))
+  return sorted_values[rank]
+
+# the meter as shown to a watcher, speed_meter is only updated when the unit acts or changes speed
+def shown_meter(arena : ArenaEnv, unit : CombatEntity) -> int:
+  return int(min(meter_at(unit.speed_meter, unit.speed, arena.tick - unit.meter_tick), METER_FULL))
+
+def describe_error(error : Exception) -> str:
+  return f"{type(error).__name__}: {error}"
+
+def shown_state(arena : ArenaEnv) -> list[tuple[int, int]]:
+  return [(max(unit.current_hp, 0), shown_meter(arena, unit)) for unit in arena.units]
+
+# the arenas of one worker process
+class ArenaShard:
+  def __init__(self, shard_id : int, ticks_per_pass : int = 1, max_ticks : int = DEFAULT_MAX_TICKS,
+               scheduler : SchedulerEnum = SchedulerEnum.EVENT):
+    self.shard_id : int = shard_id
+    self.ticks_per_pass : int = ticks_per_pass
+    self.max_ticks : int = max_ticks
+    self.scheduler : SchedulerEnum = scheduler
+
+    self.arenas : dict[int, ArenaEnv] = {}
+    # watched battles : the (hp, meter) of every unit in the last frame
+    self.watched : dict[int, list[tuple[int, int]]] = {}
+    # frames since the last time the worker sent them
+    self.frames : list[tuple] = []
+    # arenas of finished battles, set up again for the next ones
+    self.idle_arenas : list[ArenaEnv] = []
+
+    self.passes : int = 0
+    self.ticks : int = 0
+    self.battles_finished : int = 0
+    self.battles_failed : int = 0
+    self.busy_time : float = 0.0
+    self.pass_latencies : deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+  # returns the outcome of a battle that failed to set up, None once it is started
+  def start_battle(self, battle_id : int, team_setups : list[list[str]], seed : int,
+                   watch : bool = False) -> BattleOutcome | None:
+    if self.idle_arenas != []:
+      arena = self.idle_arenas.pop()
+    else:
+      arena = ArenaEnv()
+      arena.init()
+      arena.scheduler = self.scheduler
+    try:
+      arena.setup_battle(team_setups, SeedStream(seed).spawn(battle_id).random())
+    except Exception as error:
+      self.battles_failed += 1
+      if watch:
+        self.frames.append(("end", battle_id, 0, None))
+      return BattleOutcome(battle_id, self.shard_id, None, 0, describe_error(error))
+    self.arenas[battle_id] = arena
+    if watch:
+      state = shown_state(arena)
+      self.watched[battle_id] = state
+      units = [(unit.team.team_id, unit.template.name, unit.template.max_hp, hp, meter)
+               for unit, (hp, meter) in zip(arena.units, state)]
+      self.frames.append(("start", battle_id, arena.tick, units))
+
+  # one pass over every arena, returns the battles it finished
+  def step(self) -> list[BattleOutcome]:
+    start = time.perf_counter()
+    finished = []
+    ticks = 0
+    for battle_id, arena in self.arenas.items():
+      tick_before = arena.tick
+      outcome = None
+      try:
+        for _ in range(self.ticks_per_pass):
+          over = arena.fight_battle(self.max_ticks)
+          if over or arena.tick >= self.max_ticks:
+            outcome = BattleOutcome(battle_id, self.shard_id, arena.winner_team_id() if over else None, arena.tick)
+            break
+      except Exception as error:
+        outcome = BattleOutcome(battle_id, self.shard_id, None, arena.tick, describe_error(error))
+      if outcome is not None:
+        finished.append(outcome)
+      ticks += arena.tick - tick_before
+
+      if battle_id in self.watched:
+        if outcome is None or outcome.error is None:
+          self.add_delta_frame(battle_id, arena)
+        if outcome is not None:
+          self.frames.append(("end", battle_id, arena.tick, outcome.winner))
+
+    for outcome in finished:
+      arena = self.arenas.pop(outcome.battle_id)
+      self.watched.pop(outcome.battle_id, None)
+      # an arena left halfway through a failure is not set up again
+      if outcome.error is None:
+        self.idle_arenas.append(arena)
+        self.battles_finished += 1
+      else:
+        self.battles_failed += 1
+
+    elapsed = time.perf_counter() - start
+    self.passes += 1
+    self.ticks += ticks
+    self.busy_time += elapsed
+    self.pass_latencies.append(elapsed)
+    return finished
+
+  def add_delta_frame(self, battle_id : int, arena : ArenaEnv):
+    last = self.watched[battle_id]
+    state = shown_state(arena)
+    changes = [(index, hp, meter) for index, ((hp, meter), previous) in enumerate(zip(state, last))
+               if (hp, meter) != previous]
+    if changes != []:
+      self.frames.append(("tick", battle_id, arena.tick, changes))
+      self.watched[battle_id] = state
+
+  def stats(self) -> dict:
+    latencies = sorted(self.pass_latencies)
+    stats = {
+      "shard": self.shard_id,
+      "arenas": len(self.arenas),
+      "watched": len(self.watched),
+      "battles_finished": self.battles_finished,
+      "battles_failed": self.battles_failed,
+      "passes": self.passes,
+      "ticks": self.ticks,
+      "ticks_per_sec": self.ticks / self.busy_time if self.busy_time > 0 else 0.0,
+      "busy_time": self.busy_time,
+    }
+    for percent in PERCENTILES:
+      stats[f"pass_p{percent}_ms"] = percentile(latencies, percent) * 1000
+    return stats
+
+# worker process : runs commands from inbox between passes, sends frames, finished battles and stats to outbox
+# pass_interval paces the passes (seconds), None runs them back to back
+def serve_shard(shard_id : int, inbox : multiprocessing.Queue, outbox : multiprocessing.Queue, ticks_per_pass : int,
+                max_ticks : int, scheduler : SchedulerEnum, pass_interval : float | None):
+  # ctrl-c reaches the whole process group, the server stops its shards itself
+  signal.signal(signal.SIGINT, signal.SIG_IGN)
+  shard = ArenaShard(shard_id, ticks_per_pass, max_ticks, scheduler)
+  next_pass = time.perf_counter()
+  while True:
+    # wait for work when there is none, otherwise only take what already arrived
+    commands = []
+    try:
+      if shard.arenas == {}:
+        commands.append(inbox.get(timeout=1.0))
+      while True:
+        commands.append(inbox.get_nowait())
+    except queue.Empty:
+      if commands == [] and shard.arenas == {} and not multiprocessing.parent_process().is_alive():
+        return
+
+    finished = []
+    for command in commands:
+      if command[0] == "start":
+        for battle_id, team_setups, seed, watch in command[1]:
+          outcome = shard.start_battle(battle_id, team_setups, seed, watch)
+          if outcome is not None:
+            finished.append(outcome)
+      elif command[0] == "stats":
+        outbox.put(("stats", shard_id, command[1], shard.stats()))
+      elif command[0] == "stop":
+        outbox.put(("stopped", shard_id))
+        return
+
+    if shard.arenas != {}:
+      if pass_interval is not None:
+        delay = next_pass - time.perf_counter()
+        if delay > 0:
+          time.sleep(delay)
+        next_pass = max(next_pass + pass_interval, time.perf_counter() - pass_interval)
+      finished += shard.step()
+    if shard.frames != []:
+      outbox.put(("frames", shard_id, shard.frames))
+      shard.frames = []
+    if finished != []:
+      outbox.put(("finished", shard_id, finished))
+
+class BattleServer:
+  def __init__(self, workers : int | None = None, ticks_per_pass : int = 1, max_ticks : int = DEFAULT_MAX_TICKS,
+               scheduler : SchedulerEnum = SchedulerEnum.EVENT, pass_interval : float | None = None,
+               seed : int | None = None, max_outcomes : int = DEFAULT_MAX_OUTCOMES):
+    if workers is None:
+      workers = multiprocessing.cpu_count()
+    if workers < 1 or ticks_per_pass < 1:
+      raise ValueError("a battle server needs at least one worker and one tick per pass")
+    self.workers : int = workers
+    self.ticks_per_pass : int = ticks_per_pass
+    self.max_ticks : int = max_ticks
+    self.scheduler : SchedulerEnum = scheduler
+    self.pass_interval : float | None = pass_interval
+    self.seed : int = SeedStream(seed).root_seed
+    self.unit_db = get_pregen_unit_database()
+
+    self.inboxes : list[multiprocessing.Queue] = []
+    self.outbox : multiprocessing.Queue | None = None
+    self.processes : list[multiprocessing.Process] = []
+    self.collector : threading.Thread | None = None
+
+    # live battles per shard, what the load balancing looks at
+    self.load : list[int] = [0] * workers
+    self.battle_ids = itertools.count()
+    self.outcomes : OrderedDict[int, BattleOutcome] = OrderedDict()
+    self.max_outcomes : int = max_outcomes
+    self.running : int = 0
+    # called from the collector thread with every finished battle, and with the frames of a pass
+    self.on_finished : list = []
+    self.on_frames : list = []
+    # replies of the stats requests somebody still waits on, late ones are dropped
+    self.stats_replies : dict[int, dict[int, dict]] = {}
+    self.stats_ids = itertools.count()
+    self.lock : threading.Condition = threading.Condition()
+    self.started_at : float = 0.0
+
+  def start(self):
+    self.outbox = multiprocessing.Queue()
+    for shard_id in range(self.workers):
+      inbox = multiprocessing.Queue()
+      process = multiprocessing.Process(target=serve_shard, daemon=True,
+                                        args=(shard_id, inbox, self.outbox, self.ticks_per_pass, self.max_ticks,
+                                              self.scheduler, self.pass_interval))
+      process.start()
+      self.inboxes.append(inbox)
+      self.processes.append(process)
+    self.collector = threading.Thread(target=self.collect, daemon=True)
+    self.collector.start()
+    self.started_at = time.perf_counter()
+
+  def __enter__(self) -> "BattleServer":
+    self.start()
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def start_battle(self, team_setups : list[list[str]], watch : bool = False) -> int:
+    return self.start_battles([team_setups], watch)[0]
+
+  # battles started together are spread over the shards and sent in one message per shard
+  # watched battles send frames to the on_frames handlers
+  def start_battles(self, battles : list[list[list[str]]], watch : bool = False) -> list[int]:
+    for team_setups in battles:
+      if len(team_setups) < 2:
+        raise ValueError("a battle needs at least 2 teams")
+      if any(unit_names == [] for unit_names in team_setups):
+        raise ValueError("a battle can't have an empty team")
+      for name in itertools.chain.from_iterable(team_setups):
+        if name not in self.unit_db:
+          raise ValueError(f"unknown unit '{name}', expected one of {', '.join(self.unit_db)}")
+
+    batches = [[] for _ in range(self.workers)]
+    battle_ids = []
+    with self.lock:
+      for team_setups in battles:
+        shard_id = min(range(self.workers), key=self.load.__getitem__)
+        battle_id = next(self.battle_ids)
+        self.load[shard_id] += 1
+        self.running += 1
+        batches[shard_id].append((battle_id, team_setups, self.seed, watch))
+        battle_ids.append(battle_id)
+    for inbox, batch in zip(self.inboxes, batches):
+      if batch != []:
+        inbox.put(("start", batch))
+    return battle_ids
+
+  # collector thread : folds what the shards send back
+  # it ends once every shard said it stopped or died without saying so
+  def collect(self):
+    stopped = set()
+    while len(stopped) < self.workers:
+      try:
+        message = self.outbox.get(timeout=1.0)
+      except queue.Empty:
+        if all(shard_id in stopped or not process.is_alive() for shard_id, process in enumerate(self.processes)):
+          return
+        continue
+      with self.lock:
+        if message[0] == "finished":
+          shard_id, outcomes = message[1], message[2]
+          self.load[shard_id] -= len(outcomes)
+          self.running -= len(outcomes)
+          for outcome in outcomes:
+            self.outcomes[outcome.battle_id] = outcome
+          while len(self.outcomes) > self.max_outcomes:
+            self.outcomes.popitem(last=False)
+        elif message[0] == "stats":
+          if message[2] in self.stats_replies:
+            self.stats_replies[message[2]][message[1]] = message[3]
+        elif message[0] == "stopped":
+          stopped.add(message[1])
+        self.lock.notify_all()
+      if message[0] == "frames":
+        for handler in self.on_frames:
+          handler(message[2])
+      elif message[0] == "finished":
+        for handler in self.on_finished:
+          for outcome in message[2]:
+            handler(outcome)
+
+  # blocks until every started battle is over, False if timeout came first
+  def wait(self, timeout : float | None = None) -> bool:
+    with self.lock:
+      return self.lock.wait_for(lambda: self.running == 0, timeout)
+
+  # None for a battle still running, or finished so long ago its outcome was dropped
+  def result(self, battle_id : int) -> BattleOutcome | None:
+    with self.lock:
+      outcome = self.outcomes.get(battle_id)
+      if outcome is not None:
+        self.outcomes.move_to_end(battle_id)
+      return outcome
+
+  # one stats dict per shard, shards busy with a long pass answer after it
+  def stats(self, timeout : float = 5.0) -> list[dict]:
+    request_id = next(self.stats_ids)
+    with self.lock:
+      self.stats_replies[request_id] = {}
+    for inbox in self.inboxes:
+      inbox.put(("stats", request_id))
+    with self.lock:
+      self.lock.wait_for(lambda: len(self.stats_replies[request_id]) == self.workers, timeout)
+      replies = self.stats_replies.pop(request_id)
+    return [replies[shard_id] for shard_id in sorted(replies)]
+
+  def report(self, timeout : float = 5.0) -> str:
+    shard_stats = self.stats(timeout)
+    elapsed = time.perf_counter() - self.started_at
+    finished = sum(stats["battles_finished"] for stats in shard_stats)
+    ticks = sum(stats["ticks"] for stats in shard_stats)
+    lines = [f"{len(shard_stats)} shards, {sum(stats['arenas'] for stats in shard_stats)} live arenas, "
+             f"{finished} battles finished in {elapsed:.1f}s ({finished / elapsed if elapsed > 0 else 0:.0f} battles/sec, "
+             f"{ticks / elapsed if elapsed > 0 else 0:,.0f} ticks/sec)"]
+    failed = sum(stats["battles_failed"] for stats in shard_stats)
+    if failed > 0:
+      lines[0] += f", {failed} failed"
+    for stats in shard_stats:
+      percentiles = "  ".join(f"p{percent} {stats[f'pass_p{percent}_ms']:.2f}" for percent in PERCENTILES)
+      lines.append(f"  shard {stats['shard']} : {stats['arenas']:>5} arenas  {stats['battles_finished']:>7} finished  "
+                   f"{stats['passes']:>7} passes  pass ms {percentiles}  {stats['ticks_per_sec']:,.0f} ticks/sec busy")
+    return "\n".join(lines)
+
+  # shards get timeout seconds to stop, the ones still running after that (hung or stopped) are killed
+  def close(self, timeout : float = 5.0):
+    if self.processes == []:
+      return
+    deadline = time.monotonic() + timeout
+    for inbox in self.inboxes:
+      inbox.put(("stop",))
+    self.collector.join(timeout)
+    for process in self.processes:
+      process.join(max(0.0, deadline - time.monotonic()))
+      if process.is_alive():
+        process.kill()
+        process.join()
+    self.processes = []
+    self.inboxes = []
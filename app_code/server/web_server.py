@@ -0,0 +1,399 @@
+# HTTP + WebSocket front end of the battle server
+# battles are started over HTTP and streamed over WebSocket, every watcher of a
+# battle gets its start frame, then the per pass deltas the shards send (only
+# the units whose hp or meter changed, see battle_server.py), then its end
+#
+#   POST /battles        {"teams": "Goblin+Goblin,Giant", "count": 1} starts watched battles
+#   GET  /battles        live battle ids
+#   GET  /battles/<id>   current state of a live battle, or the outcome of a finished one
+#   GET  /stats          web and shard statistics
+#   GET  /ws/<id>        WebSocket stream of a live battle
+#
+# frames are compact json arrays, [kind, battle id, tick, data] and the server
+# time when timestamps are on. A frame is encoded once and the same bytes go
+# to every watcher. The simulation never waits for a watcher : each one has a
+# sender task
+#
+# watchers may acknowledge what they have read by sending the tick of the
+# frame as a text message. Socket buffers take in hundreds of KB before a
+# write blocks, so flow control goes by the acks for watchers that send them :
+# at most ACK_WINDOW frames are in flight per watcher, and while the window is
+# full the deltas meant for it are merged into a single pending frame
+# (coalescing). Its backlog is then bounded by the window and by the units of
+# the battle. Watchers that never ack (any standard WebSocket client) are paced
+# by the socket instead : the next frame waits for the previous one to drain
+# out of a small write buffer, and the deltas coalesce meanwhile. The buffers
+# on the way (here, in the network, in the client) still hold many frames,
+# a slow reader lags seconds behind where an acking one lags a window. Watchers
+# leaving a frame unacknowledged, or a socket not draining, for drain_timeout
+# seconds are dropped
+
+import asyncio
+import json
+import socket
+import time
+from collections import deque
+from asyncio import StreamReader, StreamWriter
+
+from app_code.server.battle_server import BattleServer
+from app_code.server.websocket import (OP_CLOSE, OP_PING, OP_PONG, OP_TEXT, WebSocketError, encode_frame,
+                                       handshake_response, read_frame)
+from app_code.simulation.simulation import parse_teams
+
+DEFAULT_PORT = 8765
+# unacknowledged frames per watcher before its deltas are coalesced, once it sends acks
+ACK_WINDOW = 4
+# bytes buffered for a watcher, by asyncio and by the kernel, before its sender waits for the socket to drain
+WRITE_BUFFER_LIMIT = 4 * 1024
+MAX_REQUEST_SIZE = 64 * 1024
+MAX_BATTLES_PER_REQUEST = 1000
+
+HTTP_REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Content Too Large"}
+
+# teams of a json request, "Goblin+Goblin,Giant" or [["Goblin", "Goblin"], ["Giant"]]
+# the unit names and the team count are then checked by the battle server
+def request_teams(teams) -> list[list[str]]:
+  if isinstance(teams, str):
+    return parse_teams(teams)
+  if not (isinstance(teams, list) and all(isinstance(team, list) and team != [] for team in teams)
+          and all(isinstance(name, str) for team in teams for name in team)):
+    raise ValueError("teams must be a list of non-empty lists of unit names")
+  return teams
+
+def encode_message(message : list) -> bytes:
+  return encode_frame(json.dumps(message, separators=(",", ":")).encode())
+
+# what a watcher still has to be sent, sent in this order
+class Watcher:
+  def __init__(self, writer : StreamWriter):
+    self.writer : StreamWriter = writer
+    self.start_frame : bytes | None = None
+    # the latest tick frame, shared with the other watchers, as long as it is the only one waiting
+    self.tick_frame : tuple[bytes, int, list, float | None] | None = None
+    # unit index -> (hp, meter) once several tick frames waited
+    self.merged : dict[int, tuple[int, int]] | None = None
+    self.merged_tick : int = 0
+    self.merged_time : float | None = None
+    self.end_frame : bytes | None = None
+    # set by its first ack, until then it is paced by the socket and nothing is tracked
+    self.acking : bool = False
+    # (tick, time written) of the frames not acknowledged yet, oldest first
+    self.in_flight : deque[tuple[int, float]] = deque()
+    self.closed : bool = False
+    self.wake : asyncio.Event = asyncio.Event()
+
+  def window_full(self) -> bool:
+    return len(self.in_flight) >= ACK_WINDOW
+
+  def sent(self, tick : int):
+    if self.acking:
+      self.in_flight.append((tick, time.monotonic()))
+
+  # the watcher has read every frame up to tick
+  def ack(self, tick : int):
+    self.acking = True
+    while self.in_flight and self.in_flight[0][0] <= tick:
+      self.in_flight.popleft()
+    self.wake.set()
+
+  def push_tick(self, frame : bytes, tick : int, changes : list, sent_at : float | None) -> bool:
+    if self.tick_frame is None and self.merged is None:
+      self.tick_frame = (frame, tick, changes, sent_at)
+      self.wake.set()
+      return False
+    if self.merged is None:
+      self.merged = {index: (hp, meter) for index, hp, meter in self.tick_frame[2]}
+      self.tick_frame = None
+    for index, hp, meter in changes:
+      self.merged[index] = (hp, meter)
+    self.merged_tick = tick
+    self.merged_time = sent_at
+    return True
+
+  # (frame, tick) of the next frame to write
+  def next_frame(self, battle_id : int, start_tick : int) -> tuple[bytes, int] | None:
+    if self.start_frame is not None:
+      frame, self.start_frame = self.start_frame, None
+      return frame, start_tick
+    if self.tick_frame is not None:
+      (frame, tick, _, _), self.tick_frame = self.tick_frame, None
+      return frame, tick
+    if self.merged is not None:
+      changes = [[index, hp, meter] for index, (hp, meter) in sorted(self.merged.items())]
+      message = ["tick", battle_id, self.merged_tick, changes]
+      if self.merged_time is not None:
+        message.append(self.merged_time)
+      self.merged = None
+      return encode_message(message), self.merged_tick
+    if self.end_frame is not None:
+      frame, self.end_frame = self.end_frame, None
+      self.closed = True
+      return frame, -1
+    return None
+
+  def close(self):
+    self.closed = True
+    self.wake.set()
+
+# a live watched battle : its current state for new watchers, and who watches it
+class BattleChannel:
+  def __init__(self, battle_id : int):
+    self.battle_id : int = battle_id
+    self.tick : int = 0
+    # [team id, name, max hp, hp, meter] per unit, None until the shard sends the start frame
+    self.units : list[list] | None = None
+    self.start_tick : int = 0
+    self.watchers : set[Watcher] = set()
+
+  def start_frame(self) -> bytes:
+    return encode_message(["start", self.battle_id, self.tick, self.units])
+
+  def state(self) -> dict:
+    return {"battle": self.battle_id, "tick": self.tick, "units": self.units}
+
+class BattleWebServer:
+  def __init__(self, battle_server : BattleServer, host : str = "127.0.0.1", port : int = DEFAULT_PORT,
+               timestamps : bool = False, drain_timeout : float = 10.0):
+    self.battle_server : BattleServer = battle_server
+    self.host : str = host
+    self.port : int = port
+    self.timestamps : bool = timestamps
+    self.drain_timeout : float = drain_timeout
+
+    self.channels : dict[int, BattleChannel] = {}
+    self.loop : asyncio.AbstractEventLoop | None = None
+    self.server : asyncio.Server | None = None
+
+    self.watchers : int = 0
+    self.frames_received : int = 0
+    self.messages_sent : int = 0
+    self.bytes_sent : int = 0
+    self.frames_coalesced : int = 0
+    self.watchers_dropped : int = 0
+
+  # needs the running event loop, the battle server is started by the caller
+  async def start(self):
+    self.loop = asyncio.get_running_loop()
+    self.battle_server.on_frames.append(self.receive_frames)
+    self.server = await asyncio.start_server(self.handle_connection, self.host, self.port, limit=MAX_REQUEST_SIZE)
+    self.port = self.server.sockets[0].getsockname()[1]
+
+  async def serve_forever(self):
+    await self.start()
+    async with self.server:
+      await self.server.serve_forever()
+
+  async def close(self):
+    self.battle_server.on_frames.remove(self.receive_frames)
+    self.server.close()
+    for channel in self.channels.values():
+      for watcher in channel.watchers:
+        watcher.close()
+    await self.server.wait_closed()
+
+  # battle server collector thread
+  def receive_frames(self, frames : list[tuple]):
+    self.loop.call_soon_threadsafe(self.dispatch, frames)
+
+  def dispatch(self, frames : list[tuple]):
+    sent_at = time.time() if self.timestamps else None
+    for kind, battle_id, tick, data in frames:
+      self.frames_received += 1
+      message = [kind, battle_id, tick, data]
+      if sent_at is not None:
+        message.append(sent_at)
+
+      channel = self.channels.get(battle_id)
+      if channel is None:
+        if kind != "start":
+          continue
+        channel = self.channels[battle_id] = BattleChannel(battle_id)
+      channel.tick = tick
+
+      if kind == "start":
+        channel.units = [list(unit) for unit in data]
+        channel.start_tick = tick
+        if channel.watchers:
+          frame = channel.start_frame()
+          for watcher in channel.watchers:
+            watcher.start_frame = frame
+            watcher.wake.set()
+      elif kind == "tick":
+        for index, hp, meter in data:
+          unit = channel.units[index]
+          unit[3], unit[4] = hp, meter
+        if channel.watchers:
+          frame = encode_message(message)
+          for watcher in channel.watchers:
+            self.frames_coalesced += watcher.push_tick(frame, tick, data, sent_at)
+      elif kind == "end":
+        frame = encode_message(message)
+        for watcher in channel.watchers:
+          watcher.end_frame = frame
+          watcher.wake.set()
+        del self.channels[battle_id]
+
+  async def handle_connection(self, reader : StreamReader, writer : StreamWriter):
+    try:
+      request = await reader.readuntil(b"\r\n\r\n")
+      request_line, *header_lines = request.decode("latin-1").split("\r\n")
+      method, path, _ = request_line.split(" ", 2)
+      headers = {}
+      for line in header_lines:
+        if ":" in line:
+          name, value = line.split(":", 1)
+          headers[name.strip().lower()] = value.strip()
+      length = headers.get("content-length", "0") or "0"
+      if not (length.isascii() and length.isdigit()):
+        self.respond(writer, 400, {"error": f"bad Content-Length {length!r}"})
+        await writer.drain()
+        return
+      if int(length) > MAX_REQUEST_SIZE:
+        self.respond(writer, 413, {"error": f"request body over {MAX_REQUEST_SIZE} bytes"})
+        await writer.drain()
+        return
+      body = await reader.readexactly(int(length))
+
+      if path.startswith("/ws/") and headers.get("upgrade", "").lower() == "websocket":
+        await self.handle_websocket(path, headers, reader, writer)
+      else:
+        status, payload = await self.handle_http(method, path, body)
+        self.respond(writer, status, payload)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError, ValueError, WebSocketError):
+      pass
+    finally:
+      writer.close()
+
+  def respond(self, writer : StreamWriter, status : int, payload):
+    body = json.dumps(payload).encode()
+    writer.write((f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                  "Content-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n"
+                  "Connection: close\r\n\r\n").encode() + body)
+
+  async def handle_http(self, method : str, path : str, body : bytes) -> tuple[int, object]:
+    parts = path.strip("/").split("/")
+    if parts[0] == "battles" and len(parts) == 1:
+      if method == "GET":
+        return 200, {"battles": sorted(self.channels)}
+      if method == "POST":
+        return self.start_battles(body)
+      return 405, {"error": f"{method} not allowed on /battles"}
+    if parts[0] == "battles" and len(parts) == 2 and parts[1].isdigit():
+      battle_id = int(parts[1])
+      if battle_id in self.channels:
+        return 200, self.channels[battle_id].state()
+      outcome = self.battle_server.result(battle_id)
+      if outcome is None:
+        return 404, {"error": f"no battle {battle_id}"}
+      return 200, outcome._asdict()
+    if parts == ["stats"] and method == "GET":
+      shards = await asyncio.to_thread(self.battle_server.stats)
+      return 200, {"web": self.stats(), "shards": shards}
+    return 404, {"error": f"no route for {method} {path}"}
+
+  def start_battles(self, body : bytes) -> tuple[int, object]:
+    try:
+      request = json.loads(body or b"{}")
+      team_setups = request_teams(request["teams"])
+      count = int(request.get("count", 1))
+      if not 1 <= count <= MAX_BATTLES_PER_REQUEST:
+        raise ValueError(f"count must be between 1 and {MAX_BATTLES_PER_REQUEST}")
+      battle_ids = self.battle_server.start_battles([team_setups] * count, watch=True)
+    except (KeyError, TypeError, ValueError) as error:
+      return 400, {"error": str(error)}
+    # watchable right away, their start frames come with the next pass of the shards
+    for battle_id in battle_ids:
+      self.channels[battle_id] = BattleChannel(battle_id)
+    return 201, {"battles": battle_ids}
+
+  async def handle_websocket(self, path : str, headers : dict, reader : StreamReader, writer : StreamWriter):
+    battle_id = path[len("/ws/"):]
+    channel = self.channels.get(int(battle_id)) if battle_id.isdigit() else None
+    if channel is None or "sec-websocket-key" not in headers:
+      self.respond(writer, 404, {"error": f"no live battle {battle_id}"})
+      await writer.drain()
+      return
+
+    writer.write(handshake_response(headers["sec-websocket-key"]))
+    # small socket buffers too, or the kernel would take in hundreds of KB before the drain waits
+    writer.transport.set_write_buffer_limits(WRITE_BUFFER_LIMIT)
+    sock = writer.get_extra_info("socket")
+    if sock is not None:
+      sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, WRITE_BUFFER_LIMIT)
+    watcher = Watcher(writer)
+    if channel.units is not None:
+      watcher.start_frame = channel.start_frame()
+      watcher.wake.set()
+    channel.watchers.add(watcher)
+    self.watchers += 1
+    reader_task = asyncio.create_task(self.read_watcher(reader, watcher))
+    try:
+      await self.send_frames(channel, watcher)
+    finally:
+      channel.watchers.discard(watcher)
+      self.watchers -= 1
+      reader_task.cancel()
+
+  async def send_frames(self, channel : BattleChannel, watcher : Watcher):
+    writer = watcher.writer
+    while not watcher.closed:
+      # with a full window only an ack (or the end of the battle) lets it go on
+      if not watcher.wake.is_set():
+        timeout = None
+        if watcher.window_full():
+          timeout = watcher.in_flight[0][1] + self.drain_timeout - time.monotonic()
+        try:
+          await asyncio.wait_for(watcher.wake.wait(), timeout)
+        except asyncio.TimeoutError:
+          self.watchers_dropped += 1
+          return
+      watcher.wake.clear()
+
+      # once the battle is over, what is left goes out whatever the window
+      while not writer.is_closing() and (not watcher.window_full() or watcher.end_frame is not None):
+        next_frame = watcher.next_frame(channel.battle_id, channel.start_tick)
+        if next_frame is None:
+          break
+        frame, tick = next_frame
+        writer.write(frame)
+        watcher.sent(tick)
+        self.messages_sent += 1
+        self.bytes_sent += len(frame)
+        try:
+          await asyncio.wait_for(writer.drain(), self.drain_timeout)
+        except asyncio.TimeoutError:
+          self.watchers_dropped += 1
+          return
+      if writer.is_closing():
+        return
+    writer.write(encode_frame(b"", OP_CLOSE))
+    await writer.drain()
+
+  # watchers send their acks if they do, and control frames
+  async def read_watcher(self, reader : StreamReader, watcher : Watcher):
+    try:
+      while True:
+        opcode, payload = await read_frame(reader)
+        if opcode == OP_CLOSE:
+          break
+        if opcode == OP_PING:
+          watcher.writer.write(encode_frame(payload, OP_PONG))
+        elif opcode == OP_TEXT and payload.isdigit():
+          watcher.ack(int(payload))
+    except (asyncio.IncompleteReadError, ConnectionError, WebSocketError):
+      pass
+    watcher.close()
+
+  def stats(self) -> dict:
+    return {
+      "live_battles": len(self.channels),
+      "watchers": self.watchers,
+      "frames_received": self.frames_received,
+      "messages_sent": self.messages_sent,
+      "bytes_sent": self.bytes_sent,
+      "frames_coalesced": self.frames_coalesced,
+      "watchers_dropped": self.watchers_dropped,
+    }
@@ -0,0 +1,91 @@
+# Minimal WebSocket protocol (RFC 6455) on asyncio streams
+# the opening handshake and the frame format, enough for the battle streaming
+# server and for its load test clients. Messages are single frames, fragmented
+# messages and extensions are not supported
+
+import base64
+import hashlib
+import os
+import struct
+from asyncio import StreamReader, StreamWriter
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# frames bigger than this close the connection
+MAX_PAYLOAD = 1 << 20
+
+class WebSocketError(Exception):
+  pass
+
+def accept_key(key : str) -> str:
+  return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+def handshake_response(key : str) -> bytes:
+  return ("HTTP/1.1 101 Switching Protocols\r\n"
+          "Upgrade: websocket\r\n"
+          "Connection: Upgrade\r\n"
+          f"Sec-WebSocket-Accept: {accept_key(key)}\r\n\r\n").encode()
+
+# one final frame, clients must mask what they send and servers must not
+def encode_frame(payload : bytes, opcode : int = OP_TEXT, mask : bool = False) -> bytes:
+  length = len(payload)
+  mask_bit = 0x80 if mask else 0
+  if length < 126:
+    header = struct.pack("!BB", 0x80 | opcode, mask_bit | length)
+  elif length < 1 << 16:
+    header = struct.pack("!BBH", 0x80 | opcode, mask_bit | 126, length)
+  else:
+    header = struct.pack("!BBQ", 0x80 | opcode, mask_bit | 127, length)
+  if not mask:
+    return header + payload
+  mask_key = os.urandom(4)
+  return header + mask_key + apply_mask(payload, mask_key)
+
+def apply_mask(payload : bytes, mask_key : bytes) -> bytes:
+  # xor with the key repeated over the payload, as one big int instead of byte by byte
+  repeated = (mask_key * (len(payload) // 4 + 1))[:len(payload)]
+  return (int.from_bytes(payload, "little") ^ int.from_bytes(repeated, "little")).to_bytes(len(payload), "little")
+
+# (opcode, payload) of the next frame, raises IncompleteReadError when the peer is gone
+async def read_frame(reader : StreamReader) -> tuple[int, bytes]:
+  first, second = await reader.readexactly(2)
+  opcode = first & 0x0F
+  length = second & 0x7F
+  if length == 126:
+    length = struct.unpack("!H", await reader.readexactly(2))[0]
+  elif length == 127:
+    length = struct.unpack("!Q", await reader.readexactly(8))[0]
+  if length > MAX_PAYLOAD:
+    raise WebSocketError(f"frame of {length} bytes, at most {MAX_PAYLOAD} accepted")
+
+  mask_key = await reader.readexactly(4) if second & 0x80 else None
+  payload = await reader.readexactly(length)
+  if mask_key is not None:
+    payload = apply_mask(payload, mask_key)
+  return opcode, payload
+
+# client side of the opening handshake, for load tests and scripts
+async def client_handshake(reader : StreamReader, writer : StreamWriter, host : str, path : str):
+  key = base64.b64encode(os.urandom(16)).decode()
+  writer.write((f"GET {path} HTTP/1.1\r\n"
+                f"Host: {host}\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Key: {key}\r\n"
+                "Sec-WebSocket-Version: 13\r\n\r\n").encode())
+  await writer.drain()
+
+  response = await reader.readuntil(b"\r\n\r\n")
+  status_line, *header_lines = response.decode("latin-1").split("\r\n")
+  if status_line.split(" ")[1:2] != ["101"]:
+    raise WebSocketError(f"handshake refused : {status_line}")
+  headers = dict(line.split(":", 1) for line in header_lines if ":" in line)
+  headers = {name.strip().lower(): value.strip() for name, value in headers.items()}
+  if headers.get("sec-websocket-accept") != accept_key(key):
+    raise WebSocketError("handshake answered with a wrong Sec-WebSocket-Accept")
@@ -0,0 +1,127 @@
+# Memoized matchup results
+# a simulate() result only depends on the stats of the units of each team (in
+# setup order), the combat rules and the seeded battle range, so it is stored
+# under a hash of exactly those. Recent results stay in memory (LRU), every
+# result is also written to a sqlite file so later sessions reuse it
+#
+# the rules fingerprint hashes RULES_VERSION and the source of RULES_MODULES,
+# editing the combat code, the seeding or the way runs are fought and summed up,
+# or bumping the version, drops every result stored under the old one
+
+import hashlib
+import importlib.util
+import json
+import sqlite3
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from app_code.arena import arena
+from app_code.arena.arena import SchedulerEnum
+from app_code.barracks.barracks import FighterTemplate
+
+DEFAULT_CAPACITY = 4096
+
+# every module whose code can change a simulate() result, read as files so
+# simulation (which imports this module) doesn't have to be imported here
+RULES_MODULES = ("app_code.arena.arena", "app_code.arena.effects", "app_code.arena.targeting",
+                 "app_code.barracks.barracks", "app_code.utils.random_streams", "app_code.simulation.simulation")
+
+_rules_fingerprint : str | None = None
+
+def rules_fingerprint() -> str:
+  global _rules_fingerprint
+  if _rules_fingerprint is None:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{arena.RULES_VERSION},{arena.METER_FULL},{arena.METER_STEP}".encode())
+    for module_name in RULES_MODULES:
+      digest.update(module_name.encode())
+      with open(importlib.util.find_spec(module_name).origin, "rb") as source_file:
+        digest.update(source_file.read())
+    _rules_fingerprint = digest.hexdigest()
+  return _rules_fingerprint
+
+# names don't matter, two templates with the same stats fight the same
+def template_stats(template : FighterTemplate) -> list:
+  return [template.strength, template.agility, template.speed, template.max_hp]
+
+def matchup_key(team_setups : list[list[str]], unit_db : Mapping[str, FighterTemplate], runs : int, seed : int,
+                max_ticks : int, scheduler : SchedulerEnum) -> str:
+  canonical = json.dumps({
+    "teams": [[template_stats(unit_db[name]) for name in unit_names] for unit_names in team_setups],
+    "rules": rules_fingerprint(),
+    "seed": seed,
+    "runs": runs,
+    "max_ticks": max_ticks,
+    "scheduler": scheduler.name,
+  }, sort_keys=True, separators=(",", ":"))
+  return hashlib.blake2b(canonical.encode(), digest_size=20).hexdigest()
+
+class MatchupCache:
+  # path None keeps the results in memory only
+  def __init__(self, path : str | None = None, capacity : int = DEFAULT_CAPACITY):
+    self.capacity : int = capacity
+    self.memory : OrderedDict[str, dict] = OrderedDict()
+    self.memory_hits : int = 0
+    self.disk_hits : int = 0
+    self.misses : int = 0
+
+    self.connection : sqlite3.Connection | None = None
+    if path is not None:
+      self.connection = sqlite3.connect(path)
+      self.connection.execute("CREATE TABLE IF NOT EXISTS matchups (key TEXT PRIMARY KEY, rules TEXT, result TEXT)")
+      # results of other combat rules can never be hit again
+      self.connection.execute("DELETE FROM matchups WHERE rules != ?", (rules_fingerprint(),))
+      self.connection.commit()
+
+  # result fields as stored by put, or None
+  def get(self, key : str) -> dict | None:
+    record = self.memory.get(key)
+    if record is not None:
+      self.memory.move_to_end(key)
+      self.memory_hits += 1
+      return record
+
+    if self.connection is not None:
+      row = self.connection.execute("SELECT result FROM matchups WHERE key = ?", (key,)).fetchone()
+      if row is not None:
+        record = json.loads(row[0])
+        self.remember(key, record)
+        self.disk_hits += 1
+        return record
+
+    self.misses += 1
+    return None
+
+  def put(self, key : str, record : dict):
+    self.remember(key, record)
+    if self.connection is not None:
+      self.connection.execute("INSERT OR REPLACE INTO matchups VALUES (?, ?, ?)",
+                              (key, rules_fingerprint(), json.dumps(record)))
+      self.connection.commit()
+
+  def remember(self, key : str, record : dict):
+    self.memory[key] = record
+    self.memory.move_to_end(key)
+    while len(self.memory) > self.capacity:
+      # least recently used, still on disk
+      self.memory.popitem(last=False)
+
+  def clear(self):
+    self.memory.clear()
+    if self.connection is not None:
+      self.connection.execute("DELETE FROM matchups")
+      self.connection.commit()
+
+  def close(self):
+    if self.connection is not None:
+      self.connection.close()
+      self.connection = None
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    self.close()
+
+  def report(self) -> str:
+    return f"matchup cache : {self.memory_hits} memory hits, {self.disk_hits} disk hits, {self.misses} misses"
@@ -0,0 +1,185 @@
+# Headless battle runner
+# fights battles straight through ArenaEnv : no hmi, no display, no sleeping
+# runs are sharded across a process pool to get monte carlo win rates
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.arena.replay import ReplayWriter
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.simulation.matchup_cache import MatchupCache, matchup_key
+from app_code.utils.random_streams import SeedStream
+
+DEFAULT_MAX_TICKS = 1_000_000
+
+# a worker gets a few shards so a slow shard does not leave the other cores idle
+SHARDS_PER_WORKER = 4
+
+class SimulationResult:
+  def __init__(self, team_count, seed = None):
+    self.seed : int | None = seed
+    self.runs : int = 0
+    self.wins : list[int] = [0] * team_count
+    self.draws : int = 0
+    self.timeouts : int = 0
+    self.total_ticks : int = 0
+    self.elapsed : float = 0.0
+    # read back from a MatchupCache instead of simulated
+    self.cached : bool = False
+
+  def merge(self, other):
+    self.runs += other.runs
+    self.wins = [wins + other_wins for wins, other_wins in zip(self.wins, other.wins)]
+    self.draws += other.draws
+    self.timeouts += other.timeouts
+    self.total_ticks += other.total_ticks
+
+  # the counts, as stored by MatchupCache
+  def to_dict(self) -> dict:
+    return {"runs": self.runs, "wins": self.wins, "draws": self.draws, "timeouts": self.timeouts,
+            "total_ticks": self.total_ticks, "elapsed": self.elapsed}
+
+  @classmethod
+  def from_dict(cls, record : dict, seed = None) -> "SimulationResult":
+    result = cls(len(record["wins"]), seed)
+    result.runs = record["runs"]
+    result.wins = list(record["wins"])
+    result.draws = record["draws"]
+    result.timeouts = record["timeouts"]
+    result.total_ticks = record["total_ticks"]
+    result.elapsed = record["elapsed"]
+    return result
+
+  def finished(self) -> int:
+    return self.runs - self.timeouts
+
+  def win_rates(self) -> list[float]:
+    if self.runs == 0:
+      return [0.0 for _ in self.wins]
+    return [wins / self.runs for wins in self.wins]
+
+  def mean_ticks(self) -> float:
+    if self.finished() == 0:
+      return 0.0
+    return self.total_ticks / self.finished()
+
+  def battles_per_sec(self) -> float:
+    if self.elapsed <= 0:
+      return 0.0
+    return self.runs / self.elapsed
+
+  def report(self, team_setups : list[list[str]]) -> str:
+    if self.cached:
+      lines = [f"{self.runs} battles from the matchup cache, seed {self.seed}"]
+    else:
+      lines = [f"{self.runs} battles in {self.elapsed:.2f}s ({self.battles_per_sec():.0f} battles/sec), seed {self.seed}"]
+    for team_id, (unit_names, rate) in enumerate(zip(team_setups, self.win_rates())):
+      lines.append(f"  team {team_id} [{'+'.join(unit_names)}] : {rate * 100:.2f}% wins")
+    if self.draws:
+      lines.append(f"  draws : {self.draws}")
+    if self.timeouts:
+      lines.append(f"  timeouts : {self.timeouts}")
+    lines.append(f"  mean battle length : {self.mean_ticks():.1f} ticks")
+    return "\n".join(lines)
+
+
+# "Goblin,Bandit" is a goblin against a bandit, "Goblin+Goblin,Giant" two goblins against a giant
+def parse_teams(teams_str : str, min_teams : int = 2) -> list[list[str]]:
+  team_setups = [[name.strip() for name in team.split("+")] for team in teams_str.split(",")]
+
+  unit_db = get_pregen_unit_database()
+  for unit_names in team_setups:
+    for name in unit_names:
+      if name not in unit_db:
+        raise ValueError(f"unknown unit '{name}', expected one of {', '.join(unit_db)}")
+
+  if len(team_setups) < min_teams:
+    raise ValueError(f"expected at least {min_teams} teams")
+
+  return team_setups
+
+# consecutive battle indices for each shard
+def split_runs(runs : int, shards : int) -> list[range]:
+  shards = max(1, min(shards, runs))
+  bounds = [i * runs // shards for i in range(shards + 1)]
+  return [range(bounds[i], bounds[i + 1]) for i in range(shards)]
+
+def setup_arena(scheduler : SchedulerEnum = SchedulerEnum.EVENT) -> ArenaEnv:
+  arena = ArenaEnv()
+  arena.init()
+  arena.scheduler = scheduler
+  return arena
+
+# battle i of a run always draws from substream i of the run seed,
+# whatever shard or worker it lands on
+def run_shard(team_setups : list[list[str]], battle_indices : range, seed : int,
+              max_ticks : int = DEFAULT_MAX_TICKS, scheduler : SchedulerEnum = SchedulerEnum.EVENT) -> SimulationResult:
+  arena = setup_arena(scheduler)
+  seed_stream = SeedStream(seed)
+
+  result = SimulationResult(len(team_setups), seed)
+  for battle_index in battle_indices:
+    arena.setup_battle(team_setups, seed_stream.spawn(battle_index).random())
+    if not arena.run_battle(max_ticks):
+      result.timeouts += 1
+    else:
+      winner_id = arena.winner_team_id()
+      if winner_id is None:
+        result.draws += 1
+      else:
+        result.wins[winner_id] += 1
+      result.total_ticks += arena.tick
+    result.runs += 1
+
+  return result
+
+# replays a single battle of a run, e.g. an outlier, without the rest of the batch
+def run_single_battle(team_setups : list[list[str]], battle_index : int, seed : int,
+                      max_ticks : int = DEFAULT_MAX_TICKS, scheduler : SchedulerEnum = SchedulerEnum.EVENT,
+                      replay : ReplayWriter | None = None) -> ArenaEnv:
+  arena = setup_arena(scheduler)
+  if replay is not None:
+    replay.attach(arena.event_bus)
+  arena.setup_battle(team_setups, SeedStream(seed).spawn(battle_index).random())
+  arena.run_battle(max_ticks)
+  return arena
+
+# with a cache, a seeded run that was simulated before is read back instead of fought again
+def simulate(team_setups : list[list[str]], runs : int, workers : int | None = None, seed : int | None = None,
+             max_ticks : int = DEFAULT_MAX_TICKS, scheduler : SchedulerEnum = SchedulerEnum.EVENT,
+             cache : MatchupCache | None = None) -> SimulationResult:
+  if workers is None:
+    workers = os.cpu_count() or 1
+
+  key = None
+  if cache is not None and seed is not None:
+    # an unseeded run can't be asked for again, it is never cached
+    key = matchup_key(team_setups, get_pregen_unit_database(), runs, seed, max_ticks, scheduler)
+    record = cache.get(key)
+    if record is not None:
+      result = SimulationResult.from_dict(record, seed)
+      result.cached = True
+      return result
+
+  if seed is None:
+    seed = SeedStream().root_seed
+
+  start = time.perf_counter()
+  result = SimulationResult(len(team_setups), seed)
+
+  if workers <= 1:
+    result.merge(run_shard(team_setups, range(runs), seed, max_ticks, scheduler))
+  else:
+    shards = split_runs(runs, workers * SHARDS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+      for shard_result in pool.map(run_shard, repeat(team_setups), shards, repeat(seed), repeat(max_ticks),
+                                   repeat(scheduler)):
+        result.merge(shard_result)
+
+  result.elapsed = time.perf_counter() - start
+  if key is not None:
+    cache.put(key, result.to_dict())
+  return result
@@ -0,0 +1,255 @@
+# Team composition search
+# beam search over lineups (multisets of roster templates) within a unit count
+# and an optional point budget : every layer adds one unit to the lineups kept
+# by the previous one. A layer's candidates are scored against the opponent set
+# by successive halving, everybody fights a few battles, the better half fights
+# twice as many, and so on until only the beam is left, so clearly losing
+# lineups are dropped after a handful of battles
+#
+# scoring batches go to a process pool, the search stops at the wall clock
+# budget and returns the best lineup scored so far. Batches check the deadline
+# before every battle, or before every BatchArena run when batched, so a search
+# overruns its budget by one battle, or one run of BATCH_CHUNK / 2 battles, at most
+#
+# battle k against opponent o draws from substream (o, k) of the seed for
+# every lineup, so lineups are compared on the same battles. With numpy, the
+# event scheduler battles are fought BATCH_CHUNK battle indices at a time by a
+# BatchArena, the battles of a chunk starting at k against opponent o on one
+# side draw from substream (o, k, side)
+#
+# lineups are drawn from the roster (the pregen units by default), opponents
+# can use roster or pregen units, and the workers get the templates themselves
+
+import os
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.simulation.simulation import DEFAULT_MAX_TICKS
+from app_code.utils.random_streams import SeedStream
+
+try:
+  from app_code.arena.batch_arena import NO_WINNER, TIMED_OUT, BatchArena
+except ImportError:
+  # numpy is optional, battles are then fought one by one
+  BatchArena = None
+
+DEFAULT_BEAM_WIDTH = 4
+DEFAULT_INITIAL_BATTLES = 8
+# battle indices per chunk, fought in one BatchArena run per opponent and side
+BATCH_CHUNK = 64
+
+# wins of lineup over battle_indices against each opponent, a draw or a timeout is half a win
+# the lineup takes the first side on even battles and the second on odd ones
+# templates maps every name of the lineup and the opponents to its template
+# no battle index is started past deadline (a time.time() value, workers share it)
+# returns (wins, battle indices fought), the fought ones are the first of battle_indices
+def score_lineup(lineup : tuple[str, ...], opponents : list[list[str]], templates : Mapping[str, FighterTemplate],
+                 battle_indices : range, seed : int, max_ticks : int = DEFAULT_MAX_TICKS,
+                 scheduler : SchedulerEnum = SchedulerEnum.EVENT, deadline : float | None = None) -> tuple[float, int]:
+  lineup_templates = [templates[name] for name in lineup]
+  opponent_teams = [[templates[name] for name in opponent] for opponent in opponents]
+  if BatchArena is not None and scheduler == SchedulerEnum.EVENT:
+    return score_batched(lineup_templates, opponent_teams, battle_indices, seed, max_ticks, deadline)
+
+  arena = ArenaEnv()
+  arena.scheduler = scheduler
+  seed_stream = SeedStream(seed)
+
+  wins = 0.0
+  fought = 0
+  for battle_index in battle_indices:
+    if deadline is not None and time.time() >= deadline:
+      break
+    swapped = battle_index % 2 == 1
+    for opponent_index, opponent_templates in enumerate(opponent_teams):
+      teams = [opponent_templates, lineup_templates] if swapped else [lineup_templates, opponent_templates]
+      arena.setup_templates(teams, seed_stream.spawn(opponent_index, battle_index).random())
+      winner = arena.winner_team_id() if arena.run_battle(max_ticks) else None
+      if winner is None:
+        wins += 0.5
+      elif winner == swapped:
+        wins += 1
+    fought += 1
+  return wins, fought
+
+# score_lineup with BatchArena runs of a chunk of battle indices per opponent and side
+# the deadline is checked before every run, a chunk it cuts short is not counted
+def score_batched(lineup_templates : list[FighterTemplate], opponent_teams : list[list[FighterTemplate]],
+                  battle_indices : range, seed : int, max_ticks : int, deadline : float | None) -> tuple[float, int]:
+  seed_stream = SeedStream(seed)
+
+  wins = 0.0
+  fought = 0
+  for chunk_start in range(battle_indices.start, battle_indices.stop, BATCH_CHUNK):
+    chunk = range(chunk_start, min(chunk_start + BATCH_CHUNK, battle_indices.stop))
+    chunk_wins = 0.0
+    for swapped in (0, 1):
+      battles = len(chunk[(swapped - chunk_start) % 2::2])
+      if battles == 0:
+        continue
+      for opponent_index, opponent_templates in enumerate(opponent_teams):
+        if deadline is not None and time.time() >= deadline:
+          return wins, fought
+        arena = BatchArena(seed_stream.spawn(opponent_index, chunk_start, swapped).seed)
+        arena.setup_templates([opponent_templates, lineup_templates] if swapped else [lineup_templates, opponent_templates])
+        winners, _ = arena.run(battles, max_ticks)
+        chunk_wins += int((winners == swapped).sum()) + 0.5 * int(((winners == NO_WINNER) | (winners == TIMED_OUT)).sum())
+    wins += chunk_wins
+    fought += len(chunk)
+  return wins, fought
+
+class OptimizerResult:
+  def __init__(self):
+    self.lineup : tuple[str, ...] | None = None
+    self.win_rate : float = 0.0
+    self.battles : int = 0
+    self.candidates : int = 0
+    self.total_battles : int = 0
+    self.layers : int = 0
+    self.elapsed : float = 0.0
+    self.timed_out : bool = False
+
+  def report(self) -> str:
+    if self.lineup is None:
+      return "no lineup scored"
+    stop = "out of time" if self.timed_out else "search done"
+    return (f"best lineup {'+'.join(self.lineup)} : {self.win_rate * 100:.1f}% wins over {self.battles} battles\n"
+            f"  {self.candidates} lineups and {self.total_battles} battles in {self.elapsed:.1f}s, "
+            f"{self.layers} layers ({stop})")
+
+class TeamOptimizer:
+  # roster maps names to the templates lineups are made of, defaults to the pregen units
+  # costs is per template name, lineups must stay within points when it is given
+  def __init__(self, opponents : list[list[str]], max_units : int, roster : Mapping[str, FighterTemplate] | None = None,
+               points : int | None = None, costs : Mapping[str, int] | None = None,
+               beam_width : int = DEFAULT_BEAM_WIDTH, initial_battles : int = DEFAULT_INITIAL_BATTLES,
+               seed : int = 0, max_ticks : int = DEFAULT_MAX_TICKS):
+    unit_db = get_pregen_unit_database()
+    if roster is None:
+      roster = unit_db
+    for name in (name for opponent in opponents for name in opponent):
+      if name not in roster and name not in unit_db:
+        raise ValueError(f"unknown opponent unit '{name}', not in the roster nor the pregen units")
+    for name in costs or {}:
+      if name not in roster:
+        raise ValueError(f"cost given for unknown unit '{name}', not in the roster")
+
+    self.opponents : list[list[str]] = opponents
+    self.roster : list[str] = sorted(roster)
+    # what the workers build the teams from, roster templates win over pregen ones of the same name
+    self.templates : dict[str, FighterTemplate] = {name: unit_db[name] for opponent in opponents for name in opponent
+                                                   if name not in roster}
+    self.templates.update((name, roster[name]) for name in self.roster)
+    self.max_units : int = max_units
+    self.points : int | None = points
+    self.costs : Mapping[str, int] = costs or {}
+    self.beam_width : int = beam_width
+    # per opponent, doubled every halving round
+    self.initial_battles : int = initial_battles
+    self.seed : int = seed
+    self.max_ticks : int = max_ticks
+
+    # per lineup : wins so far and battles fought per opponent
+    self.wins : dict[tuple[str, ...], float] = {}
+    self.battles : dict[tuple[str, ...], int] = {}
+
+  def cost(self, lineup : tuple[str, ...]) -> int:
+    return sum(self.costs.get(name, 1) for name in lineup)
+
+  def fits(self, lineup : tuple[str, ...]) -> bool:
+    return len(lineup) <= self.max_units and (self.points is None or self.cost(lineup) <= self.points)
+
+  # every lineup with one more unit, lineups are sorted tuples so each multiset shows up once
+  def expand(self, beam : list[tuple[str, ...]]) -> list[tuple[str, ...]]:
+    children = {tuple(sorted(lineup + (name,))) for lineup in beam for name in self.roster}
+    return sorted(child for child in children if self.fits(child))
+
+  def win_rate(self, lineup : tuple[str, ...]) -> float:
+    battles = self.battles.get(lineup, 0) * len(self.opponents)
+    if battles == 0:
+      return 0.0
+    return self.wins[lineup] / battles
+
+  def ranked(self, lineups : list[tuple[str, ...]]) -> list[tuple[str, ...]]:
+    return sorted(lineups, key=lambda lineup: (-self.win_rate(lineup), -self.battles.get(lineup, 0), lineup))
+
+  def run(self, time_budget : float, workers : int | None = None) -> OptimizerResult:
+    if workers is None:
+      workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    deadline = time.time() + time_budget
+    result = OptimizerResult()
+
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+    try:
+      beam = [()]
+      best = None
+      while not result.timed_out:
+        candidates = self.expand(beam)
+        if candidates == []:
+          break
+        result.layers += 1
+        result.candidates += len(candidates)
+
+        battles = self.initial_battles
+        while True:
+          if not self.score(candidates, battles, deadline, pool):
+            result.timed_out = True
+          candidates = self.ranked(candidates)
+          if result.timed_out or len(candidates) <= self.beam_width:
+            break
+          candidates = candidates[:max(self.beam_width, len(candidates) // 2)]
+          battles *= 2
+
+        beam = candidates[:self.beam_width]
+        # bigger lineups are not always better, the best of every layer competes
+        scored = [lineup for lineup in beam if self.battles.get(lineup, 0) > 0]
+        if scored != []:
+          best = self.ranked(scored + ([best] if best is not None else []))[0]
+    finally:
+      if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+    if best is not None:
+      result.lineup = best
+      result.win_rate = self.win_rate(best)
+      result.battles = self.battles[best] * len(self.opponents)
+    result.total_battles = sum(self.battles.values()) * len(self.opponents)
+    result.elapsed = time.perf_counter() - start
+    return result
+
+  # brings every lineup to `battles` battles per opponent, returns False if the deadline came first
+  # batches cut short by the deadline count the battles they fought
+  def score(self, lineups : list[tuple[str, ...]], battles : int, deadline : float,
+            pool : ProcessPoolExecutor | None) -> bool:
+    batches = [(lineup, range(self.battles.get(lineup, 0), battles)) for lineup in lineups
+               if self.battles.get(lineup, 0) < battles]
+
+    if pool is None:
+      for lineup, battle_indices in batches:
+        wins, fought = score_lineup(lineup, self.opponents, self.templates, battle_indices, self.seed, self.max_ticks,
+                                    deadline=deadline)
+        self.add_score(lineup, battle_indices.start + fought, wins)
+        if fought < len(battle_indices):
+          return False
+      return True
+
+    # past the deadline the running batches stop after their current battle (or BatchArena run)
+    # and the others return right away
+    futures = [(pool.submit(score_lineup, lineup, self.opponents, self.templates, battle_indices, self.seed,
+                            self.max_ticks, deadline=deadline), lineup, battle_indices)
+               for lineup, battle_indices in batches]
+    complete = True
+    for future, lineup, battle_indices in futures:
+      wins, fought = future.result()
+      self.add_score(lineup, battle_indices.start + fought, wins)
+      complete = complete and fought == len(battle_indices)
+    return complete
+
+  def add_score(self, lineup : tuple[str, ...], battles : int, wins : float):
+    self.wins[lineup] = self.wins.get(lineup, 0.0) + wins
+    self.battles[lineup] = battles
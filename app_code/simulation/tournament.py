@@ -0,0 +1,319 @@
+# Round-robin tournament and rating ladder
+# every entrant (a template, or a team of templates) meets every other one in
+# a pairing of a few battles, sides swapped every other battle. Pairings are
+# fought in chunks across a process pool and recorded in the ladder in pairing
+# order as they come back, the Glicko scale ratings are fitted on all of them
+# at once when the ladder is shown. Progress is checkpointed to a json file a
+# later run resumes from
+#
+# battle k of pairing p draws from substream (p, k) of the tournament seed
+
+import hashlib
+import json
+import math
+import os
+import time
+from collections.abc import Iterator, Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import combinations, islice
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.barracks.barracks import FighterTemplate
+from app_code.simulation.matchup_cache import rules_fingerprint, template_stats
+from app_code.simulation.simulation import DEFAULT_MAX_TICKS, SHARDS_PER_WORKER
+from app_code.utils.random_streams import SeedStream
+
+CHECKPOINT_VERSION = 2
+
+INITIAL_RATING = 1500.0
+INITIAL_DEVIATION = 350.0
+GLICKO_Q = math.log(10) / 400
+# 95% confidence interval half width, in rating deviations
+CONFIDENCE_Z = 1.96
+
+# rating fit : at most this many passes, stopping once no rating moves by more than the tolerance
+FIT_ITERATIONS = 500
+FIT_TOLERANCE = 1e-3
+
+# pairings per task sent to a worker
+DEFAULT_CHUNK_SIZE = 64
+
+# rating on the glicko scale, fitted by Ladder from every result at once
+class Rating:
+  __slots__ = ("rating", "deviation", "wins", "losses", "draws")
+
+  def __init__(self, rating : float = INITIAL_RATING, deviation : float = INITIAL_DEVIATION):
+    self.rating : float = rating
+    self.deviation : float = deviation
+    self.wins : int = 0
+    self.losses : int = 0
+    self.draws : int = 0
+
+  def games(self) -> int:
+    return self.wins + self.losses + self.draws
+
+  def score(self) -> float:
+    if self.games() == 0:
+      return 0.0
+    return (self.wins + 0.5 * self.draws) / self.games()
+
+  def interval(self) -> tuple[float, float]:
+    return self.rating - CONFIDENCE_Z * self.deviation, self.rating + CONFIDENCE_Z * self.deviation
+
+# the ratings are the most likely ones given every result of the tournament, under the glicko
+# win probability and a N(INITIAL_RATING, INITIAL_DEVIATION) prior, and the deviations come
+# from the curvature there. Unlike one glicko rating period per pairing they don't depend on
+# the order of the pairings, and on a full round robin they rank the entrants by score
+class Ladder:
+  def __init__(self, names : list[str]):
+    self.names : list[str] = names
+    self.ratings : list[Rating] = [Rating() for _ in names]
+    # (first, second, first wins, second wins, draws) of every pairing recorded
+    self.results : list[tuple[int, int, int, int, int]] = []
+    self.fitted : bool = True
+
+  def record(self, first : int, second : int, first_wins : int, second_wins : int, draws : int):
+    if first_wins + second_wins + draws == 0:
+      return
+    self.results.append((first, second, first_wins, second_wins, draws))
+    self.fitted = False
+
+    for entrant, wins, losses in ((first, first_wins, second_wins), (second, second_wins, first_wins)):
+      self.ratings[entrant].wins += wins
+      self.ratings[entrant].losses += losses
+      self.ratings[entrant].draws += draws
+
+  # cyclic newton steps on each rating in turn, the log likelihood is concave so this converges
+  def fit(self):
+    if self.fitted:
+      return
+    # (opponent, points scored, games) per entrant
+    opponents = [[] for _ in self.names]
+    for first, second, first_wins, second_wins, draws in self.results:
+      games = first_wins + second_wins + draws
+      opponents[first].append((second, first_wins + 0.5 * draws, games))
+      opponents[second].append((first, second_wins + 0.5 * draws, games))
+
+    ratings = [INITIAL_RATING] * len(self.names)
+    curvatures = [0.0] * len(self.names)
+    for _ in range(FIT_ITERATIONS):
+      largest_step = 0.0
+      for entrant, played in enumerate(opponents):
+        rating = ratings[entrant]
+        gradient = (INITIAL_RATING - rating) / INITIAL_DEVIATION ** 2
+        curvature = 1 / INITIAL_DEVIATION ** 2
+        for opponent, points, games in played:
+          expected = 1 / (1 + 10 ** ((ratings[opponent] - rating) / 400))
+          gradient += GLICKO_Q * (points - games * expected)
+          curvature += GLICKO_Q ** 2 * games * expected * (1 - expected)
+        step = gradient / curvature
+        ratings[entrant] = rating + step
+        curvatures[entrant] = curvature
+        largest_step = max(largest_step, abs(step))
+      if largest_step < FIT_TOLERANCE:
+        break
+
+    for rating, value, curvature in zip(self.ratings, ratings, curvatures):
+      rating.rating, rating.deviation = value, math.sqrt(1 / curvature)
+    self.fitted = True
+
+  def ranking(self) -> list[int]:
+    self.fit()
+    return sorted(range(len(self.names)), key=lambda entrant: (-self.ratings[entrant].rating, entrant))
+
+  def table(self, top : int | None = None) -> str:
+    lines = [f"{'rank':>4}  {'entrant':<24} {'rating':>7}  {'95% interval':>15}  {'W':>6} {'L':>6} {'D':>5}  {'score':>6}"]
+    for rank, entrant in enumerate(self.ranking()[:top], 1):
+      rating = self.ratings[entrant]
+      low, high = rating.interval()
+      lines.append(f"{rank:>4}  {self.names[entrant]:<24} {rating.rating:>7.0f}  {low:>7.0f}-{high:<7.0f}  "
+                   f"{rating.wins:>6} {rating.losses:>6} {rating.draws:>5}  {rating.score() * 100:>5.1f}%")
+    return "\n".join(lines)
+
+# entrant templates of the worker processes, set once by the pool initializer
+_worker_entrants : list[list[FighterTemplate]] = []
+
+def init_worker(entrants : list[list[FighterTemplate]]):
+  global _worker_entrants
+  _worker_entrants = entrants
+
+# fights the given (pairing index, first entrant, second entrant) pairings
+# returns (pairing index, first, second, first wins, second wins, draws) for each, timeouts count as draws
+def play_pairings(pairings : list[tuple[int, int, int]], games : int, seed : int, max_ticks : int,
+                  scheduler : SchedulerEnum = SchedulerEnum.EVENT) -> list[tuple[int, int, int, int, int, int]]:
+  arena = ArenaEnv()
+  arena.scheduler = scheduler
+  seed_stream = SeedStream(seed)
+
+  results = []
+  for pairing, first, second in pairings:
+    wins = [0, 0]
+    draws = 0
+    for game in range(games):
+      # the first team acts first on ties, so sides alternate
+      swapped = game % 2 == 1
+      teams = [_worker_entrants[second], _worker_entrants[first]] if swapped else \
+              [_worker_entrants[first], _worker_entrants[second]]
+      arena.setup_templates(teams, seed_stream.spawn(pairing, game).random())
+      winner = arena.winner_team_id() if arena.run_battle(max_ticks) else None
+      if winner is None:
+        draws += 1
+      else:
+        wins[winner ^ swapped] += 1
+    results.append((pairing, first, second, wins[0], wins[1], draws))
+  return results
+
+class Tournament:
+  def __init__(self, entrants : Mapping[str, list[FighterTemplate]], games : int = 10, seed : int = 0,
+               max_ticks : int = DEFAULT_MAX_TICKS, scheduler : SchedulerEnum = SchedulerEnum.EVENT):
+    self.names : list[str] = list(entrants)
+    self.entrants : list[list[FighterTemplate]] = [list(entrants[name]) for name in self.names]
+    self.games : int = games
+    self.seed : int = seed
+    self.max_ticks : int = max_ticks
+    self.scheduler : SchedulerEnum = scheduler
+
+    self.ladder : Ladder = Ladder(self.names)
+    # pairings before this index are in the ladder, finished ones after it wait in pending
+    self.next_pairing : int = 0
+    self.pending : dict[int, tuple[int, int, int, int, int]] = {}
+    self.elapsed : float = 0.0
+
+  def pairing_count(self) -> int:
+    return len(self.names) * (len(self.names) - 1) // 2
+
+  def pairings(self, start : int = 0) -> Iterator[tuple[int, int, int]]:
+    pairs = combinations(range(len(self.names)), 2)
+    for pairing, (first, second) in enumerate(islice(pairs, start, None), start):
+      yield pairing, first, second
+
+  # what a checkpoint must match to be resumed
+  def fingerprint(self) -> str:
+    canonical = json.dumps({
+      "entrants": [[name, [template_stats(template) for template in templates]]
+                   for name, templates in zip(self.names, self.entrants)],
+      "games": self.games,
+      "seed": self.seed,
+      "max_ticks": self.max_ticks,
+      "scheduler": self.scheduler.name,
+      "rules": rules_fingerprint(),
+    }, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+  def record(self, pairing : int, first : int, second : int, first_wins : int, second_wins : int, draws : int):
+    self.pending[pairing] = (first, second, first_wins, second_wins, draws)
+    # fold in every pairing that is now next in line
+    while self.next_pairing in self.pending:
+      self.ladder.record(*self.pending.pop(self.next_pairing))
+      self.next_pairing += 1
+
+  def finished(self) -> bool:
+    return self.next_pairing >= self.pairing_count()
+
+  # fights the pairings not done yet, checkpointing every checkpoint_every seconds
+  # progress is called with (pairings done, pairing count) after each chunk
+  def run(self, workers : int | None = None, checkpoint_path : str | None = None, checkpoint_every : float = 30.0,
+          chunk_size : int = DEFAULT_CHUNK_SIZE, progress = None):
+    if workers is None:
+      workers = os.cpu_count() or 1
+
+    todo = (pairing for pairing in self.pairings(self.next_pairing) if pairing[0] not in self.pending)
+    chunks = iter(lambda: list(islice(todo, chunk_size)), [])
+    start = time.perf_counter()
+    # time spent by the runs before a resume
+    elapsed_before = self.elapsed
+    last_checkpoint = start
+
+    def on_chunk(results):
+      nonlocal last_checkpoint
+      for result in results:
+        self.record(*result)
+      now = time.perf_counter()
+      self.elapsed = elapsed_before + now - start
+      if checkpoint_path is not None and now - last_checkpoint >= checkpoint_every:
+        last_checkpoint = now
+        self.save(checkpoint_path)
+      if progress is not None:
+        progress(self.next_pairing + len(self.pending), self.pairing_count())
+
+    if workers <= 1:
+      init_worker(self.entrants)
+      for chunk in chunks:
+        on_chunk(play_pairings(chunk, self.games, self.seed, self.max_ticks, self.scheduler))
+    else:
+      with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(self.entrants,)) as pool:
+        # a bounded number of chunks in flight, so pending results stay small
+        running = set()
+        for chunk in islice(chunks, workers * SHARDS_PER_WORKER):
+          running.add(pool.submit(play_pairings, chunk, self.games, self.seed, self.max_ticks, self.scheduler))
+        while running:
+          done, running = wait(running, return_when=FIRST_COMPLETED)
+          for future in done:
+            on_chunk(future.result())
+            for chunk in islice(chunks, 1):
+              running.add(pool.submit(play_pairings, chunk, self.games, self.seed, self.max_ticks, self.scheduler))
+
+    self.elapsed = elapsed_before + time.perf_counter() - start
+    if checkpoint_path is not None:
+      self.save(checkpoint_path)
+
+  def save(self, path : str):
+    state = {
+      "version": CHECKPOINT_VERSION,
+      "fingerprint": self.fingerprint(),
+      "next_pairing": self.next_pairing,
+      "pending": [[pairing, *result] for pairing, result in sorted(self.pending.items())],
+      "results": [list(result) for result in self.ladder.results],
+      "elapsed": self.elapsed,
+    }
+    # written aside then renamed, an interrupted save leaves the previous checkpoint intact
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as checkpoint_file:
+      json.dump(state, checkpoint_file)
+    os.replace(temp_path, path)
+
+  # picks up a checkpoint of this same tournament, returns False when there is none
+  def resume(self, path : str) -> bool:
+    try:
+      with open(path) as checkpoint_file:
+        state = json.load(checkpoint_file)
+    except FileNotFoundError:
+      return False
+
+    if state.get("version") != CHECKPOINT_VERSION or state.get("fingerprint") != self.fingerprint():
+      raise ValueError(f"{path} is a checkpoint of a different tournament (entrants, games, seed or rules changed)")
+
+    self.next_pairing = state["next_pairing"]
+    self.pending = {pairing: tuple(result) for pairing, *result in state["pending"]}
+    for result in state["results"]:
+      self.ladder.record(*result)
+    self.elapsed = state["elapsed"]
+    return True
+
+  def report(self, top : int | None = None) -> str:
+    done = self.next_pairing + len(self.pending)
+    header = (f"{len(self.names)} entrants, {done}/{self.pairing_count()} pairings of {self.games} battles "
+              f"in {self.elapsed:.1f}s, seed {self.seed}")
+    return header + "\n" + self.ladder.table(top)
+
+# one entrant per team, named like the command line writes it ("Goblin+Goblin")
+# raises ValueError if a team is entered twice
+def team_entrants(team_setups : list[list[str]], unit_db : Mapping[str, FighterTemplate]) -> dict[str, list[FighterTemplate]]:
+  entrants = {}
+  for unit_names in team_setups:
+    add_entrant(entrants, "+".join(unit_names), [unit_db[name] for name in unit_names])
+  return entrants
+
+# generated fighters (e.g. a FighterBatch) entering on their own
+# raises ValueError if two of them have the same name
+def fighter_entrants(fighters) -> dict[str, list[FighterTemplate]]:
+  entrants = {}
+  for template in fighters:
+    add_entrant(entrants, template.name, [template])
+  return entrants
+
+# entrants are told apart by name, a second one with the same name would replace the first
+def add_entrant(entrants : dict[str, list[FighterTemplate]], name : str, templates : list[FighterTemplate]):
+  if name in entrants:
+    raise ValueError(f"entrant '{name}' is entered twice")
+  entrants[name] = templates
@@ -42,8 +42,9 @@ class Console:
     
     @staticmethod
     def clear():
-        """Clear the console screen."""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        """Clear the console screen and move the cursor home, without spawning a shell."""
+        sys.stdout.write("\033[2J\033[H")
+        sys.stdout.flush()
     
     @staticmethod
     def print_colored(text: str, color: str = Colors.RESET, end: str = '\n'):
@@ -0,0 +1,136 @@
+"""
+Fixed timestep clock for the game loop.
+Simulation ticks run at a fixed rate, decoupled from the render frames: a frame
+runs as many ticks as are owed, rendering is skipped when the loop falls behind,
+and fast-forward runs ticks back to back between frames.
+"""
+
+import time
+
+
+class GameClock:
+    """
+    Decides when the game loop ticks the simulation and when it renders.
+
+    A loop drives it like this:
+        clock.start()
+        while running:
+            while clock.tick_due():
+                update()
+                clock.tick_done()
+            if clock.render_due():
+                render()
+            clock.wait_next_frame()
+
+    Tick n is due n / tick_rate seconds after start(), tick 0 right away, so
+    the first frame already shows the state of a tick.
+    """
+
+    def __init__(self, tick_rate: float = 2.0, frame_rate: float = 2.0,
+                 max_ticks_per_frame: int = 8, fast_forward: bool = False):
+        self.tick_rate: float = tick_rate
+        self.frame_rate: float = frame_rate
+        self.max_ticks_per_frame: int = max_ticks_per_frame
+        self.fast_forward: bool = fast_forward
+
+        self.started_at: float = 0.0
+        self.sim_started_at: float = 0.0
+        self.frame_deadline: float = 0.0
+        self.frame_ticks: int = 0
+
+        self.ticks: int = 0
+        self.frames: int = 0
+        self.dropped_frames: int = 0
+        self.dropped_ticks: int = 0
+
+    @property
+    def frame_budget(self) -> float:
+        """Seconds available for one frame."""
+        return 1.0 / self.frame_rate
+
+    def start(self):
+        """Reset the statistics and start counting time from now."""
+        now = time.perf_counter()
+        self.started_at = now
+        self.sim_started_at = now
+        self.frame_deadline = now + self.frame_budget
+        self.frame_ticks = 0
+        self.ticks = 0
+        self.frames = 0
+        self.dropped_frames = 0
+        self.dropped_ticks = 0
+
+    def tick_due(self) -> bool:
+        """Whether the simulation should run one more tick in this frame."""
+        now = time.perf_counter()
+
+        if self.fast_forward:
+            # uncapped : tick until it is time to show a frame
+            return self.frame_ticks == 0 or now < self.frame_deadline
+
+        ticks_owed = int((now - self.sim_started_at) * self.tick_rate) + 1 - self.ticks
+        if ticks_owed <= 0:
+            return False
+
+        if self.frame_ticks >= self.max_ticks_per_frame:
+            # too far behind to catch up, drop the backlog instead of spiraling
+            self.dropped_ticks += ticks_owed
+            self.sim_started_at += ticks_owed / self.tick_rate
+            return False
+
+        return True
+
+    def tick_done(self):
+        """Record one simulation tick."""
+        self.ticks += 1
+        self.frame_ticks += 1
+
+    def render_due(self) -> bool:
+        """Whether this frame should be drawn, late frames are dropped."""
+        if time.perf_counter() - self.frame_deadline > self.frame_budget:
+            self.dropped_frames += 1
+            return False
+
+        self.frames += 1
+        return True
+
+    def wait_next_frame(self):
+        """Sleep until the next frame is due."""
+        delay = self.next_frame_delay()
+        if delay > 0:
+            time.sleep(delay)
+
+    def next_frame_delay(self) -> float:
+        """
+        Move on to the next frame.
+
+        Returns:
+            Seconds to wait before it starts, for loops that sleep on their own
+        """
+        now = time.perf_counter()
+        delay = 0.0
+
+        if now < self.frame_deadline and not self.fast_forward:
+            delay = self.frame_deadline - now
+        elif now - self.frame_deadline > self.frame_budget:
+            # more than a frame late, start over from now rather than bursting
+            self.frame_deadline = now
+
+        self.frame_deadline += self.frame_budget
+        self.frame_ticks = 0
+        return delay
+
+    def achieved_tick_rate(self) -> float:
+        """Simulation ticks per second since start()."""
+        elapsed = time.perf_counter() - self.started_at
+        if elapsed <= 0:
+            return 0.0
+        return self.ticks / elapsed
+
+    def report(self) -> str:
+        """Get a one line summary of the loop timing."""
+        target = "uncapped" if self.fast_forward else f"target {self.tick_rate:g}"
+        return (f"frame budget {self.frame_budget * 1000:.1f} ms, "
+                f"{self.achieved_tick_rate():.1f} ticks/s ({target}), "
+                f"{self.frames} frames, {self.dropped_frames} dropped frames, "
+                f"{self.dropped_ticks} dropped ticks")
@@ -0,0 +1,118 @@
+"""
+Runtime instrumentation for the game loop and the arena.
+Per-phase timers and named counters that can be switched on and off while the
+game runs, plus a helper to capture a cProfile trace of a few loops.
+"""
+
+import cProfile
+import time
+from typing import Callable, Dict, Optional
+
+
+class PhaseStats:
+    """Call count and wall time accumulated by one phase."""
+
+    __slots__ = ("calls", "total", "worst")
+
+    def __init__(self):
+        self.calls: int = 0
+        self.total: float = 0.0
+        self.worst: float = 0.0
+
+    def add(self, seconds: float):
+        self.calls += 1
+        self.total += seconds
+        if seconds > self.worst:
+            self.worst = seconds
+
+
+class Profiler:
+    """
+    Collects phase timings and counters while enabled.
+
+    Code paths check `enabled` (or hold the profiler only while it is enabled)
+    so a disabled profiler costs one attribute check per instrumented call.
+    """
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.phases: Dict[str, PhaseStats] = {}
+        self.counters: Dict[str, int] = {}
+        self.started_at: float = time.perf_counter()
+
+    def enable(self):
+        """Start collecting."""
+        self.enabled = True
+
+    def disable(self):
+        """Stop collecting, the collected numbers are kept."""
+        self.enabled = False
+
+    def reset(self):
+        """Forget everything collected so far."""
+        self.phases.clear()
+        self.counters.clear()
+        self.started_at = time.perf_counter()
+
+    def add_time(self, phase: str, seconds: float):
+        """Add one timed call of a phase."""
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.add(seconds)
+
+    def count(self, counter: str, amount: int = 1):
+        """Increase a named counter."""
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def time_call(self, phase: str, fn: Callable, *args):
+        """
+        Call fn(*args), timing it under phase when enabled.
+
+        Returns:
+            Whatever fn returned
+        """
+        if not self.enabled:
+            return fn(*args)
+
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.add_time(phase, time.perf_counter() - start)
+
+    def summary(self) -> str:
+        """Get a printable summary of the phases and counters."""
+        elapsed = time.perf_counter() - self.started_at
+        lines = [f"profile over {elapsed:.2f}s"]
+
+        for phase, stats in sorted(self.phases.items(), key=lambda item: item[1].total, reverse=True):
+            mean = stats.total / stats.calls if stats.calls else 0.0
+            lines.append(
+                f"  {phase:<32} {stats.calls:>9} calls  {stats.total * 1000:>10.2f} ms total"
+                f"  {mean * 1e6:>9.1f} us mean  {stats.worst * 1e6:>9.1f} us worst"
+            )
+
+        for counter, value in sorted(self.counters.items()):
+            lines.append(f"  {counter:<32} {value:>12}")
+
+        return "\n".join(lines)
+
+
+def profile_calls(fn: Callable, output_path: Optional[str] = None) -> cProfile.Profile:
+    """
+    Run fn under cProfile.
+
+    Args:
+        fn: What to profile
+        output_path: If given, the pstats dump is written there
+            (readable by pstats, snakeviz, flameprof or gprof2dot)
+
+    Returns:
+        The profile, for further inspection
+    """
+    profile = cProfile.Profile()
+    profile.runcall(fn)
+    if output_path is not None:
+        profile.dump_stats(output_path)
+    return profile
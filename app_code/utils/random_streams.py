@@ -0,0 +1,53 @@
+"""
+Seeded random streams for reproducible simulation.
+Each battle draws from its own stream, derived from a root seed and the battle
+index, so results don't depend on what ran earlier in the process or on how the
+runs were sharded across workers.
+"""
+
+import hashlib
+import random
+from typing import Optional
+
+
+def derive_seed(root_seed: int, *path: int) -> int:
+    """
+    Derive an independent 64 bit seed from a root seed and a path of indices.
+
+    Args:
+        root_seed: Seed of the whole run
+        path: Indices identifying the substream (worker, battle, ...)
+
+    Returns:
+        Seed of the substream
+    """
+    key = ",".join(str(part) for part in (root_seed, *path)).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class SeedStream:
+    """
+    A node in a tree of seeds: spawn() gives child streams, random() a generator.
+    """
+
+    def __init__(self, root_seed: Optional[int] = None, path: tuple = ()):
+        if root_seed is None:
+            root_seed = random.SystemRandom().getrandbits(32)
+        self.root_seed: int = root_seed
+        self.path: tuple = path
+
+    @property
+    def seed(self) -> int:
+        """Seed of this stream, also usable to seed a numpy generator."""
+        return derive_seed(self.root_seed, *self.path)
+
+    def spawn(self, *indices: int) -> "SeedStream":
+        """Get the child stream at the given indices."""
+        return SeedStream(self.root_seed, self.path + indices)
+
+    def random(self) -> random.Random:
+        """Get a fresh generator positioned at the start of this stream."""
+        return random.Random(self.seed)
+
+    def __repr__(self) -> str:
+        return f"SeedStream({self.root_seed}, {self.path})"
@@ -0,0 +1,112 @@
+"""
+Frame buffered console rendering.
+A frame is composed in memory as a grid of characters and Colors codes, then
+compared with the previous frame so only the changed cells are sent to the
+terminal, with ANSI cursor moves, in a single write.
+"""
+
+import sys
+from typing import List, Optional, TextIO
+
+from .console import Colors
+
+
+class ScreenBuffer:
+    """A width x height grid of characters, each with its own color code."""
+
+    def __init__(self, width: int, height: int):
+        self.width: int = width
+        self.height: int = height
+        self.chars: List[List[str]] = []
+        self.colors: List[List[str]] = []
+        self.clear()
+
+    def clear(self):
+        """Blank every cell."""
+        self.chars = [[" "] * self.width for _ in range(self.height)]
+        self.colors = [[Colors.RESET] * self.width for _ in range(self.height)]
+
+    def write(self, x: int, y: int, text: str, color: str = Colors.RESET):
+        """Write text from (x, y), clipped to the buffer."""
+        if not 0 <= y < self.height or x >= self.width:
+            return
+
+        if x < 0:
+            text = text[-x:]
+            x = 0
+        text = text[:self.width - x]
+
+        self.chars[y][x:x + len(text)] = text
+        self.colors[y][x:x + len(text)] = [color] * len(text)
+
+    def draw_bar(self, x: int, y: int, width: int, fraction: float,
+                 color: str = Colors.GREEN, empty_color: str = Colors.DIM):
+        """Draw a horizontal gauge, filled up to fraction (0 to 1)."""
+        fraction = min(max(fraction, 0.0), 1.0)
+        filled = int(round(width * fraction))
+        self.write(x, y, "█" * filled, color)
+        self.write(x + filled, y, "░" * (width - filled), empty_color)
+
+
+class ScreenRenderer:
+    """
+    Sends ScreenBuffer frames to a terminal, only redrawing what changed.
+    """
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream: TextIO = stream if stream is not None else sys.stdout
+        self.previous_chars: Optional[List[List[str]]] = None
+        self.previous_colors: Optional[List[List[str]]] = None
+        self.cells_written: int = 0
+
+    def invalidate(self):
+        """Force a full redraw on the next frame."""
+        self.previous_chars = None
+        self.previous_colors = None
+
+    def present(self, frame: ScreenBuffer):
+        """Draw frame, writing only the cells that differ from the last one."""
+        output = []
+        full_redraw = (self.previous_chars is None
+                       or len(self.previous_chars) != frame.height
+                       or len(self.previous_chars[0]) != frame.width)
+        if full_redraw:
+            output.append("\033[2J")
+
+        current_color = None
+        cells = 0
+
+        for y in range(frame.height):
+            chars = frame.chars[y]
+            colors = frame.colors[y]
+            if not full_redraw:
+                old_chars = self.previous_chars[y]
+                old_colors = self.previous_colors[y]
+                # most rows don't change from one frame to the next
+                if chars == old_chars and colors == old_colors:
+                    continue
+
+            x = 0
+            while x < frame.width:
+                if not full_redraw and chars[x] == old_chars[x] and colors[x] == old_colors[x]:
+                    x += 1
+                    continue
+
+                # one cursor move per run of changed cells
+                output.append(f"\033[{y + 1};{x + 1}H")
+                while x < frame.width and (full_redraw or chars[x] != old_chars[x] or colors[x] != old_colors[x]):
+                    if colors[x] != current_color:
+                        current_color = colors[x]
+                        output.append(Colors.RESET + current_color)
+                    output.append(chars[x])
+                    cells += 1
+                    x += 1
+
+        if output:
+            output.append(Colors.RESET + f"\033[{frame.height + 1};1H")
+            self.stream.write("".join(output))
+            self.stream.flush()
+
+        self.cells_written = cells
+        self.previous_chars = [row[:] for row in frame.chars]
+        self.previous_colors = [row[:] for row in frame.colors]
@@ -0,0 +1,201 @@
+# ArenaEnv benchmarks
+# fight_battle ticks/sec and battles/sec across team sizes and unit matchups,
+# the same for the numpy struct of arrays arena when numpy is installed,
+# battles/sec of BatchArena against fighting the same battles one by one,
+# fighter generation throughput, one by one and in bulk, battle state
+# snapshot / restore / fork rates against copy.deepcopy, and the tick rate with
+# hundreds of stacked status effects per unit
+
+import copy
+import random
+import time
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.arena.effects import StatusEffect
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.utils.random_streams import SeedStream
+from benchmarks.timing import rate, repeat_for, result
+
+try:
+  from app_code.arena.batch_arena import BatchArena
+  from app_code.arena.numpy_arena import NumpyArenaEnv
+  from app_code.barracks.fighter_batch import FighterBatch
+except ImportError:
+  # numpy is optional
+  BatchArena = None
+  NumpyArenaEnv = None
+  FighterBatch = None
+
+TEAM_SIZES = [1, 10, 100, 1000, 5000]
+QUICK_TEAM_SIZES = [1, 10, 100]
+EFFECTS_PER_UNIT = [0, 10, 100, 300]
+BATCH_SETUPS = [[["Goblin"], ["Bandit"]], [["Goblin"] * 5, ["Bandit"] * 5]]
+BATCH_SIZES = [1000, 100_000]
+QUICK_BATCH_SIZES = [1000]
+# stat changes and periodic timers, the regen keeps the units alive through the measure
+EFFECT_MIX = (StatusEffect("banner", strength=1), StatusEffect("haste", 500, speed=0.01),
+              StatusEffect("regen", period=10, hp_per_period=1))
+
+def setup_arena(scheduler : SchedulerEnum, seed : int) -> ArenaEnv:
+  arena = ArenaEnv(SeedStream(seed).random())
+  arena.init()
+  arena.scheduler = scheduler
+  return arena
+
+# the tick scheduler is too slow to finish big battles in a benchmark,
+# so it is measured over at most max_ticks fight_battle calls
+def bench_tick_rate(team_setups : list[list[str]], max_ticks : int, seed : int = 0) -> dict:
+  arena = setup_arena(SchedulerEnum.TICK, seed)
+  arena.setup_battle(team_setups)
+
+  start = time.perf_counter()
+  calls = 0
+  while calls < max_ticks and not arena.fight_battle():
+    calls += 1
+  elapsed = time.perf_counter() - start
+
+  return {"ticks_per_sec": rate(arena.tick, elapsed), "ticks": arena.tick}
+
+# NumpyArenaEnv over the same battles as bench_tick_rate
+def bench_numpy_tick_rate(team_setups : list[list[str]], max_ticks : int, seed : int = 0) -> dict:
+  arena = NumpyArenaEnv(seed)
+  arena.init()
+  arena.setup_battle(team_setups)
+
+  start = time.perf_counter()
+  calls = 0
+  while calls < max_ticks and not arena.fight_battle():
+    calls += 1
+  elapsed = time.perf_counter() - start
+
+  return {"ticks_per_sec": rate(arena.tick, elapsed), "ticks": arena.tick}
+
+def bench_battle_rate(team_setups : list[list[str]], scheduler : SchedulerEnum, min_time : float,
+                      seed : int = 0) -> dict:
+  arena = setup_arena(scheduler, seed)
+  ticks = 0
+  calls = 0
+
+  def fight():
+    nonlocal ticks, calls
+    arena.setup_battle(team_setups)
+    while not arena.fight_battle():
+      calls += 1
+    ticks += arena.tick
+
+  battles, elapsed = repeat_for(fight, min_time)
+  return {
+    "battles_per_sec": rate(battles, elapsed),
+    "ticks_per_sec": rate(ticks, elapsed),
+    "fight_battle_calls_per_sec": rate(calls, elapsed),
+    "mean_ticks": ticks / battles,
+  }
+
+# one BatchArena run of `battles` copies of the set up battle
+def bench_batch_rate(team_setups : list[list[str]], battles : int, seed : int = 0) -> dict:
+  arena = BatchArena(seed)
+  arena.init()
+  arena.setup_battle(team_setups)
+
+  start = time.perf_counter()
+  _, durations = arena.run(battles)
+  elapsed = time.perf_counter() - start
+
+  return {"battles_per_sec": rate(battles, elapsed), "ticks_per_sec": rate(int(durations.sum()), elapsed),
+          "mean_ticks": float(durations.mean())}
+
+def bench_batches(batch_sizes : list[int], min_time : float) -> list[dict]:
+  results = []
+  for team_setups in BATCH_SETUPS:
+    params = {"teams": ",".join("+".join(unit_names) for unit_names in team_setups)}
+    results.append(result("battles_one_by_one", params, bench_battle_rate(team_setups, SchedulerEnum.EVENT, min_time)))
+    if BatchArena is not None:
+      for size in batch_sizes:
+        results.append(result("battles_batched", {**params, "battles": size}, bench_batch_rate(team_setups, size)))
+  return results
+
+def bench_team_sizes(team_sizes : list[int], min_time : float, max_ticks : int) -> list[dict]:
+  results = []
+  for size in team_sizes:
+    team_setups = [["Goblin"] * size, ["Bandit"] * size]
+    params = {"goblins": size, "bandits": size}
+    results.append(result("fight_battle_tick", params, bench_tick_rate(team_setups, max_ticks)))
+    if NumpyArenaEnv is not None:
+      results.append(result("fight_battle_numpy", params, bench_numpy_tick_rate(team_setups, max_ticks)))
+    results.append(result("fight_battle_event", params, bench_battle_rate(team_setups, SchedulerEnum.EVENT, min_time)))
+  return results
+
+def bench_matchups(min_time : float) -> list[dict]:
+  unit_db = get_pregen_unit_database()
+  results = []
+  for name in unit_db:
+    for other_name in unit_db:
+      if name == other_name:
+        continue
+      params = {"team_0": name, "team_1": other_name,
+                "speed_ratio": unit_db[name].speed / unit_db[other_name].speed}
+      for scheduler in (SchedulerEnum.TICK, SchedulerEnum.EVENT):
+        metrics = bench_battle_rate([[name], [other_name]], scheduler, min_time)
+        results.append(result(f"matchup_{scheduler.name.lower()}", params, metrics))
+  return results
+
+def bench_init_fighter(min_time : float) -> list[dict]:
+  rng = random.Random(0)
+
+  def generate():
+    for _ in range(1000):
+      FighterTemplate("bench").init_fighter(rng)
+
+  calls, elapsed = repeat_for(generate, min_time)
+  results = [result("init_fighter", {}, {"fighters_per_sec": rate(calls * 1000, elapsed)})]
+
+  if FighterBatch is not None:
+    batch_size = 1_000_000
+    calls, elapsed = repeat_for(lambda: FighterBatch(batch_size, seed=0), min_time)
+    results.append(result("init_fighter_bulk", {"fighters": batch_size},
+                          {"fighters_per_sec": rate(calls * batch_size, elapsed)}))
+  return results
+
+def bench_snapshot(team_size : int, min_time : float) -> list[dict]:
+  arena = setup_arena(SchedulerEnum.EVENT, 0)
+  arena.setup_battle([["Goblin"] * team_size, ["Bandit"] * team_size])
+  # somewhere in the middle of the battle, with a few deaths
+  for _ in range(team_size):
+    arena.fight_battle()
+
+  snapshot = arena.snapshot()
+  metrics = {}
+  for metric, fn in (("snapshots_per_sec", arena.snapshot), ("restores_per_sec", lambda: arena.restore(snapshot)),
+                     ("forks_per_sec", arena.fork), ("deepcopies_per_sec", lambda: copy.deepcopy(arena))):
+    calls, elapsed = repeat_for(fn, min_time)
+    metrics[metric] = rate(calls, elapsed)
+  return [result("battle_snapshot", {"units": team_size * 2}, metrics)]
+
+# per tick cost as effects stack up, effect timers are due every 10 ticks at least
+# it grows linearly with the periodic effects, every one is a timer of its own (see effects.py)
+def bench_effects(effects_per_unit : list[int], max_ticks : int, team_size : int = 10) -> list[dict]:
+  results = []
+  for count in effects_per_unit:
+    for scheduler in (SchedulerEnum.TICK, SchedulerEnum.EVENT):
+      arena = setup_arena(scheduler, 0)
+      arena.setup_battle([["Giant"] * team_size, ["Giant"] * team_size])
+      for unit in arena.units:
+        for i in range(count):
+          arena.apply_effect(unit, EFFECT_MIX[i % len(EFFECT_MIX)])
+
+      start = time.perf_counter()
+      calls = 0
+      while calls < max_ticks and not arena.fight_battle():
+        calls += 1
+      elapsed = time.perf_counter() - start
+      results.append(result(f"effects_{scheduler.name.lower()}", {"units": team_size * 2, "effects_per_unit": count},
+                            {"ticks_per_sec": rate(arena.tick, elapsed), "usec_per_tick": elapsed * 1e6 / arena.tick}))
+  return results
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  team_sizes = QUICK_TEAM_SIZES if quick else TEAM_SIZES
+  max_ticks = 200 if quick else 2000
+  batch_sizes = QUICK_BATCH_SIZES if quick else BATCH_SIZES
+  return bench_team_sizes(team_sizes, min_time, max_ticks) + bench_matchups(min_time) + bench_init_fighter(min_time) \
+         + bench_batches(batch_sizes, min_time) + bench_snapshot(50, min_time) + bench_effects(EFFECTS_PER_UNIT, max_ticks)
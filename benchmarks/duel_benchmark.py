@@ -0,0 +1,101 @@
+# Analytic duel solver benchmark
+# cross-checks solve_duel against the tick loop on every ordered pair of a
+# roster, then compares a whole 1v1 matrix with fighting the same duels
+#
+# python -m benchmarks.duel_benchmark --roster 40
+
+import argparse
+import random
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum, duel_matrix, solve_duel
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.utils.random_streams import SeedStream
+from benchmarks.timing import rate, repeat_for, result
+
+def random_roster(size : int, seed : int = 0) -> dict[str, FighterTemplate]:
+  rng = random.Random(seed)
+  roster = {}
+  for i in range(size):
+    template = FighterTemplate(f"Unit{i}")
+    template.strength = rng.randint(0, 15)
+    template.agility = rng.randint(1, 5)
+    template.speed = rng.choice([0, 1, 2, 3, 4, 5, 6, 0.5, 2.5])
+    template.max_hp = rng.randint(1, 30) * 10
+    roster[template.name] = template.freeze()
+  return roster
+
+def fight_duel(arena : ArenaEnv, first : str, second : str, max_ticks : int) -> tuple:
+  arena.setup_battle([[first], [second]])
+  finished = arena.run_battle(max_ticks)
+  return (arena.winner_team_id() if finished else None, arena.tick if finished else None,
+          tuple(unit.current_hp for unit in arena.units) if finished else None)
+
+# fights every ordered pair with the tick loop and compares with solve_duel
+# returns the pairs that disagree, with both results
+def check_duels(roster : dict[str, FighterTemplate], scheduler : SchedulerEnum = SchedulerEnum.EVENT,
+                max_ticks : int = 1_000_000) -> list[tuple]:
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.pregen_unit_templates = roster
+  arena.scheduler = scheduler
+  arena.analytic_duels = False
+
+  mismatches = []
+  for first in roster:
+    for second in roster:
+      duel = solve_duel(roster[first], roster[second])
+      expected = (None, None, None) if duel.winner is None else (duel.winner, duel.tick, duel.hp)
+      fought = fight_duel(arena, first, second, max_ticks)
+      if fought != expected:
+        mismatches.append((first, second, expected, fought))
+  return mismatches
+
+def bench_matrix(roster : dict[str, FighterTemplate], min_time : float) -> dict:
+  matrix_calls, matrix_elapsed = repeat_for(lambda: duel_matrix(roster), min_time)
+
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.pregen_unit_templates = roster
+  arena.scheduler = SchedulerEnum.EVENT
+  arena.analytic_duels = False
+  pairs = [(first, second) for first in roster for second in roster]
+
+  def fight_all():
+    for first, second in pairs:
+      fight_duel(arena, first, second, 1_000_000)
+
+  loop_calls, loop_elapsed = repeat_for(fight_all, min_time)
+  return {
+    "solved_duels_per_sec": rate(matrix_calls * len(pairs), matrix_elapsed),
+    "fought_duels_per_sec": rate(loop_calls * len(pairs), loop_elapsed),
+    "matrix_usec": matrix_elapsed / matrix_calls * 1e6,
+  }
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  pregen = dict(get_pregen_unit_database())
+  roster = random_roster(10 if quick else 30)
+
+  mismatches = check_duels(pregen, SchedulerEnum.TICK) + check_duels(pregen) + check_duels(roster)
+  if mismatches:
+    raise AssertionError(f"solve_duel disagrees with the tick loop : {mismatches[:5]}")
+
+  return [result("duel_matrix", {"templates": len(templates)}, bench_matrix(templates, min_time))
+          for templates in (pregen, roster)]
+
+def main():
+  parser = argparse.ArgumentParser(description="analytic duel solver check and benchmark")
+  parser.add_argument("--roster", type=int, default=30, help="size of the random roster")
+  parser.add_argument("--seed", type=int, default=0, help="seed of the random roster")
+  parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent on each measurement")
+  args = parser.parse_args()
+
+  roster = random_roster(args.roster, args.seed)
+  mismatches = check_duels(dict(get_pregen_unit_database()), SchedulerEnum.TICK) + check_duels(roster)
+  for first, second, expected, fought in mismatches:
+    print(f"MISMATCH {first} v {second} : solved {expected}, fought {fought}")
+  print(f"{args.roster * args.roster} duels checked, {len(mismatches)} mismatches")
+
+  metrics = bench_matrix(roster, args.min_time)
+  print("  ".join(f"{metric}={value:,.1f}" for metric, value in metrics.items()))
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,44 @@
+# GameEngine benchmarks
+# one request_inputs / update_game_state / refresh_display loop iteration,
+# the way Root.run does it but without the sleep and with stdout swallowed
+
+import contextlib
+import io
+
+from app_code._common_enums.common_enums import GameStateEnum
+from app_code.game_engine import GameEngine
+from benchmarks.timing import rate, repeat_for, result
+
+def bench_loop_iteration(team_setups : list[list[str]], min_time : float) -> dict:
+  sink = io.StringIO()
+
+  with contextlib.redirect_stdout(sink):
+    engine = GameEngine()
+    engine.init()
+
+  def restart_battle():
+    engine.game_state.arena_env.setup_battle(team_setups)
+    engine.game_state.state = GameStateEnum.BATTLE
+
+  # stay in the BATTLE state : BATTLE_OVER would block on input()
+  def loop_iteration():
+    if engine.game_state.state != GameStateEnum.BATTLE:
+      restart_battle()
+    engine.request_inputs()
+    engine.update_game_state()
+    engine.refresh_display()
+    sink.seek(0)
+    sink.truncate()
+
+  with contextlib.redirect_stdout(sink):
+    restart_battle()
+    iterations, elapsed = repeat_for(loop_iteration, min_time)
+
+  return {"loops_per_sec": rate(iterations, elapsed), "usec_per_loop": elapsed / iterations * 1e6}
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  results = []
+  for size in (1, 10) if quick else (1, 10, 100):
+    params = {"goblins": size, "bandits": size}
+    results.append(result("game_engine_loop", params, bench_loop_iteration([["Goblin"] * size, ["Bandit"] * size], min_time)))
+  return results
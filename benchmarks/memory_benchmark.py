@@ -0,0 +1,87 @@
+# Memory per unit of a big arena
+# compares the old CombatEntity layout (a __dict__ per unit, an alive flag and
+# a CombatTeam allocated per unit) with the current slotted one, and fails if
+# the slotted one goes over MAX_SLOTTED_BYTES_PER_UNIT
+#
+# the legacy layout measures 256 bytes per unit here. The slotted one measured
+# 156 with its first 7 slots, the event scheduler and status effect fields
+# (strength, speed, effects, meter_tick, turn_entry) brought it to 205
+#
+# python -m benchmarks.memory_benchmark --units 1000000
+
+import argparse
+import gc
+import tracemalloc
+
+from app_code.arena.arena import ArenaEnv, CombatEntity
+
+# the current layout plus a little allocator noise, a new slot (8 bytes and often an object) goes over
+MAX_SLOTTED_BYTES_PER_UNIT = 210
+
+# the CombatEntity / CombatTeam layout before units became slotted records
+class LegacyCombatTeam:
+  def __init__(self):
+    self.unit_list = []
+
+class LegacyCombatEntity:
+  def __init__(self, template):
+    self.template = template
+    self.team = LegacyCombatTeam()
+    self.alive = True
+    self.current_hp = template.max_hp
+    self.speed_meter = 0
+
+
+def measure(build) -> tuple[int, object]:
+  gc.collect()
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  kept = build()
+  after = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return after - before, kept
+
+def legacy_arena(unit_count : int, template):
+  return [LegacyCombatEntity(template) for _ in range(unit_count)]
+
+def slotted_arena(unit_count : int, team_setups):
+  arena = ArenaEnv()
+  arena.init()
+  arena.setup_battle(team_setups)
+  return arena
+
+def run(unit_count : int) -> dict[str, float]:
+  arena = ArenaEnv()
+  arena.init()
+  template = arena.pregen_unit_templates["Goblin"]
+  half = unit_count // 2
+  team_setups = [["Goblin"] * half, ["Bandit"] * (unit_count - half)]
+
+  legacy_bytes, kept = measure(lambda: legacy_arena(unit_count, template))
+  del kept
+  slotted_bytes, kept = measure(lambda: slotted_arena(unit_count, team_setups))
+  del kept
+
+  if slotted_bytes / unit_count > MAX_SLOTTED_BYTES_PER_UNIT:
+    raise AssertionError(f"slotted CombatEntity takes {slotted_bytes / unit_count:.0f} bytes per unit, "
+                         f"over the {MAX_SLOTTED_BYTES_PER_UNIT} bytes bound")
+
+  return {
+    "units": unit_count,
+    "legacy_bytes_per_unit": legacy_bytes / unit_count,
+    "slotted_bytes_per_unit": slotted_bytes / unit_count,
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description="bytes per unit of an arena")
+  parser.add_argument("--units", type=int, default=1_000_000)
+  args = parser.parse_args()
+
+  result = run(args.units)
+  print(f"{result['units']} units")
+  print(f"  legacy  CombatEntity : {result['legacy_bytes_per_unit']:.0f} bytes/unit")
+  print(f"  slotted CombatEntity : {result['slotted_bytes_per_unit']:.0f} bytes/unit")
+  print(f"  CombatEntity.__slots__ : {', '.join(CombatEntity.__slots__)}")
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,72 @@
+# Rollout targeting policy benchmark
+# decisions/sec and rollouts/sec of RolloutTargetPolicy for a few battle sizes
+# and budgets, and the win rate it gets against random targeting compared with
+# random against random on the same seeded battles
+#
+# python -m benchmarks.policy_benchmark --battles 20 --rollouts 16,64
+
+import argparse
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.arena.targeting import RolloutTargetPolicy
+from app_code.utils.random_streams import SeedStream
+from benchmarks.timing import result
+
+# the same mixed teams on both sides, who hits the giant first matters
+def team_setups(size : int) -> list[list[str]]:
+  team = (["Goblin", "Bandit", "Giant"] * size)[:size]
+  return [list(team), list(team)]
+
+def win_rate(setups : list[list[str]], battles : int, policy : RolloutTargetPolicy | None) -> float:
+  arena = ArenaEnv()
+  arena.init()
+  arena.scheduler = SchedulerEnum.EVENT
+  if policy is not None:
+    arena.target_policies = {0: policy}
+
+  wins = 0.0
+  seed_stream = SeedStream(0)
+  for battle_index in range(battles):
+    arena.setup_battle(setups, seed_stream.spawn(battle_index).random())
+    if not arena.run_battle():
+      wins += 0.5
+    elif arena.winner_team_id() == 0:
+      wins += 1
+  return wins / battles
+
+def bench_policy(size : int, battles : int, rollouts : int | None, time_budget : float | None) -> dict:
+  setups = team_setups(size)
+  policy = RolloutTargetPolicy(rollouts, time_budget, seed=0)
+  return {
+    "win_rate": win_rate(setups, battles, policy),
+    "random_win_rate": win_rate(setups, battles, None),
+    "decisions_per_sec": policy.decisions_per_sec(),
+    "rollouts_per_sec": policy.rollouts_per_sec(),
+  }
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  sizes = (3,) if quick else (3, 10)
+  battles = 4 if quick else 10
+  return [result("rollout_policy", {"units": size * 2, "rollouts": 16}, bench_policy(size, battles, 16, None))
+          for size in sizes]
+
+def main():
+  parser = argparse.ArgumentParser(description="rollout targeting policy speed and strength")
+  parser.add_argument("--sizes", default="3,10,30", help="comma separated team sizes")
+  parser.add_argument("--battles", type=int, default=20, help="battles per measurement")
+  parser.add_argument("--rollouts", default="16,64", help="comma separated rollout budgets per decision")
+  parser.add_argument("--time-budget", type=float, default=None,
+                      help="seconds per decision, instead of the rollout budgets")
+  args = parser.parse_args()
+
+  budgets = [None] if args.time_budget is not None else [int(rollouts) for rollouts in args.rollouts.split(",")]
+  for size in (int(size) for size in args.sizes.split(",")):
+    for rollouts in budgets:
+      metrics = bench_policy(size, args.battles, rollouts, args.time_budget)
+      budget = f"{args.time_budget * 1000:g} ms" if rollouts is None else f"{rollouts} rollouts"
+      print(f"{size:>3}v{size:<3} {budget:>12} : win rate {metrics['win_rate'] * 100:5.1f}% "
+            f"(random {metrics['random_win_rate'] * 100:5.1f}%)  {metrics['decisions_per_sec']:8.1f} decisions/sec  "
+            f"{metrics['rollouts_per_sec']:8.0f} rollouts/sec")
+
+if __name__ == "__main__":
+  main()
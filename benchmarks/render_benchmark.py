@@ -0,0 +1,40 @@
+# Console renderer benchmark
+# frames/sec of drawing a battle into a ScreenBuffer and presenting the diff,
+# with the terminal replaced by an in-memory stream
+
+import io
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.interfaces.battle_view import draw_arena
+from app_code.utils.random_streams import SeedStream
+from app_code.utils.screen_buffer import ScreenBuffer, ScreenRenderer
+from benchmarks.timing import rate, repeat_for, result
+
+def bench_render(team_size : int, min_time : float, width : int = 200, height : int = 60) -> dict:
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.init()
+  arena.scheduler = SchedulerEnum.EVENT
+  arena.setup_battle([["Goblin"] * team_size, ["Bandit"] * team_size])
+
+  frame = ScreenBuffer(width, height)
+  stream = io.StringIO()
+  renderer = ScreenRenderer(stream)
+  written = 0
+
+  # a few battle steps between frames so the hp bars keep changing
+  def render_frame():
+    nonlocal written
+    for _ in range(5):
+      arena.fight_battle()
+    draw_arena(frame, arena)
+    renderer.present(frame)
+    written += stream.tell()
+    stream.seek(0)
+    stream.truncate()
+
+  frames, elapsed = repeat_for(render_frame, min_time)
+  return {"frames_per_sec": rate(frames, elapsed), "bytes_per_frame": written / frames}
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  return [result("render_battle", {"goblins": size, "bandits": size}, bench_render(size, min_time))
+          for size in ((50,) if quick else (50, 200))]
@@ -0,0 +1,86 @@
+# Runs the benchmark suite and saves the results as json, so runs of two
+# commits can be compared
+#
+# python -m benchmarks.run --output bench.json
+# python -m benchmarks.run --quick --output new.json --compare bench.json
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+from benchmarks import (arena_benchmark, duel_benchmark, engine_benchmark, memory_benchmark, policy_benchmark,
+                        render_benchmark, server_benchmark, startup_benchmark)
+from benchmarks.timing import result
+
+def git_commit() -> str | None:
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                          check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def run_suite(quick : bool, min_time : float, memory_units : int) -> dict:
+  results = arena_benchmark.run(quick, min_time) + engine_benchmark.run(quick, min_time) \
+            + render_benchmark.run(quick, min_time) + startup_benchmark.run(quick, min_time) \
+            + duel_benchmark.run(quick, min_time) + policy_benchmark.run(quick, min_time) \
+            + server_benchmark.run(quick, min_time)
+
+  if memory_units > 0:
+    memory = memory_benchmark.run(memory_units)
+    results.append(result("memory_per_unit", {"units": memory_units},
+                          {"legacy_bytes_per_unit": memory["legacy_bytes_per_unit"],
+                           "slotted_bytes_per_unit": memory["slotted_bytes_per_unit"]}))
+
+  return {
+    "commit": git_commit(),
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    "python": platform.python_version(),
+    "machine": platform.machine(),
+    "quick": quick,
+    "results": results,
+  }
+
+def result_key(bench_result : dict) -> str:
+  return bench_result["benchmark"] + json.dumps(bench_result["params"], sort_keys=True)
+
+def format_result(bench_result : dict, baseline : dict | None = None) -> str:
+  params = " ".join(f"{key}={value:g}" if isinstance(value, float) else f"{key}={value}"
+                    for key, value in bench_result["params"].items())
+  metrics = []
+  for metric, value in bench_result["metrics"].items():
+    text = f"{metric}={value:,}" if isinstance(value, int) else f"{metric}={value:,.1f}"
+    if baseline is not None and baseline["metrics"].get(metric):
+      text += f" ({(value / baseline['metrics'][metric] - 1) * 100:+.1f}%)"
+    metrics.append(text)
+  return f"{bench_result['benchmark']:<22} {params:<40} {'  '.join(metrics)}"
+
+def main():
+  parser = argparse.ArgumentParser(description="combat engine and game loop benchmarks")
+  parser.add_argument("--output", default=None, help="json file to write the results to")
+  parser.add_argument("--compare", default=None, help="json results of an earlier run to compare against")
+  parser.add_argument("--quick", action="store_true", help="small team sizes only")
+  parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent on each measurement")
+  parser.add_argument("--memory-units", type=int, default=100_000, help="arena size of the memory benchmark, 0 skips it")
+  args = parser.parse_args()
+
+  report = run_suite(args.quick, args.min_time, args.memory_units)
+
+  baselines = {}
+  if args.compare:
+    with open(args.compare) as baseline_file:
+      baseline_report = json.load(baseline_file)
+    baselines = {result_key(bench_result): bench_result for bench_result in baseline_report["results"]}
+    print(f"compared to {baseline_report.get('commit')} ({baseline_report.get('timestamp')})")
+
+  for bench_result in report["results"]:
+    print(format_result(bench_result, baselines.get(result_key(bench_result))))
+
+  if args.output:
+    with open(args.output, "w") as output_file:
+      json.dump(report, output_file, indent=2)
+    print(f"results saved to {args.output}")
+
+if __name__ == "__main__":
+  main()
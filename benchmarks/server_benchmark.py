@@ -0,0 +1,57 @@
+# Battle server benchmark
+# starts a burst of battles on a BattleServer and measures battles/sec, ticks/sec
+# and the pass latency percentiles of its shards, for a few worker counts
+#
+# python -m benchmarks.server_benchmark --workers 1,2,4 --battles 10000
+
+import argparse
+import os
+import time
+
+from app_code.server.battle_server import PERCENTILES, BattleServer
+from benchmarks.timing import rate, result
+
+# mixed battle sizes, the 20v20 ones take far more passes than the small ones
+BATTLE_MIX = [[["Goblin", "Goblin", "Bandit"], ["Giant"]], [["Bandit"] * 5, ["Goblin"] * 5],
+              [["Goblin"] * 20, ["Bandit"] * 20]]
+
+def bench_server(workers : int, battles : int, ticks_per_pass : int = 1) -> dict:
+  with BattleServer(workers, ticks_per_pass, seed=0) as server:
+    start = time.perf_counter()
+    server.start_battles([BATTLE_MIX[i % len(BATTLE_MIX)] for i in range(battles)])
+    # the latency of passes over a full shard, before battles start to finish
+    loaded = server.stats()
+    server.wait()
+    elapsed = time.perf_counter() - start
+    shard_stats = server.stats()
+
+  metrics = {
+    "battles_per_sec": rate(battles, elapsed),
+    "ticks_per_sec": rate(sum(stats["ticks"] for stats in shard_stats), elapsed),
+    "arenas_per_shard": max(stats["arenas"] for stats in loaded),
+  }
+  for percent in PERCENTILES:
+    metrics[f"pass_p{percent}_ms"] = max(stats[f"pass_p{percent}_ms"] for stats in shard_stats)
+  return metrics
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  battles = 2000 if quick else 20000
+  worker_counts = (2,) if quick else sorted({1, 2, os.cpu_count() or 1})
+  return [result("battle_server", {"workers": workers, "battles": battles}, bench_server(workers, battles))
+          for workers in worker_counts]
+
+def main():
+  parser = argparse.ArgumentParser(description="battle server throughput and tick latency")
+  parser.add_argument("--workers", default="1,2,4", help="comma separated worker counts")
+  parser.add_argument("--battles", type=int, default=10000, help="battles started at once")
+  parser.add_argument("--ticks-per-pass", type=int, default=1, help="fight_battle calls per arena in a pass")
+  args = parser.parse_args()
+
+  for workers in (int(workers) for workers in args.workers.split(",")):
+    metrics = bench_server(workers, args.battles, args.ticks_per_pass)
+    percentiles = "  ".join(f"p{percent} {metrics[f'pass_p{percent}_ms']:.2f}" for percent in PERCENTILES)
+    print(f"{workers:>2} workers : {metrics['battles_per_sec']:8.0f} battles/sec  {metrics['ticks_per_sec']:14,.0f} ticks/sec  "
+          f"{metrics['arenas_per_shard']:>6} arenas/shard  pass ms {percentiles}")
+
+if __name__ == "__main__":
+  main()
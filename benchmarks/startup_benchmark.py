@@ -0,0 +1,113 @@
+# Unit database startup benchmark
+# time to get a template out of rosters of growing size, for the csv database
+# (cold : compiling the cache, warm : reusing it) and for the old hand written
+# python module of templates, in process and in a freshly spawned worker
+#
+# python -m benchmarks.startup_benchmark --sizes 10,1000,10000
+
+import argparse
+import importlib
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app_code.barracks.unit_database import UnitDatabase, default_cache_path
+from benchmarks.timing import rate, repeat_for, result
+
+def roster(size : int, seed : int = 0) -> list[tuple[str, int, int, int, int]]:
+  rng = random.Random(seed)
+  return [(f"Unit{i:05d}", rng.randint(1, 15), rng.randint(1, 5), rng.randint(1, 6), rng.randint(4, 30) * 10)
+          for i in range(size)]
+
+def write_csv(path : str, rows : list[tuple]):
+  with open(path, "w") as csv_file:
+    csv_file.write("name,strength,agility,speed,max_hp\n")
+    csv_file.writelines(",".join(map(str, row)) + "\n" for row in rows)
+
+# the roster written the way pregen_units.py used to be
+def write_legacy_module(path : str, rows : list[tuple]):
+  lines = ["from app_code.barracks.barracks import FighterTemplate", "", "PREGEN_UNIT_DB = {}", ""]
+  for name, strength, agility, speed, max_hp in rows:
+    var = name.lower()
+    lines += [f'{var} = FighterTemplate("{name}")', f"{var}.strength = {strength}", f"{var}.agility = {agility}",
+              f"{var}.speed = {speed}", f"{var}.max_hp = {max_hp}", f"PREGEN_UNIT_DB[{var}.name] = {var}.freeze()", ""]
+  with open(path, "w") as module_file:
+    module_file.write("\n".join(lines))
+
+# what a fresh worker does before its first battle, returns its own timing
+def first_lookup(kind : str, path : str, name : str) -> float:
+  start = time.perf_counter()
+  if kind == "legacy":
+    directory, file_name = os.path.split(path)
+    sys.path.insert(0, directory)
+    unit_db = importlib.import_module(os.path.splitext(file_name)[0]).PREGEN_UNIT_DB
+  else:
+    unit_db = UnitDatabase.open(path)
+  unit_db[name]
+  return time.perf_counter() - start
+
+# wall time from starting a spawned worker to getting its first template
+def spawn_time(kind : str, path : str, name : str) -> float:
+  start = time.perf_counter()
+  with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+    pool.submit(first_lookup, kind, path, name).result()
+  return time.perf_counter() - start
+
+def bench_roster(size : int, min_time : float, directory : str) -> dict:
+  rows = roster(size)
+  name = rows[-1][0]
+  csv_path = os.path.join(directory, f"units_{size}.csv")
+  module_path = os.path.join(directory, f"legacy_units_{size}.py")
+  write_csv(csv_path, rows)
+  write_legacy_module(module_path, rows)
+
+  def cold_open():
+    cache_path = default_cache_path(csv_path)
+    if os.path.exists(cache_path):
+      os.remove(cache_path)
+    UnitDatabase.open(csv_path)[name]
+
+  def warm_open():
+    UnitDatabase.open(csv_path)[name]
+
+  # the module body, as run by every import in a new process (its .pyc already exists)
+  with open(module_path) as module_file:
+    module_code = compile(module_file.read(), module_path, "exec")
+
+  def legacy_import():
+    exec(module_code, {})
+
+  metrics = {}
+  for metric, fn in (("cold_open_ms", cold_open), ("warm_open_ms", warm_open), ("legacy_import_ms", legacy_import)):
+    calls, elapsed = repeat_for(fn, min_time)
+    metrics[metric] = 1000 / rate(calls, elapsed)
+
+  # first spawns write the cache and the .pyc
+  spawn_time("database", csv_path, name)
+  spawn_time("legacy", module_path, name)
+  metrics["spawn_ms"] = spawn_time("database", csv_path, name) * 1000
+  metrics["legacy_spawn_ms"] = spawn_time("legacy", module_path, name) * 1000
+  return metrics
+
+def run(quick : bool = False, min_time : float = 0.5) -> list[dict]:
+  sizes = (10, 1000) if quick else (10, 1000, 10000)
+  with tempfile.TemporaryDirectory() as directory:
+    return [result("unit_db_startup", {"templates": size}, bench_roster(size, min_time, directory)) for size in sizes]
+
+def main():
+  parser = argparse.ArgumentParser(description="unit database startup time against roster size")
+  parser.add_argument("--sizes", default="10,1000,10000", help="comma separated roster sizes")
+  parser.add_argument("--min-time", type=float, default=0.5, help="seconds spent on each measurement")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    for size in (int(size) for size in args.sizes.split(",")):
+      metrics = bench_roster(size, args.min_time, directory)
+      print(f"{size:>6} templates : " + "  ".join(f"{metric}={value:.2f}" for metric, value in metrics.items()))
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,24 @@
+# Small timing helpers shared by the benchmarks
+
+import time
+
+# calls fn until min_time has elapsed (at least once)
+# returns the number of calls and the elapsed seconds
+def repeat_for(fn, min_time : float) -> tuple[int, float]:
+  calls = 0
+  start = time.perf_counter()
+  elapsed = 0.0
+  while calls == 0 or elapsed < min_time:
+    fn()
+    calls += 1
+    elapsed = time.perf_counter() - start
+  return calls, elapsed
+
+def rate(count : float, elapsed : float) -> float:
+  if elapsed <= 0:
+    return 0.0
+  return count / elapsed
+
+# one benchmark result, as stored in the results file
+def result(benchmark : str, params : dict, metrics : dict) -> dict:
+  return {"benchmark": benchmark, "params": params, "metrics": metrics}
@@ -0,0 +1,194 @@
+# Load test of the battle streaming server
+# starts watched battles over HTTP, connects many WebSocket clients spread over
+# them and reports messages/sec and the latency percentiles of the tick frames
+# (server dispatch time to client receive time, so client and server need the
+# same clock). Slow clients read with a tiny socket buffer and a pause between
+# frames, the server should coalesce their frames instead of slowing down the
+# others : with slow clients the run fails unless frames were coalesced and the
+# slow latencies stayed under --max-slow-latency. Clients ack every frame they
+# read, or with --no-ack none, like a standard WebSocket client : the server
+# then paces them by their socket and the run fails if any was dropped
+#
+# without --port it runs its own server (python main.py serve --timestamps) in
+# a child process, from the repository root
+#
+# python -m benchmarks.web_load_test --clients 1000 --battles 20 --duration 10
+
+import argparse
+import asyncio
+import json
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from app_code.server.battle_server import PERCENTILES, percentile
+from app_code.server.websocket import (OP_CLOSE, OP_TEXT, WebSocketError, client_handshake, encode_frame,
+                                       read_frame)
+
+DEFAULT_TEAMS = "+".join(["Goblin"] * 20) + "," + "+".join(["Bandit"] * 20)
+
+class ClientStats:
+  def __init__(self):
+    self.connected : int = 0
+    self.failed : int = 0
+    self.messages : int = 0
+    self.bytes : int = 0
+    self.latencies : list[float] = []
+    self.slow_latencies : list[float] = []
+
+async def http_request(host : str, port : int, method : str, path : str, payload : dict | None = None) -> dict:
+  reader, writer = await asyncio.open_connection(host, port)
+  body = json.dumps(payload).encode() if payload is not None else b""
+  writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n").encode() + body)
+  await writer.drain()
+  response = await reader.read()
+  writer.close()
+  return json.loads(response.split(b"\r\n\r\n", 1)[1])
+
+# stats only count for duration seconds from measure_start, once every client is connected
+async def run_client(host : str, port : int, battle_id : int, measure_start : asyncio.Future, duration : float,
+                     stats : ClientStats, slow : bool, connections : asyncio.Semaphore, acks : bool = True):
+  async with connections:
+    try:
+      if slow:
+        sock = socket.socket()
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        sock.setblocking(False)
+        await asyncio.get_running_loop().sock_connect(sock, (host, port))
+        # a small stream buffer too, or asyncio would read ahead of the client for it
+        reader, writer = await asyncio.open_connection(sock=sock, limit=4096)
+      else:
+        reader, writer = await asyncio.open_connection(host, port)
+      await client_handshake(reader, writer, host, f"/ws/{battle_id}")
+    except (OSError, asyncio.IncompleteReadError, ValueError, WebSocketError):
+      stats.failed += 1
+      return
+  stats.connected += 1
+
+  try:
+    while True:
+      timeout = max(0.0, measure_start.result() + duration - time.time()) if measure_start.done() else None
+      opcode, payload = await asyncio.wait_for(read_frame(reader), timeout)
+      if opcode == OP_CLOSE:
+        break
+      message = json.loads(payload)
+      if measure_start.done():
+        stats.messages += 1
+        stats.bytes += len(payload)
+        if message[0] == "tick" and len(message) == 5:
+          (stats.slow_latencies if slow else stats.latencies).append(time.time() - message[4])
+      if slow:
+        await asyncio.sleep(0.1)
+      if acks:
+        writer.write(encode_frame(str(message[2]).encode(), OP_TEXT, mask=True))
+  except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+    pass
+  try:
+    writer.write(encode_frame(b"", OP_CLOSE, mask=True))
+    await writer.drain()
+  except ConnectionError:
+    pass
+  writer.close()
+
+async def load_test(host : str, port : int, clients : int, battles : int, duration : float, teams : str,
+                    slow_clients : int, acks : bool = True) -> dict:
+  started = await http_request(host, port, "POST", "/battles", {"teams": teams, "count": battles})
+  battle_ids = started["battles"]
+
+  stats = ClientStats()
+  connect_start = time.time()
+  measure_start = asyncio.get_running_loop().create_future()
+  # a few handshakes at a time keep the listen backlog short
+  connections = asyncio.Semaphore(50)
+  tasks = [asyncio.create_task(run_client(host, port, battle_ids[client % len(battle_ids)], measure_start, duration,
+                                          stats, client < slow_clients, connections, acks))
+           for client in range(clients)]
+  while stats.connected + stats.failed < clients:
+    await asyncio.sleep(0.05)
+  start = time.time()
+  connect_time = start - connect_start
+  measure_start.set_result(start)
+  await asyncio.gather(*tasks)
+  elapsed = time.time() - start
+
+  server_stats = await http_request(host, port, "GET", "/stats")
+  metrics = {
+    "clients": stats.connected,
+    "failed_clients": stats.failed,
+    "connect_sec": connect_time,
+    "messages_per_sec": stats.messages / elapsed,
+    "kbytes_per_sec": stats.bytes / elapsed / 1024,
+    "bytes_per_message": stats.bytes / stats.messages if stats.messages else 0.0,
+  }
+  for prefix, latencies in (("", sorted(stats.latencies)), ("slow_", sorted(stats.slow_latencies))):
+    if prefix == "slow_" and latencies == []:
+      continue
+    for percent in PERCENTILES:
+      metrics[f"{prefix}latency_p{percent}_ms"] = percentile(latencies, percent) * 1000
+    metrics[f"{prefix}latency_max_ms"] = latencies[-1] * 1000 if latencies else 0.0
+  metrics["frames_coalesced"] = server_stats["web"]["frames_coalesced"]
+  metrics["watchers_dropped"] = server_stats["web"]["watchers_dropped"]
+  return metrics
+
+# python main.py serve on a free port, returns the process and its port
+# the tick scheduler streams every tick, so battles last long enough to watch
+def start_server(workers : int, pass_rate : float, ticks_per_pass : int) -> tuple[subprocess.Popen, int]:
+  server = subprocess.Popen([sys.executable, "-u", "main.py", "serve", "--port", "0", "--timestamps", "--seed", "0",
+                             "--scheduler", "tick", "--workers", str(workers), "--pass-rate", str(pass_rate),
+                             "--ticks-per-pass", str(ticks_per_pass)],
+                            stdout=subprocess.PIPE, text=True)
+  # serving battles on http://host:port
+  line = server.stdout.readline()
+  if not line.startswith("serving battles on"):
+    server.kill()
+    raise RuntimeError(f"the server did not start : {line!r}")
+  return server, int(line.rsplit(":", 1)[1])
+
+def main():
+  parser = argparse.ArgumentParser(description="battle streaming server load test")
+  parser.add_argument("--host", default="127.0.0.1", help="server address")
+  parser.add_argument("--port", type=int, default=None,
+                      help="port of a running server started with --timestamps (default: start one)")
+  parser.add_argument("--clients", type=int, default=1000, help="WebSocket clients")
+  parser.add_argument("--slow-clients", type=int, default=0, help="how many of them read slowly")
+  parser.add_argument("--battles", type=int, default=20, help="watched battles the clients are spread over")
+  parser.add_argument("--duration", type=float, default=10.0, help="seconds the clients stay connected")
+  parser.add_argument("--teams", default=DEFAULT_TEAMS, help="teams of the battles, same format as simulate --teams")
+  parser.add_argument("--workers", type=int, default=1, help="battle worker processes of the started server")
+  parser.add_argument("--pass-rate", type=float, default=20.0, help="passes per second of the started server")
+  parser.add_argument("--ticks-per-pass", type=int, default=5, help="ticks per pass of the started server")
+  parser.add_argument("--no-ack", action="store_true", help="clients don't acknowledge the frames they read")
+  parser.add_argument("--max-slow-latency", type=float, default=1.0,
+                      help="seconds the p99 latency of the slow clients has to stay under")
+  args = parser.parse_args()
+
+  server = None
+  port = args.port
+  if port is None:
+    server, port = start_server(args.workers, args.pass_rate, args.ticks_per_pass)
+
+  try:
+    metrics = asyncio.run(load_test(args.host, port, args.clients, args.battles, args.duration, args.teams,
+                                    args.slow_clients, not args.no_ack))
+  finally:
+    if server is not None:
+      # ctrl-c, the server prints its shard report on the way out
+      server.send_signal(signal.SIGINT)
+      print(server.communicate(timeout=30)[0])
+
+  for metric, value in metrics.items():
+    print(f"{metric:<20} {value:,.1f}" if isinstance(value, float) else f"{metric:<20} {value:,}")
+
+  if args.no_ack and metrics["watchers_dropped"] > 0:
+    sys.exit("FAIL : clients that don't ack were dropped")
+  if args.slow_clients > 0:
+    if metrics["frames_coalesced"] == 0:
+      sys.exit("FAIL : slow clients got every frame, nothing was coalesced")
+    if metrics["slow_latency_p99_ms"] > args.max_slow_latency * 1000:
+      sys.exit(f"FAIL : slow clients p99 latency over {args.max_slow_latency:g}s")
+
+if __name__ == "__main__":
+  main()
@@ -1,8 +1,233 @@
+import argparse
+import asyncio
 
+from app_code.arena.arena import SchedulerEnum
+from app_code.arena.replay import ReplayWriter
+from app_code.barracks.pregen_units import get_pregen_unit_database
 from app_code.root import Root
+from app_code.server.battle_server import BattleServer
+from app_code.server.web_server import DEFAULT_PORT, BattleWebServer
+from app_code.simulation.matchup_cache import MatchupCache
+from app_code.simulation.simulation import DEFAULT_MAX_TICKS, parse_teams, run_single_battle, simulate
+from app_code.simulation.team_optimizer import DEFAULT_BEAM_WIDTH, DEFAULT_INITIAL_BATTLES, TeamOptimizer
+from app_code.simulation.tournament import Tournament, add_entrant, fighter_entrants, team_entrants
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Auto battler")
+    parser.add_argument("--stats-every", type=int, default=0,
+                        help="print phase timings and arena counters every N game loops")
+    parser.add_argument("--profile-loops", type=int, default=0,
+                        help="run N game loops under cProfile, then exit")
+    parser.add_argument("--profile-out", default="battlesim.prof",
+                        help="pstats file written by --profile-loops (snakeviz, flameprof, gprof2dot)")
+    parser.add_argument("--tick-rate", type=float, default=2.0, help="simulation ticks per second")
+    parser.add_argument("--fps", type=float, default=2.0, help="display frames per second")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="run simulation ticks back to back, only pausing to render frames")
+    parser.add_argument("--render", action="store_true",
+                        help="draw the battle with the frame buffered console renderer")
+    parser.add_argument("--async", dest="asynchronous", action="store_true",
+                        help="run the game loop on asyncio, input never blocks the loop")
+    parser.add_argument("--background-battles", type=int, default=0,
+                        help="with --async, battles fought next to the game while it waits for input")
+    parser.add_argument("--background-teams", default="Goblin,Bandit",
+                        help="teams of the background battles, same format as simulate --teams")
+    subparsers = parser.add_subparsers(dest="command")
+
+    sim_parser = subparsers.add_parser("simulate", help="run headless battles and report win rates")
+    sim_parser.add_argument("--teams", required=True, action="append",
+                            help="comma separated teams, '+' joins units of a team (e.g. Goblin+Goblin,Giant), "
+                                 "repeat it to sweep several matchups")
+    sim_parser.add_argument("--runs", type=int, default=1000, help="number of battles to fight")
+    sim_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    sim_parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS,
+                            help="ticks after which a battle counts as a timeout")
+    sim_parser.add_argument("--scheduler", choices=["tick", "event"], default="event",
+                            help="tick polls every speed meter each tick, event jumps to the next actor")
+    sim_parser.add_argument("--seed", type=int, default=None,
+                            help="root seed of the run, results are identical for any number of workers")
+    sim_parser.add_argument("--battle", type=int, default=None,
+                            help="only re-run the battle with this index of the seeded run")
+    sim_parser.add_argument("--replay", default=None, help="with --battle, save the battle replay to this file")
+    sim_parser.add_argument("--cache", default=None,
+                            help="sqlite file of matchup results, seeded runs simulated before are read back from it")
+
+    tournament_parser = subparsers.add_parser("tournament", help="round-robin every entrant and rank them")
+    tournament_parser.add_argument("--entrants", default=None,
+                                   help="comma separated teams, same format as simulate --teams "
+                                        "(default: every unit template on its own)")
+    tournament_parser.add_argument("--generated", type=int, default=0,
+                                   help="also enter this many random fighters (needs numpy)")
+    tournament_parser.add_argument("--fighter-seed", type=int, default=0, help="seed of the random fighters")
+    tournament_parser.add_argument("--games", type=int, default=10, help="battles per pairing, sides alternate")
+    tournament_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    tournament_parser.add_argument("--seed", type=int, default=0, help="root seed of the battles")
+    tournament_parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS,
+                                   help="ticks after which a battle counts as a draw")
+    tournament_parser.add_argument("--checkpoint", default=None,
+                                   help="json file the progress is saved to, and resumed from if it exists")
+    tournament_parser.add_argument("--checkpoint-every", type=float, default=30.0, help="seconds between checkpoints")
+    tournament_parser.add_argument("--top", type=int, default=None, help="only print the first entrants of the ladder")
+
+    optimize_parser = subparsers.add_parser("optimize", help="search the strongest lineup against a set of opponents")
+    optimize_parser.add_argument("--opponents", required=True,
+                                 help="comma separated opponent teams, same format as simulate --teams")
+    optimize_parser.add_argument("--max-units", type=int, default=3, help="most units in a lineup")
+    optimize_parser.add_argument("--points", type=int, default=None, help="point budget of a lineup")
+    optimize_parser.add_argument("--costs", default="",
+                                 help="unit costs for --points, e.g. Goblin=1,Bandit=2,Giant=5 (default 1 each)")
+    optimize_parser.add_argument("--beam", type=int, default=DEFAULT_BEAM_WIDTH, help="lineups kept per layer")
+    optimize_parser.add_argument("--battles", type=int, default=DEFAULT_INITIAL_BATTLES,
+                                 help="battles per opponent of the first halving round")
+    optimize_parser.add_argument("--time-budget", type=float, default=30.0, help="seconds before the best lineup is returned")
+    optimize_parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cpu count)")
+    optimize_parser.add_argument("--seed", type=int, default=0, help="root seed of the battles")
+    optimize_parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS,
+                                 help="ticks after which a battle counts as a draw")
+
+    serve_parser = subparsers.add_parser("serve", help="host battles and stream them over HTTP and WebSocket")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    serve_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on, 0 picks a free one")
+    serve_parser.add_argument("--workers", type=int, default=None, help="battle worker processes (default: cpu count)")
+    serve_parser.add_argument("--pass-rate", type=float, default=20.0,
+                              help="passes over every battle per second, 0 runs them back to back")
+    serve_parser.add_argument("--ticks-per-pass", type=int, default=1, help="fight_battle calls per battle in a pass")
+    serve_parser.add_argument("--scheduler", choices=["tick", "event"], default="event",
+                              help="tick polls every speed meter each tick, event jumps to the next actor")
+    serve_parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS,
+                              help="ticks after which a battle counts as a timeout")
+    serve_parser.add_argument("--seed", type=int, default=None, help="root seed of the battles")
+    serve_parser.add_argument("--timestamps", action="store_true",
+                              help="add the server time to every frame, to measure the latency of the watchers")
+
+    return parser
+
+
+async def run_async_game(app, background_setups, background_battles, stats_every, render):
+    app.init(asynchronous=True)
+    if render:
+        app.game.enable_rendering()
+    app.game.hmi.start_stdin_reader()
+
+    for battle_id in range(background_battles):
+        task = app.game.start_background_battle(background_setups)
+        task.add_done_callback(lambda task, battle_id=battle_id: print(
+            f"background battle {battle_id} over : team {task.result().winner_team_id()} "
+            f"won at tick {task.result().tick}"))
+
+    await app.run_async(stats_every=stats_every)
+
+
+async def run_web_server(battle_server, args):
+    web_server = BattleWebServer(battle_server, args.host, args.port, args.timestamps)
+    await web_server.start()
+    print(f"serving battles on http://{web_server.host}:{web_server.port}")
+    try:
+        await web_server.server.serve_forever()
+    finally:
+        await web_server.close()
+
 
 if __name__ == "__main__":
-    app = Root()
-    
-    app.init()
-    app.run()
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.command == "simulate":
+        try:
+            matchups = [parse_teams(teams) for teams in args.teams]
+        except ValueError as error:
+            parser.error(str(error))
+        scheduler = SchedulerEnum[args.scheduler.upper()]
+
+        if args.battle is not None:
+            if args.seed is None:
+                parser.error("--battle needs the --seed of the run")
+            if len(matchups) > 1:
+                parser.error("--battle replays the battle of a single --teams matchup")
+            team_setups = matchups[0]
+            replay = ReplayWriter() if args.replay else None
+            arena = run_single_battle(team_setups, args.battle, args.seed, args.max_ticks, scheduler, replay)
+            if replay is not None:
+                replay.save(args.replay)
+                print(f"{replay.event_count} events saved to {args.replay}")
+            print(f"battle {args.battle} of seed {args.seed} : team {arena.winner_team_id()} won at tick {arena.tick}")
+            for team in arena.combat_teams:
+                for unit in team.unit_list:
+                    print(f"  team {team.team_id} {unit.template.name} : {unit.current_hp}/{unit.template.max_hp} hp")
+        else:
+            if args.cache and args.seed is None:
+                parser.error("--cache needs a --seed, unseeded runs can't be looked up again")
+            cache = MatchupCache(args.cache) if args.cache else None
+            for team_setups in matchups:
+                result = simulate(team_setups, args.runs, args.workers, args.seed, args.max_ticks, scheduler, cache)
+                print(result.report(team_setups))
+            if cache is not None:
+                print(cache.report())
+                cache.close()
+    elif args.command == "tournament":
+        unit_db = get_pregen_unit_database()
+        try:
+            team_setups = parse_teams(args.entrants) if args.entrants else [[name] for name in unit_db]
+            entrants = team_entrants(team_setups, unit_db)
+            if args.generated > 0:
+                from app_code.barracks.fighter_batch import FighterBatch
+                for name, templates in fighter_entrants(FighterBatch(args.generated, args.fighter_seed)).items():
+                    add_entrant(entrants, name, templates)
+        except ValueError as error:
+            parser.error(str(error))
+
+        tournament = Tournament(entrants, args.games, args.seed, args.max_ticks)
+        if args.checkpoint:
+            try:
+                if tournament.resume(args.checkpoint):
+                    print(f"resumed at {tournament.next_pairing}/{tournament.pairing_count()} pairings")
+            except ValueError as error:
+                parser.error(str(error))
+
+        def show_progress(done, total):
+            print(f"\r{done}/{total} pairings", end="", flush=True)
+
+        tournament.run(args.workers, args.checkpoint, args.checkpoint_every, progress=show_progress)
+        print()
+        print(tournament.report(args.top))
+    elif args.command == "optimize":
+        try:
+            opponents = parse_teams(args.opponents, min_teams=1)
+            costs = {name: int(cost) for name, cost in (item.split("=") for item in args.costs.split(",") if item)}
+            optimizer = TeamOptimizer(opponents, args.max_units, points=args.points, costs=costs, beam_width=args.beam,
+                                      initial_battles=args.battles, seed=args.seed, max_ticks=args.max_ticks)
+        except ValueError as error:
+            parser.error(str(error))
+
+        print(optimizer.run(args.time_budget, args.workers).report())
+    elif args.command == "serve":
+        pass_interval = 1 / args.pass_rate if args.pass_rate > 0 else None
+        with BattleServer(args.workers, args.ticks_per_pass, args.max_ticks, SchedulerEnum[args.scheduler.upper()],
+                          pass_interval, args.seed) as battle_server:
+            try:
+                asyncio.run(run_web_server(battle_server, args))
+            except KeyboardInterrupt:
+                pass
+            print(battle_server.report())
+    else:
+        app = Root()
+
+        app.clock.tick_rate = args.tick_rate
+        app.clock.frame_rate = args.fps
+        app.clock.fast_forward = args.fast_forward
+        if args.asynchronous:
+            try:
+                background_setups = parse_teams(args.background_teams)
+            except ValueError as error:
+                parser.error(str(error))
+            asyncio.run(run_async_game(app, background_setups, args.background_battles, args.stats_every,
+                                       args.render))
+        else:
+            app.init()
+            if args.render:
+                app.game.enable_rendering()
+            if args.profile_loops > 0:
+                app.profile(args.profile_loops, args.profile_out)
+            else:
+                app.run(stats_every=args.stats_every)
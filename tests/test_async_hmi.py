@@ -0,0 +1,51 @@
+import asyncio
+
+from app_code._common_enums.common_enums import GameStateEnum, PlayerCommands
+from app_code.interfaces.async_hmi import AsyncHmi, parse_command
+from app_code.root import Root
+
+async def unattended_root() -> Root:
+  root = Root()
+  root.init(asynchronous=True)
+  root.clock.fast_forward = True
+  return root
+
+# nobody answers the battle over prompt, the loop and a background battle go on anyway
+def test_the_loop_keeps_ticking_while_input_is_pending():
+  async def scenario():
+    root = await unattended_root()
+    background = root.game.start_background_battle([["Goblin", "Goblin"], ["Bandit"]], steps_per_slice=1)
+
+    await asyncio.wait_for(root.run_async(max_loops=500), 10)
+    assert root.clock.ticks == 500
+    assert root.game.game_state.state == GameStateEnum.BATTLE_OVER and root.game.hmi.prompted
+    assert background.done() and background.result().winner_team_id() is not None
+
+    root.game.hmi.submit(PlayerCommands.BACK_TO_SETUP)
+    await root.run_async(max_loops=2)
+    assert root.game.game_state.state == GameStateEnum.BATTLE
+  asyncio.run(scenario())
+
+def test_only_the_latest_command_of_the_battle_over_screen_counts():
+  async def scenario():
+    hmi = AsyncHmi()
+    hmi.init()
+    hmi.submit(PlayerCommands.BACK_TO_SETUP)
+    hmi.request_inputs(GameStateEnum.BATTLE)
+    # typed too early, dropped
+    assert hmi.last_command == PlayerCommands.NONE and hmi.commands.empty()
+
+    hmi.submit(PlayerCommands.BACK_TO_SETUP)
+    hmi.submit(PlayerCommands.NONE)
+    hmi.request_inputs(GameStateEnum.BATTLE_OVER)
+    assert hmi.last_command == PlayerCommands.NONE
+
+    hmi.submit(PlayerCommands.BACK_TO_SETUP)
+    hmi.request_inputs(GameStateEnum.BATTLE_OVER)
+    assert hmi.last_command == PlayerCommands.BACK_TO_SETUP and not hmi.prompted
+  asyncio.run(scenario())
+
+def test_commands_are_parsed_from_lines():
+  assert parse_command("y\n") == PlayerCommands.BACK_TO_SETUP
+  assert parse_command(" y ") == PlayerCommands.BACK_TO_SETUP
+  assert parse_command("n\n") == PlayerCommands.NONE
@@ -0,0 +1,65 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app_code.arena.batch_arena import NO_WINNER, TIMED_OUT, BatchArena
+from app_code.barracks.barracks import FighterTemplate
+from app_code.simulation.simulation import SimulationResult, simulate
+
+RUNS = 1000
+
+# the counts of a simulate run, from the batched battles
+def batch_result(team_setups : list[list[str]], runs : int, max_ticks : int = 1_000_000,
+                 team_templates : list[list[FighterTemplate]] | None = None) -> SimulationResult:
+  arena = BatchArena(seed=0)
+  arena.init()
+  if team_templates is None:
+    arena.setup_battle(team_setups)
+  else:
+    arena.setup_templates(team_templates)
+  winners, durations = arena.run(runs, max_ticks)
+
+  result = SimulationResult(len(team_setups))
+  result.runs = runs
+  result.wins = [int(np.sum(winners == team_id)) for team_id in range(len(team_setups))]
+  result.draws = int(np.sum(winners == NO_WINNER))
+  result.timeouts = int(np.sum(winners == TIMED_OUT))
+  result.total_ticks = int(durations[winners != TIMED_OUT].sum())
+  return result
+
+# other random draws than ArenaEnv, only the rates and lengths can be compared
+@pytest.mark.parametrize("team_setups", [
+  [["Goblin", "Bandit"], ["Goblin", "Bandit"]], [["Goblin"], ["Bandit"], ["Goblin"]], [["Giant"], ["Goblin"] * 6]])
+def test_batched_battles_follow_the_arena_rules(team_setups):
+  batch = batch_result(team_setups, RUNS)
+  fought = simulate(team_setups, RUNS, workers=1, seed=0)
+
+  for batch_rate, rate in zip(batch.win_rates(), fought.win_rates()):
+    assert batch_rate == pytest.approx(rate, abs=0.05)
+  assert batch.mean_ticks() == pytest.approx(fought.mean_ticks(), rel=0.02)
+  assert (batch.draws, batch.timeouts) == (fought.draws, fought.timeouts) == (0, 0)
+
+# no random draw decides these, both give the very same counts
+def test_decided_battles_match_exactly():
+  team_setups = [["Goblin", "Goblin"], ["Bandit"]]
+  assert batch_result(team_setups, 50).to_dict() == {**simulate(team_setups, 50, workers=1, seed=0).to_dict(),
+                                                     "elapsed": 0.0}
+
+def test_draws_and_timeouts():
+  # too short for a goblin to beat a bandit
+  short = batch_result([["Goblin"], ["Bandit"]], 20, max_ticks=5000)
+  assert (short.timeouts, short.wins, short.total_ticks) == (20, [0, 0], 0)
+  assert short.to_dict() == {**simulate([["Goblin"], ["Bandit"]], 20, workers=1, seed=0, max_ticks=5000).to_dict(),
+                             "elapsed": 0.0}
+
+  statue = FighterTemplate("Statue")
+  statue.speed = 0
+  statue.max_hp = 10
+  statue = statue.freeze()
+  assert batch_result([["Statue"], ["Statue"]], 10, team_templates=[[statue], [statue]]).timeouts == 10
+
+  # empty teams are beaten from the start, like ArenaEnv counts them
+  for team_setups in ([[], []], [["Goblin"], []]):
+    assert batch_result(team_setups, 10).to_dict() == {**simulate(team_setups, 10, workers=1, seed=0).to_dict(),
+                                                      "elapsed": 0.0}
+  assert batch_result([[], []], 10).draws == 10
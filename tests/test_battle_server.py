@@ -0,0 +1,46 @@
+import pytest
+
+from app_code.server.battle_server import ArenaShard, BattleServer
+
+def test_only_recent_outcomes_are_kept():
+  with BattleServer(1, seed=0, max_outcomes=5) as server:
+    first = server.start_battle([["Goblin"], ["Bandit"]])
+    assert server.wait(30)
+    assert server.result(first) is not None
+
+    later = server.start_battles([[["Goblin"], ["Bandit"]]] * 10)
+    assert server.wait(30)
+    assert server.result(first) is None
+    # the battles finishing last
+    assert sum(server.result(battle_id) is not None for battle_id in later) == 5
+    assert len(server.outcomes) == 5
+
+def test_empty_teams_are_rejected():
+  with BattleServer(1, seed=0) as server:
+    with pytest.raises(ValueError):
+      server.start_battles([[["Goblin"], ["Bandit"]], [["Goblin"], []]])
+    assert server.running == 0
+
+def crash(until=None):
+  raise RuntimeError("boom")
+
+# a failing battle is reported as such, the others on the shard go on
+def test_failing_battles_do_not_stop_their_shard():
+  shard = ArenaShard(0)
+  failed_setup = shard.start_battle(0, [["Goblin"], ["Nobody"]], seed=0, watch=True)
+  assert failed_setup.error is not None and failed_setup.winner is None
+  assert shard.frames == [("end", 0, 0, None)]
+
+  shard.start_battle(1, [["Goblin"], ["Bandit"]], seed=0)
+  shard.start_battle(2, [["Goblin"], ["Bandit"]], seed=0)
+  shard.arenas[1].fight_battle = crash
+  outcomes = shard.step()
+  assert [(outcome.battle_id, outcome.error) for outcome in outcomes] == [(1, "RuntimeError: boom")]
+  assert list(shard.arenas) == [2]
+
+  while 2 in shard.arenas:
+    outcomes = shard.step()
+  assert outcomes[0].error is None and outcomes[0].winner is not None
+  assert (shard.battles_finished, shard.battles_failed) == (1, 2)
+  # only the arena of the battle fought out is set up again
+  assert len(shard.idle_arenas) == 1
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum, solve_duel
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.utils.random_streams import SeedStream
+
+def template(name : str, strength : int, speed : float, max_hp : int) -> FighterTemplate:
+  fighter = FighterTemplate(name)
+  fighter.strength = strength
+  fighter.speed = speed
+  fighter.max_hp = max_hp
+  return fighter.freeze()
+
+# the corner cases first : units that never act, units that never hurt, equal speeds
+def random_roster(size : int, seed : int = 0) -> dict[str, FighterTemplate]:
+  roster = {fighter.name: fighter for fighter in (
+    template("Still", 5, 0, 50),
+    template("Harmless", 0, 3, 50),
+    template("Twin", 4, 3, 60),
+    template("OtherTwin", 6, 3, 40),
+    template("Slow", 2, 0.5, 300),
+  )}
+  rng = random.Random(seed)
+  for i in range(size):
+    fighter = template(f"Unit{i}", rng.randint(0, 15), rng.choice([0, 1, 2, 3, 4, 5, 6, 0.5, 2.5]),
+                       rng.randint(1, 30) * 10)
+    roster[fighter.name] = fighter
+  return roster
+
+# (winner, tick, hp of both sides) of the tick loop, all None on a timeout
+def fight_duel(arena : ArenaEnv, first : str, second : str, max_ticks : int) -> tuple:
+  arena.setup_battle([[first], [second]])
+  if not arena.run_battle(max_ticks):
+    return None, None, None
+  return arena.winner_team_id(), arena.tick, tuple(unit.current_hp for unit in arena.units)
+
+def check_roster(roster : dict[str, FighterTemplate], scheduler : SchedulerEnum, max_ticks : int):
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.pregen_unit_templates = roster
+  arena.scheduler = scheduler
+  arena.analytic_duels = False
+
+  for first in roster:
+    for second in roster:
+      duel = solve_duel(roster[first], roster[second])
+      expected = (None, None, None)
+      if duel.winner is not None and duel.tick < max_ticks:
+        expected = (duel.winner, duel.tick, duel.hp)
+      assert fight_duel(arena, first, second, max_ticks) == expected, (first, second)
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_solve_duel_matches_the_tick_loop_on_the_pregen_roster(scheduler):
+  check_roster(dict(get_pregen_unit_database()), scheduler, 1_000_000)
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_solve_duel_matches_the_tick_loop_on_random_templates(scheduler):
+  check_roster(random_roster(8), scheduler, 5000)
+
+# short enough that the long duels time out, the first two are killing blow ticks of this roster
+@pytest.mark.parametrize("max_ticks", [334, 2001, 2002])
+def test_solve_duel_matches_the_tick_loop_on_timeouts(max_ticks):
+  check_roster(random_roster(12, seed=1), SchedulerEnum.EVENT, max_ticks)
+
+def test_analytic_run_battle_matches_the_tick_loop():
+  roster = random_roster(12)
+  results = []
+  for analytic_duels in (False, True):
+    arena = ArenaEnv(SeedStream(0).random())
+    arena.pregen_unit_templates = roster
+    arena.scheduler = SchedulerEnum.EVENT
+    arena.analytic_duels = analytic_duels
+    results.append([fight_duel(arena, first, second, 2000) for first in roster for second in roster])
+  assert results[0] == results[1]
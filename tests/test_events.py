@@ -0,0 +1,81 @@
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.events.events import AttackEvent, BattleOverEvent, BattleStartEvent, DeathEvent, EventBus, LoopEvent
+from app_code.utils.random_streams import SeedStream
+
+# counts what reaches publish, the arena builds an event only to publish it
+class CountingBus(EventBus):
+  def __init__(self):
+    super().__init__()
+    self.published : list[type] = []
+
+  def publish(self, event):
+    self.published.append(type(event))
+    super().publish(event)
+
+def arena_with(event_bus : EventBus, scheduler : SchedulerEnum = SchedulerEnum.EVENT) -> ArenaEnv:
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.init()
+  arena.scheduler = scheduler
+  arena.event_bus = event_bus
+  return arena
+
+def test_handlers_run_in_subscription_order_until_unsubscribed():
+  event_bus = EventBus()
+  received = []
+  first = lambda event: received.append(("first", event.loop))
+  second = lambda event: received.append(("second", event.loop))
+  assert not event_bus.wants(LoopEvent)
+
+  event_bus.subscribe(LoopEvent, first)
+  event_bus.subscribe(LoopEvent, second)
+  assert event_bus.wants(LoopEvent) and not event_bus.wants(AttackEvent)
+  event_bus.publish(LoopEvent(1))
+
+  event_bus.unsubscribe(LoopEvent, first)
+  event_bus.publish(LoopEvent(2))
+  event_bus.unsubscribe(LoopEvent, second)
+  # unknown handlers and event types are ignored
+  event_bus.unsubscribe(LoopEvent, second)
+  event_bus.unsubscribe(AttackEvent, first)
+  event_bus.publish(LoopEvent(3))
+
+  assert received == [("first", 1), ("second", 1), ("second", 2)]
+  assert not event_bus.wants(LoopEvent) and event_bus.handlers == {}
+
+def test_nothing_is_published_without_listeners():
+  for scheduler in (SchedulerEnum.TICK, SchedulerEnum.EVENT):
+    event_bus = CountingBus()
+    arena = arena_with(event_bus, scheduler)
+    arena.setup_battle([["Goblin", "Bandit"], ["Goblin", "Goblin"]])
+    assert arena.run_battle()
+    assert event_bus.published == []
+
+    # only what somebody listens to
+    event_bus.subscribe(DeathEvent, lambda event: None)
+    arena.setup_battle([["Goblin", "Bandit"], ["Goblin", "Goblin"]])
+    assert arena.run_battle()
+    assert set(event_bus.published) == {DeathEvent}
+    assert len(event_bus.published) == sum(unit.current_hp <= 0 for unit in arena.units)
+
+def test_battle_events_come_in_order():
+  event_bus = EventBus()
+  received = []
+  for event_type in (BattleStartEvent, AttackEvent, DeathEvent, BattleOverEvent):
+    event_bus.subscribe(event_type, received.append)
+  arena = arena_with(event_bus)
+  arena.setup_battle([["Goblin", "Bandit"], ["Goblin", "Goblin"]])
+  assert arena.run_battle()
+
+  assert type(received[0]) is BattleStartEvent and received[0].units == arena.units
+  assert type(received[-1]) is BattleOverEvent
+  assert (received[-1].tick, received[-1].winner) == (arena.tick, arena.winner)
+  fight = received[1:-1]
+  assert [event.tick for event in fight] == sorted(event.tick for event in fight)
+  # a death right after the attack that killed
+  for index, event in enumerate(fight):
+    if type(event) is DeathEvent:
+      attack = fight[index - 1]
+      assert type(attack) is AttackEvent and attack.killed and attack.target is event.unit
+  deaths = sum(unit.current_hp <= 0 for unit in arena.units)
+  assert deaths > 0 and sum(type(event) is DeathEvent for event in fight) == deaths
+  assert sum(type(event) is AttackEvent and event.killed for event in fight) == deaths
@@ -0,0 +1,46 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.fighter_batch import HP_PER_UPGRADE, UPGRADE_ODDS, UPGRADES_POOL, FighterBatch
+from app_code.simulation.tournament import Tournament, fighter_entrants
+
+def base_stats(template : FighterTemplate) -> np.ndarray:
+  return np.array([template.strength, template.agility, template.speed, template.max_hp])
+
+def test_same_seed_same_fighters():
+  assert np.array_equal(FighterBatch(500, seed=4).stats(), FighterBatch(500, seed=4).stats())
+  assert not np.array_equal(FighterBatch(500, seed=4).stats(), FighterBatch(500, seed=5).stats())
+
+@pytest.mark.parametrize("base", [None, FighterTemplate("Veteran")])
+def test_every_fighter_spends_the_whole_upgrade_pool(base):
+  if base is not None:
+    base.strength, base.agility, base.speed, base.max_hp = 5, 0, 2, 100
+  batch = FighterBatch(10_000, seed=0, base=base)
+  upgrades = batch.stats() - base_stats(base or FighterTemplate("Fighter"))
+
+  assert upgrades.min() >= 0
+  assert np.all(upgrades[:, 3] % HP_PER_UPGRADE == 0)
+  upgrades[:, 3] //= HP_PER_UPGRADE
+  assert np.all(upgrades.sum(axis=1) == UPGRADES_POOL)
+  # the odds of init_fighter
+  assert upgrades.mean(axis=0) / UPGRADES_POOL == pytest.approx(UPGRADE_ODDS, abs=0.01)
+
+def test_fighters_are_frozen_templates():
+  batch = FighterBatch(3, seed=0, name_prefix="Recruit")
+  stats = batch.stats()
+  assert [fighter.name for fighter in batch] == ["Recruit0", "Recruit1", "Recruit2"]
+  assert batch[-1].name == "Recruit2" and [fighter.name for fighter in batch[1:]] == ["Recruit1", "Recruit2"]
+  assert all(fighter.frozen for fighter in batch)
+  assert [base_stats(fighter).tolist() for fighter in batch] == stats.tolist()
+  assert all(type(getattr(batch[0], stat)) is int for stat in ("strength", "agility", "speed", "max_hp"))
+  with pytest.raises(IndexError):
+    batch[3]
+
+def test_batches_enter_a_tournament():
+  tournament = Tournament(fighter_entrants(FighterBatch(6, seed=0)), games=2)
+  tournament.run(workers=1)
+  assert sorted(tournament.ladder.ranking()) == list(range(6))
+  # every game counts for both entrants
+  assert sum(rating.games() for rating in tournament.ladder.ratings) == 6 * 5 * 2
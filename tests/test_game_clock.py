@@ -0,0 +1,80 @@
+import pytest
+
+from app_code.root import Root
+from app_code.utils import game_clock
+from app_code.utils.game_clock import GameClock
+
+# stands in for the time module, only moves when slept or told to
+class FakeTime:
+  def __init__(self):
+    self.now : float = 100.0
+
+  def perf_counter(self) -> float:
+    return self.now
+
+  def sleep(self, seconds : float):
+    self.now += seconds
+
+@pytest.fixture
+def fake_time(monkeypatch) -> FakeTime:
+  fake = FakeTime()
+  monkeypatch.setattr(game_clock, "time", fake)
+  return fake
+
+# one pass of the loop of the GameClock docstring, tick_cost seconds per update
+def run_frame(clock : GameClock, fake_time : FakeTime, tick_cost : float = 0.0) -> tuple[int, bool]:
+  ticks = 0
+  while clock.tick_due():
+    fake_time.now += tick_cost
+    ticks += 1
+    clock.tick_done()
+  rendered = clock.render_due()
+  clock.wait_next_frame()
+  return ticks, rendered
+
+def test_the_first_tick_comes_before_the_first_frame(fake_time):
+  clock = GameClock(tick_rate=2, frame_rate=2)
+  clock.start()
+  assert run_frame(clock, fake_time) == (1, True)
+  assert [run_frame(clock, fake_time) for _ in range(3)] == [(1, True)] * 3
+
+def test_ticks_keep_their_rate_whatever_the_frame_rate(fake_time):
+  clock = GameClock(tick_rate=10, frame_rate=2)
+  clock.start()
+  ticks = [run_frame(clock, fake_time)[0] for _ in range(5)]
+  assert ticks == [1, 5, 5, 5, 5]
+  # tick n is due at n / 10 s, the fifth frame starts at 2 s
+  assert clock.ticks == 1 + 2 * 10
+
+def test_a_stall_drops_the_backlog_instead_of_spiraling(fake_time):
+  # 1 / 8 s ticks stay exact in binary, the dropped backlog moves the tick schedule without rounding
+  clock = GameClock(tick_rate=8, frame_rate=2, max_ticks_per_frame=6)
+  clock.start()
+  run_frame(clock, fake_time)
+  fake_time.now += 10
+
+  # a few ticks to catch up with, then the rest of the 84 owed is dropped and the late frame skipped
+  assert run_frame(clock, fake_time) == (6, False)
+  assert clock.dropped_frames == 1 and clock.dropped_ticks == 84 - 6
+  # back on schedule from there
+  assert [run_frame(clock, fake_time) for _ in range(3)] == [(0, True), (4, True), (4, True)]
+
+def test_fast_forward_ticks_back_to_back_until_the_frame_is_due(fake_time):
+  clock = GameClock(tick_rate=2, frame_rate=2, fast_forward=True)
+  clock.start()
+  start = fake_time.now
+  assert [run_frame(clock, fake_time, tick_cost=0.01) for _ in range(3)] == [(50, True)] * 3
+  # never slept, the ticks took all the time
+  assert fake_time.now - start == pytest.approx(1.5)
+
+  # ticks slower than a frame still tick once per frame
+  assert run_frame(clock, fake_time, tick_cost=2.0) == (1, False)
+
+def test_the_game_loop_renders_after_updating(fake_time):
+  root = Root()
+  root.init()
+  calls = []
+  root.game.update_game_state = lambda: calls.append("update")
+  root.game.refresh_display = lambda: calls.append("render")
+  root.run(max_loops=3)
+  assert calls == ["update", "render"] * 3
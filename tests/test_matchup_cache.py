@@ -0,0 +1,71 @@
+from app_code.arena import arena
+from app_code.arena.arena import SchedulerEnum
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.simulation import matchup_cache
+from app_code.simulation.matchup_cache import MatchupCache, matchup_key, rules_fingerprint
+from app_code.simulation.simulation import simulate
+
+TEAMS = [["Goblin", "Bandit"], ["Goblin", "Bandit"]]
+
+def key(unit_db : dict | None = None, seed : int = 0) -> str:
+  return matchup_key(TEAMS, unit_db or get_pregen_unit_database(), 100, seed, 1000, SchedulerEnum.EVENT)
+
+def test_least_recently_used_results_leave_memory_first():
+  cache = MatchupCache(capacity=2)
+  cache.put("a", {"runs": 1})
+  cache.put("b", {"runs": 2})
+  assert cache.get("a") == {"runs": 1}
+  cache.put("c", {"runs": 3})
+
+  assert list(cache.memory) == ["a", "c"]
+  assert cache.get("b") is None
+  assert (cache.memory_hits, cache.misses) == (1, 1)
+
+def test_results_outlive_the_session(tmp_path):
+  path = str(tmp_path / "matchups.sqlite")
+  with MatchupCache(path, capacity=1) as cache:
+    cache.put("a", {"runs": 1})
+    cache.put("b", {"runs": 2})
+    # out of memory, read back from the file
+    assert cache.get("a") == {"runs": 1} and cache.disk_hits == 1
+
+  with MatchupCache(path) as cache:
+    assert cache.get("b") == {"runs": 2}
+    assert (cache.memory_hits, cache.disk_hits) == (0, 1)
+
+def test_other_stats_are_another_matchup():
+  unit_db = dict(get_pregen_unit_database())
+  assert key(unit_db) == key()
+  assert key(seed=1) != key()
+
+  stronger = FighterTemplate("Bandit")
+  stronger.strength, stronger.agility, stronger.speed, stronger.max_hp = 4, 2, 2, 60
+  unit_db["Bandit"] = stronger.freeze()
+  assert key(unit_db) != key()
+
+# results of older rules are never read back, and dropped from the file
+def test_new_rules_forget_the_old_results(tmp_path, monkeypatch):
+  path = str(tmp_path / "matchups.sqlite")
+  with MatchupCache(path) as cache:
+    cache.put(key(), {"runs": 100})
+  old_fingerprint, old_key = rules_fingerprint(), key()
+
+  monkeypatch.setattr(arena, "RULES_VERSION", arena.RULES_VERSION + 1)
+  monkeypatch.setattr(matchup_cache, "_rules_fingerprint", None)
+  assert rules_fingerprint() != old_fingerprint
+  assert key() != old_key
+
+  with MatchupCache(path) as cache:
+    assert cache.get(key()) is None
+    assert cache.connection.execute("SELECT COUNT(*) FROM matchups").fetchone()[0] == 0
+
+def test_simulate_reads_back_a_cached_run(tmp_path):
+  with MatchupCache(str(tmp_path / "matchups.sqlite")) as cache:
+    fought = simulate(TEAMS, 40, workers=1, seed=3, cache=cache)
+    cached = simulate(TEAMS, 40, workers=1, seed=3, cache=cache)
+    other_seed = simulate(TEAMS, 40, workers=1, seed=4, cache=cache)
+
+  assert not fought.cached and cached.cached and not other_seed.cached
+  assert cached.to_dict() == fought.to_dict()
+  assert fought.to_dict() == simulate(TEAMS, 40, workers=1, seed=3).to_dict() | {"elapsed": fought.elapsed}
@@ -0,0 +1,7 @@
+from benchmarks import memory_benchmark
+
+# run raises AssertionError over the bound
+def test_slotted_units_stay_under_the_memory_bound():
+  result = memory_benchmark.run(50_000)
+  assert result["slotted_bytes_per_unit"] <= memory_benchmark.MAX_SLOTTED_BYTES_PER_UNIT
+  assert result["slotted_bytes_per_unit"] < result["legacy_bytes_per_unit"]
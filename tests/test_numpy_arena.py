@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip("numpy")
+
+from app_code.arena.numpy_arena import NumpyArenaEnv
+from app_code.arena.replay import ReplayReader, ReplayWriter
+from app_code.barracks.barracks import FighterTemplate
+from app_code.events.subscribers import ConsoleLogger, StatsCollector
+
+def run_battle(*subscribers) -> NumpyArenaEnv:
+  arena = NumpyArenaEnv(seed=0)
+  arena.init()
+  for subscriber in subscribers:
+    subscriber.attach(arena.event_bus)
+  arena.setup_battle([["Goblin"] * 5, ["Bandit"] * 5])
+  assert arena.run_battle()
+  return arena
+
+def test_battle_over_reaches_stats_and_replay(tmp_path):
+  stats = StatsCollector()
+  replay = ReplayWriter()
+  arena = run_battle(stats, replay)
+
+  winner = arena.winner_team_id()
+  assert winner is not None
+  assert stats.wins == {winner: 1}
+  assert replay.winner == winner
+
+  path = str(tmp_path / "numpy.bsrp")
+  replay.save(path)
+  with ReplayReader(path) as reader:
+    assert reader.winner == winner
+
+def test_battle_over_winner_is_the_surviving_team(capsys):
+  arena = run_battle(ConsoleLogger())
+  team = arena.winner_team()
+
+  assert team.team_id == arena.winner_team_id()
+  assert [unit.setup_order for unit in team.unit_list] == [
+    unit for unit in range(len(arena.templates)) if arena.alive[unit] and arena.team[unit] == team.team_id]
+  assert all(unit.current_hp > 0 and unit.team is team for unit in team.unit_list)
+  assert f"team {team.team_id}" in capsys.readouterr().out
+
+# same rule as ArenaEnv : an empty team is beaten from the start
+def test_empty_teams_are_beaten_from_the_start():
+  arena = NumpyArenaEnv(seed=0)
+  arena.init()
+  for team_setups, winner in (([["Goblin"], []], 0), ([[], []], None), ([[], ["Goblin", "Bandit"], []], 1)):
+    arena.setup_battle(team_setups)
+    assert arena.run_battle()
+    assert (arena.tick, arena.winner_team_id()) == (0, winner)
+
+# the meter timing of ArenaEnv, see FIRST_TURNS in test_schedulers.py
+@pytest.mark.parametrize("speed, first_turn", [(1, 2000), (2, 1000), (3, 667), (5, 400), (0.5, 4000), (2.5, 800)])
+def test_turns_come_when_the_meter_is_exactly_full(speed, first_turn):
+  actor = FighterTemplate("Actor")
+  actor.speed = speed
+  dummy = FighterTemplate("Dummy")
+  dummy.speed = 0
+  dummy.max_hp = 1_000_000
+
+  arena = NumpyArenaEnv(seed=0)
+  arena.setup_templates([[actor.freeze()], [dummy.freeze()]])
+  hits = []
+  while arena.tick < 3 * first_turn:
+    hp = int(arena.current_hp[1])
+    arena.fight_battle()
+    if arena.current_hp[1] < hp:
+      hits.append(arena.tick)
+  assert hits == [first_turn, 2 * first_turn, 3 * first_turn]
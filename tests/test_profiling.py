@@ -0,0 +1,74 @@
+import pstats
+import time
+
+import pytest
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.events.events import AttackEvent
+from app_code.root import Root
+from app_code.utils.profiling import Profiler
+
+def test_phases_accumulate_calls_total_and_worst():
+  profiler = Profiler()
+  for seconds in (0.002, 0.005, 0.001):
+    profiler.add_time("arena.step", seconds)
+  profiler.add_time("render", 0.02)
+  profiler.count("arena.actions")
+  profiler.count("arena.actions", 4)
+
+  step = profiler.phases["arena.step"]
+  assert (step.calls, step.total, step.worst) == (3, pytest.approx(0.008), 0.005)
+  assert profiler.counters == {"arena.actions": 5}
+  # the heaviest phase first
+  lines = profiler.summary().splitlines()
+  assert "render" in lines[1] and "arena.step" in lines[2] and "arena.actions" in lines[3]
+
+  profiler.reset()
+  assert profiler.phases == {} and profiler.counters == {}
+
+def test_only_an_enabled_profiler_times_calls():
+  profiler = Profiler()
+  assert profiler.time_call("sum", sum, [1, 2]) == 3
+  assert profiler.phases == {}
+
+  profiler.enable()
+  profiler.time_call("sleep", time.sleep, 0.01)
+  with pytest.raises(ZeroDivisionError):
+    profiler.time_call("fail", lambda: 1 / 0)
+  assert profiler.phases["sleep"].total >= 0.01
+  # a call raising is timed too
+  assert profiler.phases["fail"].calls == 1
+
+  profiler.disable()
+  profiler.time_call("sleep", time.sleep, 0)
+  assert profiler.phases["sleep"].calls == 1
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_arena_counters_match_the_battle(scheduler):
+  arena = ArenaEnv()
+  arena.init()
+  arena.scheduler = scheduler
+  attacks = []
+  arena.event_bus.subscribe(AttackEvent, attacks.append)
+  arena.profiler = Profiler()
+  arena.setup_battle([["Goblin", "Bandit"], ["Goblin", "Goblin"]])
+  assert arena.run_battle()
+
+  counters = arena.profiler.counters
+  assert counters["arena.actions"] == len(attacks)
+  assert counters["arena.deaths"] == sum(attack.killed for attack in attacks)
+  assert counters["arena.ticks"] == arena.tick
+
+# uncapped and without prompts, whatever the clock and the hmi were set to
+def test_profile_runs_the_game_loop_unattended(tmp_path, monkeypatch):
+  monkeypatch.setattr("builtins.input", lambda prompt="": pytest.fail("profile prompted for input"))
+  root = Root()
+  root.init()
+  path = str(tmp_path / "battlesim.prof")
+
+  start = time.perf_counter()
+  root.profile(200, path)
+  assert time.perf_counter() - start < 5
+  assert root.clock.ticks == 200 and not root.clock.fast_forward and root.game.hmi.prompt
+  assert pstats.Stats(path).total_calls > 0
+  assert root.game.profiler.phases["engine.update_game_state"].calls == 200
@@ -0,0 +1,85 @@
+import pytest
+
+from app_code.arena.arena import ArenaEnv
+from app_code.arena.effects import StatusEffect
+from app_code.arena.replay import HEADER, ReplayEvent, ReplayReader, ReplayWriter
+from app_code.events.events import AttackEvent, EffectHpEvent
+from app_code.utils.random_streams import SeedStream
+
+TEAMS = [["Goblin", "Bandit", "Goblin"], ["Bandit", "Giant"], ["Goblin", "Goblin"]]
+
+# records a battle with effects running, along with the events the replay should hold
+def record_battle(writer : ReplayWriter) -> tuple[ArenaEnv, list[ReplayEvent]]:
+  arena = ArenaEnv(SeedStream(5).random())
+  arena.init()
+  expected = []
+  arena.event_bus.subscribe(AttackEvent, lambda event: expected.append(ReplayEvent(
+    event.tick, event.attacker.setup_order, event.target.setup_order, event.damage,
+    event.target.current_hp, event.killed)))
+  arena.event_bus.subscribe(EffectHpEvent, lambda event: expected.append(ReplayEvent(
+    event.tick, event.unit.setup_order, event.unit.setup_order, -event.change,
+    event.unit.current_hp, event.killed)))
+  writer.attach(arena.event_bus)
+
+  arena.setup_battle(TEAMS)
+  arena.apply_effect(arena.units[3], StatusEffect("poison", 3000, period=40, hp_per_period=-3))
+  arena.apply_effect(arena.units[5], StatusEffect("regen", period=25, hp_per_period=2))
+  assert arena.run_battle()
+  writer.detach(arena.event_bus)
+  return arena, expected
+
+def test_replay_reads_back_the_recorded_battle(tmp_path):
+  path = str(tmp_path / "battle.bsr")
+  writer = ReplayWriter()
+  arena, expected = record_battle(writer)
+  writer.save(path)
+
+  with ReplayReader(path) as replay:
+    assert len(replay) == len(expected)
+    assert list(replay) == expected
+    assert any(event.effect and event.damage < 0 for event in replay)
+    assert any(event.effect and event.damage > 0 for event in replay)
+    assert replay.winner == arena.winner_team_id()
+    assert replay.units == [(unit.team.team_id, unit.template.name) for unit in arena.units]
+    assert replay[-1] == expected[-1] and replay[0] == expected[0]
+    with pytest.raises(IndexError):
+      replay[len(expected)]
+
+def test_seek_tick_finds_the_first_event_of_a_tick(tmp_path):
+  path = str(tmp_path / "battle.bsr")
+  writer = ReplayWriter()
+  _, expected = record_battle(writer)
+  writer.save(path)
+
+  with ReplayReader(path) as replay:
+    for tick in (0, expected[0].tick, expected[len(expected) // 2].tick, expected[-1].tick + 1):
+      index = replay.seek_tick(tick)
+      assert index == next((i for i, event in enumerate(expected) if event.tick >= tick), len(expected))
+    assert list(replay.iter_events(replay.seek_tick(expected[-1].tick))) == \
+      [event for event in expected if event.tick == expected[-1].tick]
+
+# a writer too small for the battle grows its buffer and records the same replay
+def test_writer_grows_its_buffer(tmp_path):
+  small, large = ReplayWriter(capacity=1), ReplayWriter()
+  record_battle(small)
+  record_battle(large)
+  small.save(str(tmp_path / "small.bsr"))
+  large.save(str(tmp_path / "large.bsr"))
+  assert (tmp_path / "small.bsr").read_bytes() == (tmp_path / "large.bsr").read_bytes()
+
+def test_reader_rejects_other_files(tmp_path):
+  path = tmp_path / "notes.txt"
+  path.write_bytes(b"not a battle replay at all, just some text")
+  with pytest.raises(ValueError):
+    ReplayReader(str(path))
+
+@pytest.mark.parametrize("size", [0, 3, HEADER.size - 1])
+def test_reader_rejects_truncated_files(tmp_path, size):
+  path = str(tmp_path / "battle.bsr")
+  writer = ReplayWriter()
+  record_battle(writer)
+  writer.save(path)
+  with open(path, "r+b") as replay_file:
+    replay_file.truncate(size)
+  with pytest.raises(ValueError, match="too short"):
+    ReplayReader(path)
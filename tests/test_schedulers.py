@@ -0,0 +1,131 @@
+import random
+
+import pytest
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum, turn_interval
+from app_code.arena.effects import StatusEffect
+from app_code.barracks.barracks import FighterTemplate
+from app_code.events.events import AttackEvent, EffectHpEvent
+from app_code.utils.random_streams import SeedStream
+
+def random_teams(seed : int) -> list[list[FighterTemplate]]:
+  rng = random.Random(seed)
+  teams = []
+  for _ in range(rng.randint(2, 4)):
+    team = []
+    for i in range(rng.randint(1, 6)):
+      fighter = FighterTemplate(f"Unit{i}")
+      fighter.strength = rng.randint(0, 8)
+      fighter.speed = rng.choice([0, 1, 2, 3, 5, 0.5, 2.5])
+      fighter.max_hp = rng.randint(1, 8) * 10
+      team.append(fighter.freeze())
+    teams.append(team)
+  return teams
+
+# (attacker, target, tick) of every turn, and how the battle ended
+def battle_trace(scheduler : SchedulerEnum, seed : int, max_ticks : int) -> tuple:
+  arena = ArenaEnv()
+  arena.scheduler = scheduler
+  turns = []
+  arena.event_bus.subscribe(AttackEvent, lambda event: turns.append(
+    (event.attacker.setup_order, event.target.setup_order, event.tick)))
+  arena.setup_templates(random_teams(seed), SeedStream(seed).random())
+  finished = arena.run_battle(max_ticks)
+  return turns, finished, arena.tick, arena.winner_team_id(), [unit.current_hp for unit in arena.units]
+
+@pytest.mark.parametrize("seed", range(20))
+def test_event_scheduler_plays_the_turns_of_the_tick_scheduler(seed):
+  assert battle_trace(SchedulerEnum.EVENT, seed, 20_000) == battle_trace(SchedulerEnum.TICK, seed, 20_000)
+
+# short enough for most of these battles to time out, the event scheduler then stops on max_ticks too
+@pytest.mark.parametrize("seed", range(10))
+def test_schedulers_agree_on_timeouts(seed):
+  event = battle_trace(SchedulerEnum.EVENT, seed, 700)
+  assert event == battle_trace(SchedulerEnum.TICK, seed, 700)
+  if not event[1]:
+    assert event[2] == 700
+
+EFFECTS = (StatusEffect("haste", 300, speed=1.5), StatusEffect("slow", 500, speed=-2),
+           StatusEffect("banner", strength=2), StatusEffect("poison", 400, period=40, hp_per_period=-3),
+           StatusEffect("regen", period=25, hp_per_period=2), StatusEffect("trickle", speed=0.01))
+
+# applies and dispels effects every 150 ticks, both schedulers are stopped on those exact ticks
+def effect_battle_trace(scheduler : SchedulerEnum, seed : int) -> tuple:
+  arena = ArenaEnv()
+  arena.scheduler = scheduler
+  events = []
+  arena.event_bus.subscribe(AttackEvent, lambda event: events.append(
+    (event.attacker.setup_order, event.target.setup_order, event.tick)))
+  arena.event_bus.subscribe(EffectHpEvent, lambda event: events.append(
+    (event.unit.setup_order, event.effect.name, event.change, event.tick)))
+  arena.setup_templates(random_teams(seed), SeedStream(seed).random())
+
+  rng = random.Random(seed)
+  over = False
+  for stop in range(150, 6000, 150):
+    while not over and arena.tick < stop:
+      over = arena.fight_battle(stop)
+    if over:
+      break
+    assert arena.tick == stop
+    alive = [unit for unit in arena.units if unit.current_hp > 0]
+    for _ in range(3):
+      arena.apply_effect(rng.choice(alive), rng.choice(EFFECTS))
+    applied = [active for unit in alive for active in unit.effects or ()]
+    if applied and rng.random() < 0.5:
+      arena.remove_effect(rng.choice(applied))
+
+  return events, over, arena.tick, arena.winner_team_id(), [unit.current_hp for unit in arena.units]
+
+@pytest.mark.parametrize("seed", range(10))
+def test_schedulers_agree_with_effects_applied_and_removed_mid_battle(seed):
+  assert effect_battle_trace(SchedulerEnum.EVENT, seed) == effect_battle_trace(SchedulerEnum.TICK, seed)
+
+# a unit acts on the first tick its meter is full in exact arithmetic, speed * METER_STEP * ticks >= METER_FULL
+# (the meter used to be summed tick by tick, float rounding then delayed speeds 1 and 2 by a tick)
+FIRST_TURNS = {1: 2000, 2: 1000, 3: 667, 5: 400, 0.5: 4000, 2.5: 800}
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+@pytest.mark.parametrize("speed", list(FIRST_TURNS))
+def test_turns_come_when_the_meter_is_exactly_full(scheduler, speed):
+  actor = FighterTemplate("Actor")
+  actor.speed = speed
+  dummy = FighterTemplate("Dummy")
+  dummy.speed = 0
+  dummy.max_hp = 1_000_000
+
+  arena = ArenaEnv()
+  arena.scheduler = scheduler
+  turns = []
+  arena.event_bus.subscribe(AttackEvent, lambda event: turns.append(event.tick))
+  arena.setup_templates([[actor.freeze()], [dummy.freeze()]])
+  assert not arena.run_battle(3 * FIRST_TURNS[speed] + 1)
+
+  assert turn_interval(speed)[0] == FIRST_TURNS[speed]
+  assert turns == [FIRST_TURNS[speed] * turn for turn in (1, 2, 3)]
+
+def test_effect_durations_and_periods_are_checked():
+  arena = ArenaEnv()
+  arena.init()
+  arena.setup_battle([["Goblin"], ["Bandit"]])
+  unit = arena.units[0]
+  arena.apply_effect(unit, StatusEffect("banner", strength=1))
+  for effect in (StatusEffect("flash", 0), StatusEffect("odd", period=-1)):
+    with pytest.raises(ValueError):
+      arena.apply_effect(unit, effect)
+
+# empty teams are beaten from the start, they are never picked as a target
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_empty_teams_are_beaten_from_the_start(scheduler):
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.init()
+  arena.scheduler = scheduler
+  for team_setups, winner in (([["Goblin"], []], 0), ([[], []], None), ([[], ["Goblin", "Bandit"], []], 1)):
+    arena.setup_battle(team_setups)
+    assert arena.run_battle()
+    assert (arena.tick, arena.winner_team_id()) == (0, winner)
+
+  arena.setup_battle([["Goblin"], [], ["Bandit"]])
+  assert arena.run_battle()
+  assert arena.tick > 0 and arena.winner_team_id() in (0, 2)
+  assert len(arena.teams) == 3
@@ -0,0 +1,62 @@
+import io
+
+from app_code.utils.console import Colors
+from app_code.utils.screen_buffer import ScreenBuffer, ScreenRenderer
+
+def drawn_frame(width : int = 20, height : int = 4) -> ScreenBuffer:
+  frame = ScreenBuffer(width, height)
+  frame.write(0, 0, "Goblin", Colors.GREEN)
+  frame.draw_bar(0, 1, 10, 0.5)
+  return frame
+
+def test_an_unchanged_frame_writes_nothing():
+  stream = io.StringIO()
+  renderer = ScreenRenderer(stream)
+  renderer.present(drawn_frame())
+  written = stream.tell()
+
+  renderer.present(drawn_frame())
+  assert stream.tell() == written and renderer.cells_written == 0
+
+def test_one_changed_cell_writes_only_that_cell():
+  stream = io.StringIO()
+  renderer = ScreenRenderer(stream)
+  frame = drawn_frame()
+  renderer.present(frame)
+  stream.seek(0)
+  stream.truncate()
+
+  frame.write(3, 2, "x", Colors.RED)
+  renderer.present(frame)
+  assert stream.getvalue() == f"\033[3;4H{Colors.RESET}{Colors.RED}x{Colors.RESET}\033[5;1H"
+  assert renderer.cells_written == 1
+
+def test_a_resize_redraws_everything():
+  stream = io.StringIO()
+  renderer = ScreenRenderer(stream)
+  renderer.present(drawn_frame())
+  stream.seek(0)
+  stream.truncate()
+
+  renderer.present(drawn_frame(30, 4))
+  assert stream.getvalue().startswith("\033[2J") and renderer.cells_written == 30 * 4
+  stream.seek(0)
+  stream.truncate()
+
+  renderer.present(drawn_frame(30, 5))
+  assert stream.getvalue().startswith("\033[2J") and renderer.cells_written == 30 * 5
+
+def test_invalidate_forces_a_full_redraw():
+  stream = io.StringIO()
+  renderer = ScreenRenderer(stream)
+  renderer.present(drawn_frame())
+  renderer.invalidate()
+  renderer.present(drawn_frame())
+  assert renderer.cells_written == 20 * 4
+
+def test_writes_are_clipped_to_the_buffer():
+  frame = ScreenBuffer(5, 2)
+  frame.write(-2, 0, "abcdefgh")
+  frame.write(3, 1, "xyz")
+  frame.write(0, 2, "off")
+  assert ["".join(row) for row in frame.chars] == ["cdefg", "   xy"]
@@ -0,0 +1,30 @@
+import pytest
+
+from app_code.arena.arena import SchedulerEnum
+from app_code.simulation.simulation import run_shard, run_single_battle, simulate
+
+TEAMS = [["Goblin", "Bandit"], ["Goblin", "Bandit"]]
+
+def counts(result) -> dict:
+  record = result.to_dict()
+  del record["elapsed"]
+  return record
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_seeded_results_do_not_depend_on_the_worker_count(scheduler):
+  single = simulate(TEAMS, 60, workers=1, seed=7, scheduler=scheduler)
+  pooled = simulate(TEAMS, 60, workers=2, seed=7, scheduler=scheduler)
+
+  assert counts(single) == counts(pooled)
+  assert single.runs == 60 and 0 < single.wins[0] < 60
+
+def test_other_seeds_give_other_battles():
+  assert counts(simulate(TEAMS, 60, workers=1, seed=7)) != counts(simulate(TEAMS, 60, workers=1, seed=8))
+
+# a battle plays the same alone as inside its run, whatever came before it
+def test_single_battle_replays_its_run_battle():
+  for battle_index in (0, 13, 59):
+    arena = run_single_battle(TEAMS, battle_index, seed=7)
+    shard = run_shard(TEAMS, range(battle_index, battle_index + 1), seed=7)
+    assert shard.wins[arena.winner_team_id()] == 1
+    assert shard.total_ticks == arena.tick
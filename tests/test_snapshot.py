@@ -0,0 +1,67 @@
+import pytest
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.arena.effects import StatusEffect
+from app_code.utils.random_streams import SeedStream
+
+TEAMS = [["Goblin", "Bandit", "Goblin"], ["Bandit", "Goblin", "Giant"], ["Goblin", "Goblin"]]
+
+def battle_state(arena : ArenaEnv) -> tuple:
+  return (arena.tick, arena.winner_team_id(), [unit.current_hp for unit in arena.units],
+          [sorted(unit.setup_order for unit in team.unit_list) for team in arena.teams])
+
+# a battle a few hundred ticks in, with effects still running
+def battle_in_progress(scheduler : SchedulerEnum) -> ArenaEnv:
+  arena = ArenaEnv(SeedStream(3).random())
+  arena.init()
+  arena.scheduler = scheduler
+  arena.setup_battle(TEAMS)
+  arena.apply_effect(arena.units[0], StatusEffect("haste", 2000, speed=2))
+  arena.apply_effect(arena.units[5], StatusEffect("poison", 3000, period=50, hp_per_period=-4))
+  arena.apply_effect(arena.units[7], StatusEffect("regen", period=30, hp_per_period=1))
+  while arena.tick < 700:
+    assert not arena.fight_battle()
+  return arena
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_restore_plays_the_rest_of_the_battle_again(scheduler):
+  arena = battle_in_progress(scheduler)
+  snapshot = arena.snapshot()
+  assert arena.run_battle()
+  finished = battle_state(arena)
+
+  arena.restore(snapshot)
+  assert battle_state(arena)[0] == snapshot.tick
+  assert arena.run_battle()
+  assert battle_state(arena) == finished
+
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_fork_continues_like_the_original(scheduler):
+  arena = battle_in_progress(scheduler)
+  fork = arena.fork()
+  assert arena.run_battle()
+  assert fork.run_battle()
+
+  assert battle_state(fork) == battle_state(arena)
+  # the fork has units of its own
+  assert all(forked is not unit for forked, unit in zip(fork.units, arena.units))
+
+def test_fork_of_an_older_snapshot_leaves_the_battle_alone():
+  arena = battle_in_progress(SchedulerEnum.EVENT)
+  snapshot = arena.snapshot()
+  assert arena.run_battle()
+  finished = battle_state(arena)
+
+  fork = arena.fork(snapshot)
+  assert battle_state(fork)[0] == snapshot.tick
+  assert fork.run_battle()
+  assert battle_state(fork) == finished
+  assert battle_state(arena) == finished
+
+def test_restore_rejects_a_snapshot_of_another_setup():
+  arena = battle_in_progress(SchedulerEnum.EVENT)
+  other = ArenaEnv()
+  other.init()
+  other.setup_battle([["Goblin"], ["Bandit"]])
+  with pytest.raises(ValueError):
+    other.restore(arena.snapshot())
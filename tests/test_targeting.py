@@ -0,0 +1,46 @@
+import pytest
+
+from app_code.arena.arena import ArenaEnv, SchedulerEnum
+from app_code.arena.targeting import RolloutTargetPolicy
+from app_code.utils.random_streams import SeedStream
+
+def test_identical_enemies_of_different_teams_are_separate_candidates():
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.init()
+  arena.setup_battle([["Bandit"], ["Goblin", "Goblin"], ["Goblin"]])
+
+  candidates = RolloutTargetPolicy(seed=0).candidates(arena, arena.units[0])
+  assert sorted(enemy.team.team_id for enemy in candidates) == [1, 2]
+
+# rollouts run on the event scheduler either way, so the decisions don't change with the battle scheduler
+def test_rollout_policy_plays_the_same_battles_on_both_schedulers():
+  setups = [["Goblin", "Bandit"], ["Goblin", "Bandit"], ["Giant", "Goblin"]]
+  results = []
+  for scheduler in (SchedulerEnum.TICK, SchedulerEnum.EVENT):
+    arena = ArenaEnv()
+    arena.init()
+    arena.scheduler = scheduler
+    arena.target_policies = {0: RolloutTargetPolicy(8, seed=0)}
+    battles = []
+    for battle_index in range(3):
+      arena.setup_battle(setups, SeedStream(0).spawn(battle_index).random())
+      assert arena.run_battle()
+      battles.append((arena.winner_team_id(), arena.tick, [unit.current_hp for unit in arena.units]))
+    results.append(battles)
+  assert results[0] == results[1]
+
+# both schedulers keep the meters the same way, a battle carries on the same once forked on the other one
+@pytest.mark.parametrize("scheduler", [SchedulerEnum.TICK, SchedulerEnum.EVENT])
+def test_fork_on_the_other_scheduler_continues_the_battle(scheduler):
+  other = SchedulerEnum.EVENT if scheduler == SchedulerEnum.TICK else SchedulerEnum.TICK
+  arena = ArenaEnv(SeedStream(0).random())
+  arena.init()
+  arena.scheduler = scheduler
+  arena.setup_battle([["Goblin", "Bandit", "Goblin"], ["Bandit", "Goblin"]])
+  while arena.tick < 900:
+    assert not arena.fight_battle()
+
+  fork = arena.fork(scheduler=other)
+  assert arena.run_battle() and fork.run_battle()
+  assert (fork.tick, fork.winner_team_id()) == (arena.tick, arena.winner_team_id())
+  assert [unit.current_hp for unit in fork.units] == [unit.current_hp for unit in arena.units]
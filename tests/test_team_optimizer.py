@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app_code.simulation import team_optimizer
+from app_code.simulation.team_optimizer import BATCH_CHUNK, DEFAULT_MAX_TICKS, TeamOptimizer, score_batched
+
+OPPONENTS = [["Goblin"] * 40, ["Bandit"] * 40]
+MAX_UNITS = 40
+TIME_BUDGET = 0.5
+# timer, scheduling and process pool jitter on top of the documented bound
+SLACK = 0.2
+
+def teams() -> tuple[list, list]:
+  templates = TeamOptimizer(OPPONENTS, MAX_UNITS).templates
+  lineup = [templates["Bandit"]] * MAX_UNITS
+  return lineup, [[templates[name] for name in opponent] for opponent in OPPONENTS]
+
+# the documented bound on the batched path : one BatchArena run of BATCH_CHUNK / 2 battles,
+# measured with the biggest lineup the search can try
+def batch_run_time() -> float:
+  lineup, opponents = teams()
+  start = time.perf_counter()
+  score_batched(lineup, opponents[:1], range(BATCH_CHUNK), 0, DEFAULT_MAX_TICKS, None)
+  return (time.perf_counter() - start) / 2
+
+def test_batched_scoring_stops_one_run_past_the_deadline():
+  bound = batch_run_time()
+  lineup, opponents = teams()
+
+  # due in the middle of the first run of the first chunk
+  deadline = time.time() + bound / 2
+  wins, fought = score_batched(lineup, opponents, range(4 * BATCH_CHUNK), 0, DEFAULT_MAX_TICKS, deadline)
+
+  assert time.time() - deadline < bound + SLACK / 4
+  # the chunk cut short is not counted
+  assert (wins, fought) == (0.0, 0)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batched_search_stays_within_its_time_budget(workers):
+  assert team_optimizer.BatchArena is not None
+  bound = batch_run_time()
+
+  start = time.perf_counter()
+  result = TeamOptimizer(OPPONENTS, MAX_UNITS).run(TIME_BUDGET, workers)
+  elapsed = time.perf_counter() - start
+
+  assert result.timed_out
+  assert result.lineup is not None
+  assert elapsed - TIME_BUDGET < bound + SLACK
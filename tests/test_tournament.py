@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from app_code.barracks.barracks import FighterTemplate
+from app_code.barracks.pregen_units import get_pregen_unit_database
+from app_code.simulation.tournament import Tournament, fighter_entrants, team_entrants
+
+def generated_fighters(count : int, seed : int = 0) -> list[FighterTemplate]:
+  rng = random.Random(seed)
+  fighters = []
+  for i in range(count):
+    fighter = FighterTemplate(f"Fighter{i}")
+    fighter.init_fighter(rng)
+    fighters.append(fighter.freeze())
+  return fighters
+
+def roster_entrants() -> dict[str, list[FighterTemplate]]:
+  unit_db = get_pregen_unit_database()
+  entrants = team_entrants([[name] for name in unit_db], unit_db)
+  entrants.update(fighter_entrants(generated_fighters(40)))
+  return entrants
+
+def test_ladder_ranks_a_round_robin_by_score():
+  tournament = Tournament(roster_entrants(), games=2)
+  tournament.run(workers=1)
+  ladder = tournament.ladder
+
+  scores = [ladder.ratings[entrant].score() for entrant in ladder.ranking()]
+  assert scores == sorted(scores, reverse=True)
+  giant = ladder.ratings[tournament.names.index("Giant")]
+  assert giant.losses == 0 and ladder.ranking()[0] == tournament.names.index("Giant")
+
+def test_resumed_ladder_matches_the_finished_one(tmp_path):
+  path = str(tmp_path / "tournament.json")
+  finished = Tournament(roster_entrants(), games=2)
+  finished.run(workers=1)
+
+  # stops after the first chunk, then picks up where it left off
+  partial = Tournament(roster_entrants(), games=2)
+  with pytest.raises(Stop):
+    partial.run(workers=1, checkpoint_path=path, checkpoint_every=0, chunk_size=100,
+                progress=lambda done, total: stop())
+  resumed = Tournament(roster_entrants(), games=2)
+  assert resumed.resume(path)
+  assert 0 < resumed.next_pairing < resumed.pairing_count()
+  resumed.run(workers=1)
+
+  assert resumed.ladder.ranking() == finished.ladder.ranking()
+  assert [rating.rating for rating in resumed.ladder.ratings] == [rating.rating for rating in finished.ladder.ratings]
+
+class Stop(Exception):
+  pass
+
+def stop():
+  raise Stop
+
+def test_duplicate_entrants_are_rejected():
+  unit_db = get_pregen_unit_database()
+  with pytest.raises(ValueError):
+    team_entrants([["Goblin"], ["Bandit"], ["Goblin"]], unit_db)
+  with pytest.raises(ValueError):
+    fighter_entrants([FighterTemplate("Twin"), FighterTemplate("Twin")])
@@ -0,0 +1,70 @@
+import os
+
+import pytest
+
+from app_code.barracks.unit_database import MAX_STAT, UnitDatabase, read_unit_source
+
+SOURCE = "name,strength,agility,speed,max_hp\nGoblin,1,4,5,40\nBandit,3,2,2,60\n"
+
+def write_source(tmp_path, text : str = SOURCE) -> str:
+  path = tmp_path / "units.csv"
+  path.write_text(text, encoding="utf-8")
+  return str(path)
+
+def stats(unit_db : UnitDatabase) -> dict:
+  return {name: (unit.strength, unit.agility, unit.speed, unit.max_hp) for name, unit in unit_db.items()}
+
+def test_source_rows_are_read_in_order(tmp_path):
+  assert read_unit_source(write_source(tmp_path)) == [("Goblin", 1, 4, 5, 40), ("Bandit", 3, 2, 2, 60)]
+
+@pytest.mark.parametrize("row", [
+  ",1,1,1,10", "Orc+Chief,1,1,1,10", "\"Orc,Chief\",1,1,1,10", "\"Orc\nChief\",1,1,1,10", "Goblin,1,1,1,10",
+  "Orc,one,1,1,10", "Orc,1,1,,10", "Orc,-1,1,1,10", "Orc,1,1,1,0", f"Orc,1,1,1,{MAX_STAT + 1}",
+  f"Orc,{MAX_STAT + 1},1,1,10"])
+def test_bad_rows_are_located(tmp_path, row):
+  path = write_source(tmp_path, SOURCE + row + "\n")
+  with pytest.raises(ValueError, match=f"^{path}:4: "):
+    read_unit_source(path)
+
+def test_the_largest_stats_fit_the_cache(tmp_path):
+  path = write_source(tmp_path, SOURCE + f"Titan,{MAX_STAT},0,0,{MAX_STAT}\n")
+  unit_db = UnitDatabase.open(path, str(tmp_path / "units.bin"))
+  assert stats(unit_db)["Titan"] == (MAX_STAT, 0, 0, MAX_STAT)
+
+def test_missing_columns_are_reported(tmp_path):
+  with pytest.raises(ValueError, match="missing column"):
+    read_unit_source(write_source(tmp_path, "name,strength,speed\nGoblin,1,5\n"))
+
+def test_a_stale_cache_is_rebuilt(tmp_path):
+  path = write_source(tmp_path)
+  cache_path = str(tmp_path / "units.bin")
+  assert stats(UnitDatabase.open(path, cache_path))["Goblin"] == (1, 4, 5, 40)
+  compiled = os.stat(cache_path).st_mtime_ns
+
+  # same size, only the modification time tells the source changed
+  source_mtime = os.stat(path).st_mtime_ns
+  write_source(tmp_path, SOURCE.replace("Goblin,1,4,5,40", "Goblin,2,4,5,40"))
+  os.utime(path, ns=(source_mtime + 10 ** 9, source_mtime + 10 ** 9))
+  assert stats(UnitDatabase.open(path, cache_path))["Goblin"] == (2, 4, 5, 40)
+
+  write_source(tmp_path, SOURCE + "Giant,15,2,3,300\n")
+  assert list(UnitDatabase.open(path, cache_path)) == ["Goblin", "Bandit", "Giant"]
+
+  with open(cache_path, "r+b") as cache_file:
+    cache_file.truncate(10)
+  assert len(UnitDatabase.open(path, cache_path)) == 3
+  assert os.stat(cache_path).st_mtime_ns >= compiled
+
+def test_an_up_to_date_cache_is_used_as_is(tmp_path):
+  path = write_source(tmp_path)
+  cache_path = str(tmp_path / "units.bin")
+  UnitDatabase.open(path, cache_path)
+  with open(cache_path, "rb") as cache_file:
+    data = cache_file.read()
+  assert UnitDatabase.open(path, cache_path).data == data
+
+def test_an_unwritable_cache_compiles_in_memory(tmp_path):
+  path = write_source(tmp_path)
+  # a directory can't be made under a file
+  unit_db = UnitDatabase.open(path, os.path.join(path, "units.bin"))
+  assert stats(unit_db) == {"Goblin": (1, 4, 5, 40), "Bandit": (3, 2, 2, 60)}
@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+import pytest
+
+from app_code.server.battle_server import BattleServer
+from app_code.server.web_server import ACK_WINDOW, MAX_REQUEST_SIZE, BattleWebServer
+from app_code.server.websocket import OP_CLOSE, OP_TEXT, client_handshake, encode_frame, read_frame
+
+# runs scenario(web) against a web server on a free port, with shards when the battles should really be fought
+# without, nothing comes from the shards and the tests dispatch the frames themselves
+def serve(scenario, shards : bool = False, pass_interval : float | None = None, **options):
+  async def run():
+    battle_server = BattleServer(1, seed=0, pass_interval=pass_interval)
+    if shards:
+      battle_server.start()
+    try:
+      web = BattleWebServer(battle_server, port=0, **options)
+      await web.start()
+      try:
+        return await scenario(web)
+      finally:
+        await web.close()
+    finally:
+      battle_server.close()
+  return asyncio.run(run())
+
+async def http_request(web : BattleWebServer, method : str, path : str, body : bytes = b"",
+                       length : str | None = None) -> tuple[int, dict]:
+  reader, writer = await asyncio.open_connection(web.host, web.port)
+  length = str(len(body)) if length is None else length
+  writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {length}\r\n\r\n".encode() + body)
+  await writer.drain()
+  response = await reader.read()
+  writer.close()
+  head, payload = response.split(b"\r\n\r\n", 1)
+  return int(head.split(b" ")[1]), json.loads(payload)
+
+async def post_battle(web : BattleWebServer, teams) -> tuple[int, dict]:
+  return await http_request(web, "POST", "/battles", json.dumps({"teams": teams}).encode())
+
+async def watch(web : BattleWebServer, battle_id : int):
+  reader, writer = await asyncio.open_connection(web.host, web.port)
+  await client_handshake(reader, writer, web.host, f"/ws/{battle_id}")
+  return reader, writer
+
+async def read_message(reader) -> list | None:
+  opcode, payload = await asyncio.wait_for(read_frame(reader), 5)
+  return None if opcode == OP_CLOSE else json.loads(payload)
+
+def ack(writer, tick : int):
+  writer.write(encode_frame(str(tick).encode(), OP_TEXT, mask=True))
+
+UNITS = [(0, "Goblin", 20, 20, 0), (1, "Bandit", 30, 30, 0)]
+
+def test_http_routes():
+  async def scenario(web):
+    status, started = await post_battle(web, "Goblin,Bandit")
+    assert status == 201
+    battle_id = started["battles"][0]
+    assert await http_request(web, "GET", "/battles") == (200, {"battles": [battle_id]})
+
+    await asyncio.to_thread(web.battle_server.wait, 30)
+    status, outcome = await http_request(web, "GET", f"/battles/{battle_id}")
+    assert status == 200 and outcome["battle_id"] == battle_id and outcome["winner"] in (0, 1)
+
+    assert (await http_request(web, "GET", "/battles/999"))[0] == 404
+    assert (await http_request(web, "PUT", "/battles"))[0] == 405
+    assert (await http_request(web, "GET", "/nowhere"))[0] == 404
+    status, stats = await http_request(web, "GET", "/stats")
+    assert status == 200 and len(stats["shards"]) == 1 and stats["web"]["live_battles"] == 0
+  # paced passes, the battle stays live for about half a second
+  serve(scenario, shards=True, pass_interval=0.01)
+
+@pytest.mark.parametrize("body", [
+  {"teams": [["Goblin"], []]}, {"teams": [["Goblin"], "Bandit"]}, {"teams": [["Goblin"], [1]]},
+  {"teams": [["Goblin"], ["Nobody"]]}, {"teams": [["Goblin"]]}, {"teams": "Goblin,"}, {"teams": {"Goblin": 1}},
+  {"teams": "Goblin,Bandit", "count": 0}, {}, [], "teams"])
+def test_bad_battle_requests_are_refused(body):
+  async def scenario(web):
+    assert (await http_request(web, "POST", "/battles", json.dumps(body).encode()))[0] == 400
+    # the shard is still there for the next battle
+    status, started = await post_battle(web, [["Goblin"], ["Bandit"]])
+    assert status == 201
+    assert await asyncio.to_thread(web.battle_server.wait, 30)
+    assert web.battle_server.result(started["battles"][0]).error is None
+  serve(scenario, shards=True)
+
+def test_request_sizes_are_checked():
+  async def scenario(web):
+    assert (await http_request(web, "POST", "/battles", length="ten"))[0] == 400
+    assert (await http_request(web, "POST", "/battles", length=str(MAX_REQUEST_SIZE + 1)))[0] == 413
+  serve(scenario)
+
+# the deltas a watcher could not be sent yet go out as one frame
+def test_pending_deltas_are_coalesced():
+  async def scenario(web):
+    battle_id = (await post_battle(web, "Goblin,Bandit"))[1]["battles"][0]
+    reader, writer = await watch(web, battle_id)
+    web.dispatch([("start", battle_id, 0, UNITS), ("tick", battle_id, 10, [(0, 20, 50)]),
+                  ("tick", battle_id, 20, [(1, 25, 100)]), ("tick", battle_id, 30, [(0, 14, 0)]),
+                  ("end", battle_id, 30, 1)])
+
+    assert await read_message(reader) == ["start", battle_id, 0, [list(unit) for unit in UNITS]]
+    assert await read_message(reader) == ["tick", battle_id, 30, [[0, 14, 0], [1, 25, 100]]]
+    assert await read_message(reader) == ["end", battle_id, 30, 1]
+    assert await read_message(reader) is None
+    writer.close()
+    assert web.frames_coalesced == 2 and battle_id not in web.channels
+  serve(scenario)
+
+# once a watcher acks, at most ACK_WINDOW frames are in flight and the rest waits for its acks
+def test_ack_window():
+  async def scenario(web):
+    battle_id = (await post_battle(web, "Goblin,Bandit"))[1]["battles"][0]
+    reader, writer = await watch(web, battle_id)
+    web.dispatch([("start", battle_id, 0, UNITS)])
+    assert (await read_message(reader))[0] == "start"
+    ack(writer, 0)
+
+    for tick in range(1, ACK_WINDOW + 1):
+      await asyncio.sleep(0.05)
+      web.dispatch([("tick", battle_id, tick, [(0, 20, tick)])])
+      assert (await read_message(reader))[2] == tick
+    for tick in range(ACK_WINDOW + 1, ACK_WINDOW + 4):
+      web.dispatch([("tick", battle_id, tick, [(1, 30, tick)])])
+    with pytest.raises(asyncio.TimeoutError):
+      await asyncio.wait_for(read_frame(reader), 0.3)
+
+    ack(writer, ACK_WINDOW)
+    assert await read_message(reader) == ["tick", battle_id, ACK_WINDOW + 3, [[1, 30, ACK_WINDOW + 3]]]
+    assert web.frames_coalesced == 2
+    writer.close()
+  serve(scenario)
+
+def test_watchers_leaving_their_window_full_are_dropped():
+  async def scenario(web):
+    battle_id = (await post_battle(web, "Goblin,Bandit"))[1]["battles"][0]
+    reader, writer = await watch(web, battle_id)
+    web.dispatch([("start", battle_id, 0, UNITS)])
+    await read_message(reader)
+    ack(writer, 0)
+    await asyncio.sleep(0.05)
+    for tick in range(1, ACK_WINDOW + 1):
+      web.dispatch([("tick", battle_id, tick, [(0, 20, tick)])])
+      await read_message(reader)
+
+    # dropped without a close frame
+    assert await asyncio.wait_for(reader.read(), 5) == b""
+    assert web.watchers_dropped == 1 and web.watchers == 0
+    writer.close()
+  serve(scenario, drain_timeout=0.3)